@@ -1,14 +1,63 @@
+import io
 import os
-import uuid
+import time
 import shutil
+import hashlib
+import functools
+import itertools
+import threading
 import importlib.util
+import concurrent.futures
+from urllib.parse import urlparse
 from abc import ABC, abstractmethod
 from cloud_storage_slim.utils import (
     parse_path_uri,
     check_remote_file,
     check_source_local_file,
     check_dest_local_file,
+    BlobInfo,
 )
+from cloud_storage_slim.sync import diff_blob_infos
+from cloud_storage_slim.listing import iter_blobs_parallel
+from cloud_storage_slim.streaming import ChunkPipe, DEFAULT_MAX_BUFFERED_CHUNKS, DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.memory import MemoryBudget
+from cloud_storage_slim.retry import RetryPolicy
+from cloud_storage_slim.ratelimit import RateLimits
+from cloud_storage_slim.metrics import MetricsAggregator, TransferObserver
+from cloud_storage_slim.profiler import Profiler, profile
+from cloud_storage_slim.journal import TransferJournal
+from cloud_storage_slim.checksum import Checksums, OrderedHasher, TransferResult, hashed_chunks, file_md5
+from cloud_storage_slim.segmented import read_ranges
+from cloud_storage_slim.remote_file import RemoteFileReader, RemoteFileWriter
+from cloud_storage_slim.listing_cache import ListingCache
+from cloud_storage_slim.bucket_index import BucketIndex
+from cloud_storage_slim.blob_cache import BlobCache, blob_version
+from cloud_storage_slim.scheduler import (
+    TransferScheduler,
+    CopyResult,
+    DEFAULT_TRANSFERS,
+    DEFAULT_PER_BUCKET_TRANSFERS,
+)
+
+DEFAULT_SIGNED_URL_EXPIRATION = 3600
+# connections kept open per host by every backend
+DEFAULT_POOL_MAXSIZE = 64
+# multipart uploads older than this are considered abandoned
+DEFAULT_ABANDONED_UPLOAD_AGE = 24 * 60 * 60
+# checksums computed along the md5 to check transfers against what each
+# provider reports for blobs without a plain md5 (multipart, composite)
+CHECKSUM_ALGORITHMS = {
+    "gs": ("crc32c",),
+    "gcs": ("crc32c",),
+    "s3": ("multipart_etag",),
+    "oss": ("crc64ecma",),
+    "tos": ("crc64ecma",),
+}
+
+
+def _cache_scheme(scheme):
+    # gs:// and gcs:// address the same buckets
+    return "gs" if scheme == "gcs" else scheme
 
 class CloudStorage(ABC):
     @abstractmethod
@@ -27,21 +76,143 @@ class CloudStorage(ABC):
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
         pass
 
+    @abstractmethod
+    def stat_blob(self, bucket_name, remote_blob_path):
+        pass
+
+    @abstractmethod
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        pass
+
+    @abstractmethod
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        pass
+
+    @abstractmethod
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        pass
+
+    @abstractmethod
+    def create_multipart_upload(self, bucket_name, remote_blob_path, **kwargs):
+        pass
+
+    @abstractmethod
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        pass
+
+    @abstractmethod
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        pass
+
+    @abstractmethod
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        pass
+
+    @abstractmethod
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        pass
+
     @abstractmethod
     def list_blobs(self, bucket_name, pattern):
         pass
 
+    @abstractmethod
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        pass
+
+    @abstractmethod
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        pass
+
     @abstractmethod
     def get_first_blob(self, bucket_name, pattern):
         pass
 
+    @abstractmethod
+    def delete_blob(self, bucket_name, remote_blob_path):
+        pass
+
     @abstractmethod
     def get_native_client(self):
         pass
 
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        """
+        the Checksums the provider reports for a blob, only the md5 of
+        stat_blob unless the backend knows more
+        """
+        return Checksums(self.stat_blob(bucket_name, remote_blob_path).md5)
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        """
+        copy a blob to another bucket or key of the same provider server-side,
+        backends without such a copy raise NotImplementedError
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support server-side copy")
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        """
+        a presigned GET URL of the blob valid for `expiration` seconds
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support signed URLs")
+
+    def copy_from_url(self, source_url, size, bucket_name, remote_blob_path, **kwargs):
+        """
+        let the provider fetch the blob from source_url itself, size is the
+        content length of the source or None when unknown
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support copying from URL")
+
+    def list_multipart_uploads(self, bucket_name, pattern):
+        """
+        yield (key, upload_id, initiated timestamp) of the multipart uploads
+        started and not completed under pattern
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support listing multipart uploads")
+
 
 class CloudStorageSlim:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        listing_cache=None,
+        bucket_index=None,
+        blob_cache=None,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        keep_alive=True,
+        memory_budget=None,
+        retry_policy=None,
+        bandwidth_limits=None,
+        request_rate_limits=None,
+        observers=None,
+        profiler=None,
+    ) -> None:
+        """
+        listing_cache: an optional ListingCache that ls and the include
+        lookup of copyto read through, writes made through this instance
+        invalidate the listings they touch
+        bucket_index: an optional BucketIndex, prefixes filled with
+        refresh_index are answered from it without any list call
+        blob_cache: an optional BlobCache, remote sources are then validated
+        with a metadata request and only downloaded when the cached version
+        is missing or stale
+        pool_maxsize, keep_alive: connection pool size per host and whether
+        connections are reused, passed to every backend client
+        memory_budget: an optional MemoryBudget shared by all transfers of
+        this instance, part buffers wait for it instead of growing memory use
+        retry_policy: the RetryPolicy of every backend request, throttled and
+        transient failures are retried with jittered exponential backoff
+        (RetryPolicy(max_attempts=1) disables retries); the concurrent
+        requests to each bucket start at pool_maxsize, halve when the
+        provider throttles and grow back while requests succeed
+        bandwidth_limits, request_rate_limits: bytes/sec and requests/sec
+        by "*" (all traffic), scheme ("s3"), bucket ("s3://bucket") or HTTP
+        host ("https://example.com"), enforced by token buckets shared by
+        all threads; traffic is held to every limit matching it
+        observers: TransferObserver instances, e.g. a MetricsAggregator,
+        told about every request attempt, retry, transferred chunk and copyto
+        profiler: an optional Profiler recording spans for the phases of
+        copyto and ls and for every backend request attempt
+        """
         package_spec = importlib.util.find_spec("dotenv")
         if package_spec is not None:
             dotenv_module = importlib.util.module_from_spec(package_spec)
@@ -54,55 +225,125 @@ class CloudStorageSlim:
         self.s3_client = None
         self.http_client = None
         self.tos_client = None
+        self.listing_cache = listing_cache
+        self.bucket_index = bucket_index
+        self.blob_cache = blob_cache
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.memory_budget = memory_budget
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limits = RateLimits(bandwidth_limits, request_rate_limits)
+        self.profiler = profiler
+        self.observers = tuple(observers or ()) + ((profiler,) if profiler is not None else ())
+        from .retrying_storage import Retriers
+        self._retriers = Retriers(self.retry_policy, pool_maxsize, self.rate_limits, self.observers, profiler)
+        # clients are created once and shared by every thread
+        self._clients_lock = threading.Lock()
+
+    def _workspace_path(self, *parts):
+        """
+        a path under ~/.cloud_storage_slim, which every process shares: the
+        blob cache, the bucket index and the journals live there next to the
+        tmp directory
+        """
+        return os.path.join(os.path.expanduser("~"), ".cloud_storage_slim", *parts)
 
     def _setup_tmp_workspace(self):
-        tmp_workspace_folder_path = os.path.join(
-            os.path.expanduser("~"), ".cloud_storage_slim"
-        )
+        tmp_workspace_folder_path = self._workspace_path("tmp")
         if not os.path.exists(tmp_workspace_folder_path):
-            os.makedirs(tmp_workspace_folder_path, exist_ok=True)
+            with profile(self.profiler, "setup_tmp_workspace"):
+                os.makedirs(tmp_workspace_folder_path, exist_ok=True)
         return tmp_workspace_folder_path
 
     def _teardown_tmp_workspace(self):
-        tmp_workspace_folder_path = os.path.join(
-            os.path.expanduser("~"), ".cloud_storage_slim"
-        )
+        # only the tmp directory, never the cache, index or journals
+        tmp_workspace_folder_path = self._workspace_path("tmp")
         if os.path.exists(tmp_workspace_folder_path):
             shutil.rmtree(tmp_workspace_folder_path)
 
     def _get_client(self, scheme) -> CloudStorage:
+        # fast path without the lock once the client exists
+        client = self._clients_by_scheme(scheme)
+        if client is not None:
+            return client
+        with self._clients_lock:
+            client = self._clients_by_scheme(scheme)
+            if client is None:
+                with profile(self.profiler, "create_client", scheme=scheme):
+                    client = self._create_client(scheme)
+            return client
+
+    def _clients_by_scheme(self, scheme):
         if scheme == "gs" or scheme == "gcs":
-            if self.gcs_client is None:
-                from .google_cloud_storage import GoogleCloudStorage
-                self.gcs_client = GoogleCloudStorage()
             return self.gcs_client
         elif scheme == "az":
-            if self.az_client is None:
-                from .azure_storage import AzureStorage
-                self.az_client = AzureStorage()
             return self.az_client
         elif scheme == "oss":
-            if self.oss_client is None:
-                from .alibaba_cloud_oss import AlibabaCloudOSS
-                self.oss_client = AlibabaCloudOSS()
             return self.oss_client
         elif scheme == "s3":
-            if self.s3_client is None:
-                from .amazon_s3 import AmazonS3Storage
-                self.s3_client = AmazonS3Storage()
             return self.s3_client
         elif scheme == "tos":
-            if self.tos_client is None:
-                from .byteplus_torch_object_storage import TorchObjectStorage
-                self.tos_client = TorchObjectStorage()
             return self.tos_client
         elif scheme == "http" or scheme == "https":
-            from .http_client import HttpRemoteFile
-            self.http_client = HttpRemoteFile()
             return self.http_client
         else:
             raise ValueError(f"Unknown scheme: {scheme}")
 
+    def _create_client(self, scheme):
+        client_options = {"pool_maxsize": self.pool_maxsize, "keep_alive": self.keep_alive}
+        if scheme == "gs" or scheme == "gcs":
+            from .google_cloud_storage import GoogleCloudStorage
+            self.gcs_client = self._retrying(GoogleCloudStorage(**client_options), "gs")
+            return self.gcs_client
+        elif scheme == "az":
+            from .azure_storage import AzureStorage
+            self.az_client = self._retrying(AzureStorage(**client_options), "az")
+            return self.az_client
+        elif scheme == "oss":
+            from .alibaba_cloud_oss import AlibabaCloudOSS
+            self.oss_client = self._retrying(AlibabaCloudOSS(**client_options), "oss")
+            return self.oss_client
+        elif scheme == "s3":
+            from .amazon_s3 import AmazonS3Storage
+            self.s3_client = self._retrying(AmazonS3Storage(**client_options), "s3")
+            return self.s3_client
+        elif scheme == "tos":
+            from .byteplus_torch_object_storage import TorchObjectStorage
+            self.tos_client = self._retrying(TorchObjectStorage(**client_options), "tos")
+            return self.tos_client
+        else:
+            from .http_client import HttpRemoteFile
+            self.http_client = self._retrying(HttpRemoteFile(**client_options), "http")
+            return self.http_client
+
+    def _retrying(self, client, scheme):
+        from .retrying_storage import RetryingStorage
+        return RetryingStorage(
+            client,
+            self.retry_policy,
+            self.pool_maxsize,
+            scheme,
+            self.rate_limits,
+            self.observers,
+            self.profiler,
+            retriers=self._retriers,
+        )
+
+    def retrier(self, scheme, bucket_name):
+        """
+        the Retrier every client of this instance sends the requests to
+        bucket_name through, for http(s) bucket_name is the host; for callers
+        issuing requests of their own, like AsyncCloudStorageSlim
+        """
+        return self._retriers.retrier(_cache_scheme(scheme), bucket_name)
+
+    def throttle(self, scheme, bucket_name, direction):
+        """
+        the Throttle the "read" or "write" transfers of bucket_name wait on,
+        None when no limit applies and there are no observers
+        """
+        return self._retriers.throttle(_cache_scheme(scheme), bucket_name, direction)
+
     def get_client(self, scheme):
         return self._get_client(scheme).get_native_client()
 
@@ -113,25 +354,78 @@ class CloudStorageSlim:
         self.oss_client = None
         self.s3_client = None
         self.tos_client = None
+        self.http_client = None
 
-    def _copy_local_to_remote(self, source_path, dest_path, **kwargs):
+    def _copy_local_to_remote(self, source_path, dest_path, checksum=False, **kwargs):
+        """
+        returns the Checksums of the uploaded bytes when checksum is set and
+        the upload computed them
+        """
         local_blob_path = os.path.abspath(source_path)
         scheme, bucket_name, blob_path = parse_path_uri(dest_path)
         client = self._get_client(scheme)
         if scheme == 'http' or scheme == 'https':
             client.upload_uri(local_blob_path, dest_path, **kwargs)
-        else:
+            return None
+        if not checksum:
             client.upload(bucket_name, local_blob_path, blob_path, **kwargs)
+            return None
+        hasher = self._new_hasher(dest_path, local_blob_path)
+        client.upload(bucket_name, local_blob_path, blob_path, hasher=hasher, **kwargs)
+        return hasher.checksums() if hasher.size == os.path.getsize(local_blob_path) else None
+
+    def _new_hasher(self, remote_path, local_path=None):
+        """
+        an OrderedHasher computing the checksums the provider of remote_path
+        reports
+        """
+        return OrderedHasher(local_path, CHECKSUM_ALGORITHMS.get(urlparse(remote_path).scheme, ()))
+
+    def _blob_cache_entry(self, scheme, bucket_name, blob_path, **kwargs):
+        """
+        (uri, version, download) identifying the current content of a blob
+        in the blob cache, the version costs one metadata request
+        """
+        client = self._get_client(scheme)
+        blob_info = client.stat_blob(bucket_name, blob_path)
+        return (
+            f"{_cache_scheme(scheme)}://{bucket_name}/{blob_path}",
+            blob_version(blob_info),
+            lambda tmp_path: client.download(bucket_name, blob_path, tmp_path, **kwargs),
+        )
 
-    def _copy_remote_to_local(self, source_path, dest_path, **kwargs):
+    def _copy_remote_to_local(self, source_path, dest_path, checksum=False, **kwargs):
+        """
+        returns the Checksums of the downloaded bytes when checksum is set and
+        the download computed them, blobs served by the blob cache are hashed
+        from dest_path once copied
+        """
         scheme, bucket_name, blob_path = parse_path_uri(source_path)
         client = self._get_client(scheme)
-        if scheme == 'http' or scheme == 'https':
+        if self.blob_cache is not None and scheme != 'http' and scheme != 'https':
+            uri, version, download = self._blob_cache_entry(scheme, bucket_name, blob_path, **kwargs)
+            self.blob_cache.copy_to(uri, version, dest_path, download)
+            if checksum:
+                hasher = self._new_hasher(source_path, dest_path)
+                hasher.update_range(0, os.path.getsize(dest_path))
+                return hasher.checksums()
+        elif scheme == 'http' or scheme == 'https':
             client.download_uri(source_path, dest_path, **kwargs)
+        elif checksum:
+            hasher = self._new_hasher(source_path, dest_path)
+            client.download(bucket_name, blob_path, dest_path, hasher=hasher, **kwargs)
+            return hasher.checksums() if hasher.size == os.path.getsize(dest_path) else None
         else:
             client.download(bucket_name, blob_path, dest_path, **kwargs)
+        return None
 
-    def _copy_remote_to_remote(self, source_path, dest_path, **kwargs):
+    def _copy_remote_to_remote(self, source_path, dest_path, checksum=False, **kwargs):
+        """
+        with checksum set, returns the Checksums of the bytes that passed
+        through this host, or for copies done by the providers the ones the
+        source reports but its multipart ETag, the copy may be split into
+        other parts
+        """
         source_scheme, source_bucket_name, source_blob_path = parse_path_uri(
             source_path
         )
@@ -140,67 +434,730 @@ class CloudStorageSlim:
         dest_scheme, dest_bucket_name, dest_blob_path = parse_path_uri(dest_path)
         dest_client = self._get_client(dest_scheme)
 
-        tmp_workspace_folder_path = self._setup_tmp_workspace()
+        if 'filter_options' in kwargs:
+            include = kwargs['filter_options'].get('include', None)
+            if include is not None:
+                search_path = f"{source_blob_path}{include}"
+                with profile(self.profiler, "get_first_blob", pattern=search_path):
+                    source_blob_path = self._get_first_blob(
+                        source_scheme, source_bucket_name, search_path
+                    )
+                if source_blob_path is None:
+                    raise ValueError(
+                        f"Cannot find blob with prefix {search_path} from {source_scheme}://{source_bucket_name}"
+                    )
 
-        unique_local_filename = str(uuid.uuid4())
-        local_blob_path = os.path.join(tmp_workspace_folder_path, unique_local_filename)
+        if (
+            kwargs.get("server_side_copy", True)
+            and source_scheme != 'http' and source_scheme != 'https'
+            and _cache_scheme(source_scheme) == _cache_scheme(dest_scheme)
+        ):
+            # same provider, let it copy the bytes without passing through this host
+            try:
+                with profile(self.profiler, "server_side_copy"):
+                    source_client.copy_blob(
+                        source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs
+                    )
+                return self._source_checksums(source_client, source_bucket_name, source_blob_path) if checksum else None
+            except NotImplementedError:
+                pass
 
-        try:
-            if 'filter_options' in kwargs:
-                include = kwargs['filter_options'].get('include', None)
-                if include is not None:
-                    search_path = f"{source_blob_path}{include}"
-                    source_blob_path = source_client.get_first_blob(
-                        source_bucket_name, search_path
+        if kwargs.get("ingest_from_url") and dest_scheme != 'http' and dest_scheme != 'https':
+            # the destination provider downloads from a presigned source URL
+            try:
+                if source_scheme == 'http' or source_scheme == 'https':
+                    source_url, size = source_path, None
+                else:
+                    source_url = source_client.signed_url(
+                        source_bucket_name,
+                        source_blob_path,
+                        kwargs.get("signed_url_expiration", DEFAULT_SIGNED_URL_EXPIRATION),
                     )
-                    if source_blob_path is None:
-                        raise ValueError(
-                            f"Cannot find blob with prefix {search_path} from {source_scheme}://{source_bucket_name}"
-                        )
-
-            if source_scheme == 'http' or source_scheme == 'https':
-                source_client.download_uri(
-                    source_path, local_blob_path, **kwargs
-                )
-            else:
-                source_client.download(
-                    source_bucket_name, source_blob_path, local_blob_path, **kwargs
-                )
+                    size = source_client.stat_blob(source_bucket_name, source_blob_path).size
+                with profile(self.profiler, "ingest_from_url"):
+                    dest_client.copy_from_url(source_url, size, dest_bucket_name, dest_blob_path, **kwargs)
+                if checksum and source_scheme != 'http' and source_scheme != 'https':
+                    return self._source_checksums(source_client, source_bucket_name, source_blob_path)
+                return None
+            except NotImplementedError:
+                pass
 
-            if dest_scheme == 'http' or dest_scheme == 'https':
-                dest_client.upload_uri(local_blob_path, dest_path, **kwargs)
-            else:
-                dest_client.upload(dest_bucket_name, local_blob_path, dest_blob_path, **kwargs)
+        if self.blob_cache is not None and source_scheme != 'http' and source_scheme != 'https':
+            # upload from the cached copy, only downloading a missing or stale one
+            uri, version, download = self._blob_cache_entry(
+                source_scheme, source_bucket_name, source_blob_path, **kwargs
+            )
+            with self.blob_cache.open_entry(uri, version, download) as cached_blob_path:
+                with profile(self.profiler, "upload"):
+                    return self._copy_local_to_remote(cached_blob_path, dest_path, checksum, **kwargs)
+
+        max_buffered_chunks = kwargs.get("max_buffered_chunks", DEFAULT_MAX_BUFFERED_CHUNKS)
+        reader_options = dict(kwargs)
+        writer_options = dict(kwargs)
+        if kwargs.get("max_buffer_bytes") is not None:
+            # half of the cap for the pipe, which also holds the chunk its
+            # producer waits to put and the one being consumed, the other
+            # half for the parts of the writer
+            pipe_bytes = kwargs["max_buffer_bytes"] // 2
+            chunk_size = max(1, min(kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE), pipe_bytes // 3))
+            max_buffered_chunks = max(1, min(max_buffered_chunks, pipe_bytes // chunk_size - 2))
+            reader_options["chunk_size"] = chunk_size
+            writer_options["max_buffer_bytes"] = max(1, kwargs["max_buffer_bytes"] - pipe_bytes)
+
+        if source_scheme == 'http' or source_scheme == 'https':
+            chunks = source_client.iter_chunks_uri(source_path, **reader_options)
+        else:
+            chunks = source_client.iter_chunks(
+                source_bucket_name, source_blob_path, **reader_options
+            )
+
+        hasher = None
+        if checksum:
+            hasher = self._new_hasher(dest_path)
+            chunks = hashed_chunks(chunks, hasher)
+
+        # the upload consumes chunks while the download is still producing them
+        pipe = ChunkPipe(chunks, max_buffered_chunks=max_buffered_chunks)
+        try:
+            with profile(self.profiler, "stream"):
+                if dest_scheme == 'http' or dest_scheme == 'https':
+                    # presigned PUT URLs need a Content-Length, not a chunked body
+                    if source_scheme == 'http' or source_scheme == 'https':
+                        size = source_client.stat_uri(source_path).size
+                    else:
+                        size = source_client.stat_blob(source_bucket_name, source_blob_path).size
+                    dest_client.write_chunks_uri(pipe, dest_path, size=size, **writer_options)
+                else:
+                    # the upload knows the part boundaries of the multipart ETag
+                    dest_client.write_chunks(
+                        dest_bucket_name, pipe, dest_blob_path, part_hasher=hasher, **writer_options
+                    )
         finally:
-            if os.path.exists(local_blob_path):
-                os.remove(local_blob_path)
+            pipe.close()
+        return hasher.checksums() if hasher is not None else None
+
+    def _source_checksums(self, source_client, source_bucket_name, source_blob_path):
+        checksums = source_client.stat_checksums(source_bucket_name, source_blob_path)
+        return checksums._replace(multipart_etag=None)
 
     def copyto(self, source_path, dest_path, **kwargs):
         """
-        limitaions: only support single file copy right now
+        copy a single file, use copy for everything under a prefix or directory
+
+        copies between two buckets of the same provider are done server-side,
+        server_side_copy=False streams the bytes through this host instead
+        ingest_from_url=True lets the destination fetch other remote sources
+        from a presigned URL where the backend supports it (Azure), so the
+        bytes do not pass through this host either
+        max_buffer_bytes caps the bytes one transfer holds in memory, parts
+        are made smaller or fewer to fit
+        checksum=True hashes the bytes while they are transferred and checks
+        them against the checksums the provider reports (md5, the multipart
+        ETag of S3, crc32c of GCS, crc64ecma of OSS and TOS), raising IOError
+        on a mismatch; skip_identical=True skips the copy when the destination
+        already has the same size and md5
+        resumable=True keeps a journal of the parts of a bucket upload or
+        download in ~/.cloud_storage_slim/journals, a failed copyto retried
+        with the same arguments only transfers the missing parts
+
+        returns a TransferResult
         """
+        if not self.observers:
+            return self._copyto(source_path, dest_path, **kwargs)
+        started = time.monotonic()
+        error = None
+        try:
+            with profile(self.profiler, "copyto", source=source_path, dest=dest_path):
+                return self._copyto(source_path, dest_path, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = time.monotonic() - started
+            for observer in self.observers:
+                observer.on_transfer(source_path, dest_path, seconds, error)
+
+    def _copyto(self, source_path, dest_path, **kwargs):
+        checksum = kwargs.pop("checksum", False)
+        if kwargs.pop("skip_identical", False):
+            with profile(self.profiler, "skip_identical"):
+                md5 = self._identical_md5(source_path, dest_path)
+            if md5 is not None:
+                return TransferResult(source_path, dest_path, md5, True, True)
+        if self.memory_budget is not None:
+            kwargs.setdefault("memory_budget", self.memory_budget)
+        if kwargs.pop("resumable", False):
+            journal = self._transfer_journal(source_path, dest_path, **kwargs)
+            if journal is not None:
+                kwargs["journal"] = journal
+
+        checksums = None
+        remote_path = None
         if check_source_local_file(source_path): # source is local file
             if check_dest_local_file(dest_path):
                 # dest is local file
                 # local to local
-                shutil.copyfile(source_path, dest_path)
+                with profile(self.profiler, "local_copy"):
+                    shutil.copyfile(source_path, dest_path)
             else:
                 check_remote_file(dest_path) # dest should be valid remote file
                 # local to remote
-                self._copy_local_to_remote(source_path, dest_path, **kwargs)
+                try:
+                    with profile(self.profiler, "upload"):
+                        checksums = self._copy_local_to_remote(source_path, dest_path, checksum, **kwargs)
+                finally:
+                    self._notify_write(dest_path)
+                remote_path = dest_path
         else:
             check_remote_file(source_path) # source should be valid remote file
 
             if check_dest_local_file(dest_path):
                 # dest is local file
                 # remote to local
-                self._copy_remote_to_local(source_path, dest_path, **kwargs)
+                with profile(self.profiler, "download"):
+                    checksums = self._copy_remote_to_local(source_path, dest_path, checksum, **kwargs)
+                remote_path = source_path
             else:
                 check_remote_file(dest_path) # dest should be valid remote file
                 # remote to remote
-                self._copy_remote_to_remote(source_path, dest_path, **kwargs)
+                try:
+                    checksums = self._copy_remote_to_remote(source_path, dest_path, checksum, **kwargs)
+                finally:
+                    self._notify_write(dest_path)
+                remote_path = dest_path
+
+        verified = False
+        if checksums is not None:
+            with profile(self.profiler, "verify_checksums"):
+                verified = self._verify_checksums(remote_path, checksums)
+        return TransferResult(source_path, dest_path, checksums.md5 if checksums is not None else None, verified)
+
+    def _transfer_journal(self, source_path, dest_path, **kwargs):
+        """
+        the TransferJournal of a bucket upload or download, None for copies
+        that cannot resume
+        """
+        header = {
+            "source": source_path,
+            "dest": dest_path,
+            "part_size": kwargs.get("part_size"),
+            "max_buffer_bytes": kwargs.get("max_buffer_bytes"),
+        }
+        if check_source_local_file(source_path):
+            if check_dest_local_file(dest_path) or urlparse(dest_path).scheme in ("http", "https"):
+                return None
+            source_path = header["source"] = os.path.abspath(source_path)
+            stat = os.stat(source_path)
+            header.update(size=stat.st_size, version=stat.st_mtime)
+        else:
+            scheme, bucket_name, blob_path = parse_path_uri(source_path)
+            if not check_dest_local_file(dest_path) or scheme in ("http", "https") or self.blob_cache is not None:
+                return None
+            dest_path = header["dest"] = os.path.abspath(dest_path)
+            blob_info = self._get_client(scheme).stat_blob(bucket_name, blob_path)
+            header.update(size=blob_info.size, version=blob_version(blob_info))
+
+        name = hashlib.sha256(f"{source_path}\n{dest_path}".encode()).hexdigest()
+        return TransferJournal(self._workspace_path("journals", f"{name}.jsonl"), header)
+
+    def cleanup_multipart_uploads(self, remote_path, older_than=DEFAULT_ABANDONED_UPLOAD_AGE):
+        """
+        abort the multipart uploads under remote_path started more than
+        older_than seconds ago and never completed, e.g. left behind by
+        resumable copies that were not retried; returns their (key, upload_id)
 
-    def ls(self, remote_path, include=""):
+        Azure discards uncommitted blocks by itself and is not supported
+        """
+        check_remote_file(remote_path)
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_client(scheme)
+        now = time.time()
+        aborted = []
+        for key, upload_id, initiated in list(client.list_multipart_uploads(bucket_name, blob_path)):
+            if initiated is not None and now - initiated < older_than:
+                continue
+            client.create_multipart_upload(bucket_name, key, upload_id=upload_id).abort()
+            aborted.append((key, upload_id))
+        return aborted
+
+    def _stat_path(self, path):
+        """
+        BlobInfo of a local file or remote blob, None when it does not exist
+        """
+        if not urlparse(path).scheme or path.startswith("file://"):
+            if path.startswith("file://"):
+                path = urlparse(path).path
+            if not os.path.isfile(path):
+                return None
+            stat = os.stat(path)
+            return BlobInfo(path, stat.st_size, None, stat.st_mtime)
+
+        scheme, bucket_name, blob_path = parse_path_uri(path)
+        if scheme == 'http' or scheme == 'https':
+            return None
+        try:
+            return self._get_client(scheme).stat_blob(bucket_name, blob_path)
+        except Exception:
+            # providers raise their own not found errors
+            return None
+
+    def _identical_md5(self, source_path, dest_path):
+        """
+        the md5 shared by source and dest when both have the same size and
+        content, None when they differ or it cannot be told without copying
+        """
+        dest_info = self._stat_path(dest_path)
+        if dest_info is None:
+            return None
+        source_info = self._stat_path(source_path)
+        if source_info is None or source_info.size != dest_info.size:
+            return None
+        # local files are only hashed when the other side has an md5
+        if check_source_local_file(source_path) and dest_info.md5 is not None:
+            source_info = source_info._replace(md5=file_md5(source_info.key))
+        if check_dest_local_file(dest_path) and source_info.md5 is not None:
+            dest_info = dest_info._replace(md5=file_md5(dest_info.key))
+        if source_info.md5 is not None and source_info.md5 == dest_info.md5:
+            return source_info.md5
+        return None
+
+    def _verify_checksums(self, remote_path, checksums):
+        """
+        compare checksums with the ones the provider reports for remote_path,
+        returns whether any of them could be checked
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        if scheme == 'http' or scheme == 'https':
+            return False
+        try:
+            remote_checksums = self._get_client(scheme).stat_checksums(bucket_name, blob_path)
+        except Exception:
+            # providers raise their own not found errors
+            return False
+        verified = False
+        for name, value, remote_value in zip(Checksums._fields, checksums, remote_checksums):
+            if value is None or remote_value is None:
+                continue
+            if value != remote_value:
+                raise IOError(
+                    f"Checksum mismatch on {remote_path}: transferred {name} {value}, provider reports {remote_value}"
+                )
+            verified = True
+        return verified
+
+    def open(self, path, mode="rb", **kwargs):
+        """
+        open a blob as a binary file without copying it to disk first
+
+        "rb" returns a seekable reader served by ranged reads, tuned with
+        block_size, max_read_ahead and cache_blocks (see RemoteFileReader)
+        "wb" returns a writer uploading parts while they are written, the
+        blob is committed when the writer is closed, see RemoteFileWriter
+        local paths are opened with the builtin open
+        """
+        if mode not in ("rb", "wb"):
+            raise ValueError(f"Unsupported mode: {mode}, only 'rb' and 'wb' are supported")
+        if not urlparse(path).scheme or path.startswith("file://"):
+            if path.startswith("file://"):
+                path = urlparse(path).path
+            return io.open(path, mode)
+
+        check_remote_file(path)
+        scheme, bucket_name, blob_path = parse_path_uri(path)
+        client = self._get_client(scheme)
+        if mode == "rb":
+            reader_options = {
+                k: v for k, v in kwargs.items() if k in ["block_size", "max_read_ahead", "cache_blocks"]
+            }
+            if scheme == 'http' or scheme == 'https':
+                size = client.stat_uri(path).size
+                read_range = lambda start, end: client.read_range_uri(path, start, end)
+            else:
+                size = client.stat_blob(bucket_name, blob_path).size
+                read_range = lambda start, end: client.read_range(bucket_name, blob_path, start, end)
+            reader = RemoteFileReader(read_range, size, **reader_options)
+            return io.BufferedReader(reader, buffer_size=reader.block_size)
+
+        if self.memory_budget is not None:
+            kwargs.setdefault("memory_budget", self.memory_budget)
+        writer_options = {k: v for k, v in kwargs.items() if k in ["chunk_size", "max_buffered_chunks"]}
+
+        def write_chunks(chunks):
+            try:
+                if scheme == 'http' or scheme == 'https':
+                    client.write_chunks_uri(chunks, path, **kwargs)
+                else:
+                    client.write_chunks(bucket_name, chunks, blob_path, **kwargs)
+            finally:
+                self._notify_write(path)
+
+        return RemoteFileWriter(write_chunks, **writer_options)
+
+    def get_bytes(self, remote_path, **kwargs):
+        """
+        read a whole blob into memory with one request, nothing touches disk
+        """
+        check_remote_file(remote_path)
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_client(scheme)
+        if scheme == 'http' or scheme == 'https':
+            return b"".join(client.iter_chunks_uri(remote_path, **kwargs))
+        return client.download_bytes(bucket_name, blob_path, **kwargs)
+
+    def put_bytes(self, remote_path, data, **kwargs):
+        """
+        write data, any bytes-like object, to a blob with one request
+        """
+        check_remote_file(remote_path)
+        if not isinstance(data, (bytes, bytearray)):
+            data = memoryview(data).tobytes()
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_client(scheme)
+        try:
+            if scheme == 'http' or scheme == 'https':
+                client.write_chunks_uri([data], remote_path, size=len(data), **kwargs)
+            else:
+                client.upload_bytes(bucket_name, data, blob_path, **kwargs)
+        finally:
+            self._notify_write(remote_path)
+
+    def get_stream(self, remote_path, **kwargs):
+        """
+        iterate over the content of a blob in chunks of chunk_size bytes
+        """
+        check_remote_file(remote_path)
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_client(scheme)
+        if scheme == 'http' or scheme == 'https':
+            return client.iter_chunks_uri(remote_path, **kwargs)
+        return client.iter_chunks(bucket_name, blob_path, **kwargs)
+
+    def put_stream(self, remote_path, chunks, **kwargs):
+        """
+        write an iterable of bytes-like chunks or a readable binary file to a
+        blob, parts are uploaded while the chunks are produced
+        """
+        check_remote_file(remote_path)
+        if hasattr(chunks, "read"):
+            chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+            chunks = iter(functools.partial(chunks.read, chunk_size), b"")
+        if self.memory_budget is not None:
+            kwargs.setdefault("memory_budget", self.memory_budget)
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_client(scheme)
+        try:
+            if scheme == 'http' or scheme == 'https':
+                client.write_chunks_uri(chunks, remote_path, **kwargs)
+            else:
+                client.write_chunks(bucket_name, chunks, blob_path, **kwargs)
+        finally:
+            self._notify_write(remote_path)
+
+    def read_ranges(self, remote_path, ranges, **kwargs):
+        """
+        read many (offset, length) ranges of one blob, returns a memoryview
+        per range in input order
+
+        ranges less than max_gap bytes apart are fetched by one request of at
+        most max_coalesced_size bytes, and up to parallelism requests run at
+        once, see segmented.read_ranges
+        """
+        check_remote_file(remote_path)
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_client(scheme)
+        if scheme == 'http' or scheme == 'https':
+            read_range = lambda start, end: client.read_range_uri(remote_path, start, end)
+        else:
+            read_range = lambda start, end: client.read_range(bucket_name, blob_path, start, end)
+        read_options = {k: v for k, v in kwargs.items() if k in ["max_gap", "max_coalesced_size", "parallelism"]}
+        return read_ranges(read_range, ranges, **read_options)
+
+    def _notify_write(self, path, deleted=False):
+        """
+        called after every write to a remote path, even a failed one since
+        it may have left a partial object behind
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(path)
+        if scheme == 'http' or scheme == 'https':
+            return
+        if self.listing_cache is not None:
+            self.listing_cache.invalidate(_cache_scheme(scheme), bucket_name, blob_path)
+        if self.bucket_index is not None and self.bucket_index.covers(_cache_scheme(scheme), bucket_name, blob_path):
+            blob_info = None
+            if not deleted:
+                try:
+                    blob_info = self._get_client(scheme).stat_blob(bucket_name, blob_path)
+                except Exception:
+                    # the write failed or the blob is gone, drop it from the index
+                    pass
+            if blob_info is None:
+                self.bucket_index.delete(_cache_scheme(scheme), bucket_name, blob_path)
+            else:
+                self.bucket_index.put(_cache_scheme(scheme), bucket_name, blob_info)
+
+    def _lookup_blob_infos(self, scheme, bucket_name, pattern):
+        """
+        the listing of pattern from the bucket index or the listing cache,
+        None when neither has it
+        """
+        blob_infos = None
+        if self.bucket_index is not None:
+            blob_infos = self.bucket_index.list_blob_infos(_cache_scheme(scheme), bucket_name, pattern)
+        if blob_infos is None and self.listing_cache is not None:
+            blob_infos = self.listing_cache.get(_cache_scheme(scheme), bucket_name, pattern)
+        return blob_infos
+
+    def _list_blob_infos(self, scheme, bucket_name, pattern, parallel=1):
+        blob_infos = self._lookup_blob_infos(scheme, bucket_name, pattern)
+        if blob_infos is not None:
+            return blob_infos
+        blob_infos = list(self._iter_blobs(scheme, bucket_name, pattern, parallel))
+        if self.listing_cache is not None:
+            self.listing_cache.put(_cache_scheme(scheme), bucket_name, pattern, blob_infos)
+        return blob_infos
+
+    def _get_first_blob(self, scheme, bucket_name, pattern):
+        if self.bucket_index is not None:
+            blob_infos = self.bucket_index.list_blob_infos(_cache_scheme(scheme), bucket_name, pattern, limit=1)
+            if blob_infos is not None:
+                return blob_infos[0].key if blob_infos else None
+
+        client = self._get_client(scheme)
+        if self.listing_cache is None:
+            return client.get_first_blob(bucket_name, pattern)
+
+        blob_infos = self.listing_cache.get(_cache_scheme(scheme), bucket_name, pattern, first_only=True)
+        if blob_infos is None:
+            # cache only the first blob instead of listing the whole prefix
+            blob_infos = list(itertools.islice(client.iter_blobs(bucket_name, pattern), 1))
+            self.listing_cache.put(_cache_scheme(scheme), bucket_name, pattern, blob_infos, complete=False)
+        return blob_infos[0].key if blob_infos else None
+
+    def _iter_blobs(self, scheme, bucket_name, pattern, parallel=1):
+        client = self._get_client(scheme)
+        if parallel > 1:
+            return iter_blobs_parallel(client, bucket_name, pattern, parallel)
+        return client.iter_blobs(bucket_name, pattern)
+
+    def _iter_file_infos(self, path, parallel=1):
+        """
+        yield BlobInfo for every file under a local directory or remote
+        prefix, keys are relative to it and always use "/"
+        """
+        if not urlparse(path).scheme or path.startswith("file://"):
+            if path.startswith("file://"):
+                path = urlparse(path).path
+            local_dir = os.path.abspath(os.path.expanduser(path))
+            for root, _, files in os.walk(local_dir):
+                for filename in files:
+                    local_file_path = os.path.join(root, filename)
+                    stat = os.stat(local_file_path)
+                    relative_path = os.path.relpath(local_file_path, local_dir)
+                    yield BlobInfo(relative_path.replace(os.sep, "/"), stat.st_size, None, stat.st_mtime)
+            return
+
+        check_remote_file(path)
+        scheme, bucket_name, blob_path = parse_path_uri(path)
+        if blob_path and not blob_path.endswith("/"):
+            blob_path = f"{blob_path}/"
+        for blob_info in self._iter_blobs(scheme, bucket_name, blob_path, parallel):
+            if blob_info.key.endswith("/"):
+                # zero-byte "directory" placeholder
+                continue
+            yield blob_info._replace(key=blob_info.key[len(blob_path):])
+
+    def _join_path(self, path, relative_path):
+        if urlparse(path).scheme and not path.startswith("file://"):
+            return f"{path.rstrip('/')}/{relative_path}"
+
+        if path.startswith("file://"):
+            path = urlparse(path).path
+        return os.path.join(os.path.abspath(os.path.expanduser(path)), *relative_path.split("/"))
+
+    def _run_concurrently(self, func, args_list, workers):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(func, *args) for args in args_list]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _copy_files(self, source_path, dest_path, sized_relative_paths, transfers, **kwargs):
+        """
+        copy (relative path, size) files from the source to the dest directory
+        or prefix, raises the first error once every other copy has finished
+        """
+        def items():
+            for relative_path, size in sized_relative_paths:
+                file_dest_path = self._join_path(dest_path, relative_path)
+                if not urlparse(file_dest_path).scheme:
+                    os.makedirs(os.path.dirname(file_dest_path), exist_ok=True)
+                yield self._join_path(source_path, relative_path), file_dest_path, size
+
+        results = self.copy_many(items(), transfers=transfers, **kwargs)
+        for result in results:
+            if result.error is not None:
+                raise result.error
+        return [(result.source, result.dest) for result in results]
+
+    def copy_many(
+        self,
+        pairs,
+        transfers=DEFAULT_TRANSFERS,
+        per_bucket_transfers=DEFAULT_PER_BUCKET_TRANSFERS,
+        limits=None,
+        order="small_first",
+        **kwargs,
+    ):
+        """
+        copy every (source, dest) or (source, dest, size) pair with copyto
+        under one TransferScheduler, see it for the concurrency limits and
+        ordering; pairs may be a lazy iterable, it is only read as far as the
+        scheduler has room
+
+        returns a CopyResult per pair in input order, a failed copy carries
+        its exception instead of stopping the batch
+        """
+        scheduler = TransferScheduler(transfers, per_bucket_transfers, limits, order)
+
+        def items():
+            for pair in pairs:
+                file_source_path, file_dest_path = pair[0], pair[1]
+                size = pair[2] if len(pair) > 2 else None
+                if size is None and not urlparse(file_source_path).scheme and os.path.isfile(file_source_path):
+                    size = os.path.getsize(file_source_path)
+                yield file_source_path, file_dest_path, size
+
+        return scheduler.run(
+            lambda file_source_path, file_dest_path: self.copyto(file_source_path, file_dest_path, **kwargs),
+            items(),
+        )
+
+    def _delete_file(self, path):
+        if not urlparse(path).scheme or path.startswith("file://"):
+            if path.startswith("file://"):
+                path = urlparse(path).path
+            os.remove(path)
+            return
+        scheme, bucket_name, blob_path = parse_path_uri(path)
+        try:
+            self._get_client(scheme).delete_blob(bucket_name, blob_path)
+        finally:
+            self._notify_write(path, deleted=True)
+
+    def copy(self, source_path, dest_path, transfers=4, checkers=8, **kwargs):
+        """
+        copy every file under a local directory or remote prefix to the
+        destination directory or prefix, like rclone copy
+
+        up to `transfers` files are copied concurrently, smallest first, while
+        the listing is still running, remote listings are split into
+        `checkers` concurrent shards, the remaining kwargs are passed to
+        copyto for every file
+        """
+        sized_relative_paths = (
+            (blob_info.key, blob_info.size) for blob_info in self._iter_file_infos(source_path, checkers)
+        )
+        return self._copy_files(source_path, dest_path, sized_relative_paths, transfers, **kwargs)
+
+    def sync(self, source_path, dest_path, delete=False, transfers=4, checkers=8, **kwargs):
+        """
+        make the destination directory or prefix match the source, like rclone sync
+
+        both sides are listed once, in `checkers` concurrent shards, and only
+        new or changed files are copied, a file counts as unchanged when its
+        size and a checksum both sides have match, or its ETag between buckets
+        of the same provider; local files are hashed for the comparison.
+        files that only exist on the destination are deleted when `delete` is set
+        returns (copied (source, dest) pairs, deleted dest paths)
+        """
+        source_sizes = {}
+
+        def source_infos():
+            for blob_info in self._iter_file_infos(source_path, checkers):
+                source_sizes[blob_info.key] = blob_info.size
+                yield blob_info
+
+        def local_md5(path):
+            # local listings carry no checksum, files are hashed when compared
+            if urlparse(path).scheme and not path.startswith("file://"):
+                return None
+            return lambda relative_path: file_md5(self._join_path(path, relative_path))
+
+        source_scheme, dest_scheme = urlparse(source_path).scheme, urlparse(dest_path).scheme
+        # ETags are only comparable between buckets of the same provider
+        same_provider = source_scheme not in ("", "file") and (
+            _cache_scheme(source_scheme) == _cache_scheme(dest_scheme)
+        )
+        dest_infos = self._iter_file_infos(dest_path, checkers)
+        relative_paths_to_copy, relative_paths_to_delete = diff_blob_infos(
+            source_infos(), dest_infos, same_provider, local_md5(source_path), local_md5(dest_path)
+        )
+
+        pairs = self._copy_files(
+            source_path,
+            dest_path,
+            ((relative_path, source_sizes[relative_path]) for relative_path in relative_paths_to_copy),
+            transfers,
+            **kwargs,
+        )
+
+        deleted_paths = []
+        if delete:
+            deleted_paths = [
+                self._join_path(dest_path, relative_path) for relative_path in relative_paths_to_delete
+            ]
+            self._run_concurrently(self._delete_file, [(path,) for path in deleted_paths], transfers)
+        return pairs, deleted_paths
+
+    def ls(self, remote_path, include="", stream=False, detail=False, parallel=1):
+        """
+        list the blobs whose names start with the path of remote_path plus include
+
+        stream=True returns a lazy iterator that walks the listing page by
+        page, so the first results arrive immediately and memory stays flat
+        detail=True returns BlobInfo records instead of names
+        parallel > 1 splits the listing into prefix shards walked concurrently,
+        results keep the key order
+        prefixes covered by the bucket_index are answered from it, with a
+        listing_cache full listings are served from and stored in the cache,
+        streamed listings only read from it
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        pattern = f"{blob_path}{include}"
+        if not stream:
+            with profile(self.profiler, "ls", scheme=scheme, bucket=bucket_name, pattern=pattern) as span:
+                blob_infos = self._list_blob_infos(scheme, bucket_name, pattern, parallel)
+                if span is not None:
+                    span.attributes["count"] = len(blob_infos)
+        else:
+            blob_infos = self._lookup_blob_infos(scheme, bucket_name, pattern)
+            if blob_infos is None:
+                blob_infos = self._iter_blobs(scheme, bucket_name, pattern, parallel)
+            else:
+                blob_infos = iter(blob_infos)
+        blobs = blob_infos if detail else (blob_info.key for blob_info in blob_infos)
+        return blobs if stream else list(blobs)
+
+    def exists(self, remote_path):
+        """
+        check whether a remote blob exists, answered by the bucket index or
+        the listing cache when they cover the path
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        # a key sorts before every other key it is a prefix of
+        return self._get_first_blob(scheme, bucket_name, blob_path) == blob_path
+
+    def refresh_index(self, remote_path, incremental=False):
+        """
+        (re)build the bucket index of every blob under remote_path, see
+        BucketIndex.refresh for incremental, returns the number of blobs listed
+        """
+        if self.bucket_index is None:
+            raise ValueError("refresh_index requires a CloudStorageSlim created with a bucket_index")
         scheme, bucket_name, blob_path = parse_path_uri(remote_path)
         client = self._get_client(scheme)
-        return client.list_blobs(bucket_name, f"{blob_path}{include}")
+        return self.bucket_index.refresh(client, _cache_scheme(scheme), bucket_name, blob_path, incremental)
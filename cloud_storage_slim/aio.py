@@ -0,0 +1,451 @@
+import os
+import time
+import asyncio
+import functools
+import itertools
+import importlib.util
+import concurrent.futures
+from urllib.parse import urlparse
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import check_source_local_file, check_dest_local_file, parse_path_uri
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.checksum import TransferResult
+from cloud_storage_slim.memory import fit_buffer
+from cloud_storage_slim.segmented import split_ranges, DEFAULT_PART_SIZE, DEFAULT_PARALLELISM
+from cloud_storage_slim.multipart import fit_part_size, _read_range
+
+DEFAULT_MAX_WORKERS = 32
+# listing results are moved from the executor to the event loop in batches
+LS_BATCH_SIZE = 1000
+# the SDK each scheme with a native asyncio client needs
+ASYNC_CLIENT_MODULES = {"s3": "aiobotocore", "az": "azure.storage.blob.aio"}
+
+
+class AsyncCloudStorageSlim:
+    """
+    asyncio front end of CloudStorageSlim.
+
+    S3 and Azure requests are awaited on the event loop with aiobotocore and
+    azure.storage.blob.aio when they are installed: downloads and uploads
+    between a bucket and a local file (as concurrent ranged reads and
+    multipart uploads), get_bytes, put_bytes, exists and ls. http(s)
+    transfers to and from local files use aiohttp the same way. These
+    requests go through the Retrier and Throttle of their bucket or host
+    shared with the blocking clients of the wrapped CloudStorageSlim, and
+    transfers are reported to its observers; local file reads and writes
+    are short calls on the executor.
+
+    GCS, OSS and TOS have no asyncio SDK, so their calls, bucket to bucket
+    copies, copy, sync and the options the native paths do not implement
+    (checksum, skip_identical, resumable, memory budgets, the blob cache,
+    listings served by the bucket index or listing cache and parallel ones)
+    run the blocking CloudStorageSlim call on a shared executor of
+    `max_workers` threads, so any number of awaiting tasks share a bounded
+    number of threads.
+    """
+
+    def __init__(self, cloud_storage_slim=None, max_workers=DEFAULT_MAX_WORKERS, **kwargs):
+        """
+        cloud_storage_slim: the CloudStorageSlim to wrap, created from kwargs
+        when not given
+        """
+        self.cloud_storage_slim = cloud_storage_slim or CloudStorageSlim(**kwargs)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._aiohttp = None
+        if importlib.util.find_spec("aiohttp") is not None:
+            self._aiohttp = importlib.import_module("aiohttp")
+        self._http_session = None
+        # native asyncio clients, created on first use
+        self.s3_client = None
+        self.az_client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+        for client in (self.s3_client, self.az_client):
+            if client is not None:
+                await client.close()
+        self.s3_client = None
+        self.az_client = None
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def _get_http_session(self):
+        if self._http_session is None:
+            self._http_session = self._aiohttp.ClientSession()
+        return self._http_session
+
+    def _get_async_client(self, scheme):
+        """
+        the native asyncio client of scheme, None when it has none or its
+        SDK is not installed
+        """
+        if scheme == "s3":
+            if self.s3_client is None and _installed(ASYNC_CLIENT_MODULES[scheme]):
+                from .aio_amazon_s3 import AsyncAmazonS3Storage
+                self.s3_client = AsyncAmazonS3Storage(**self._client_options())
+            return self.s3_client
+        elif scheme == "az":
+            if self.az_client is None and _installed(ASYNC_CLIENT_MODULES[scheme]):
+                from .aio_azure_storage import AsyncAzureStorage
+                self.az_client = AsyncAzureStorage(**self._client_options())
+            return self.az_client
+        return None
+
+    def _client_options(self):
+        return {"pool_maxsize": self.cloud_storage_slim.pool_maxsize, "keep_alive": self.cloud_storage_slim.keep_alive}
+
+    def _transfer_options(self, scheme, bucket_name, direction):
+        """
+        (retrier, throttle) of bucket_name, or of the host of a URI, shared
+        with the blocking clients of the CloudStorageSlim
+        """
+        return (
+            self.cloud_storage_slim.retrier(scheme, bucket_name),
+            self.cloud_storage_slim.throttle(scheme, bucket_name, direction),
+        )
+
+    def _http_transfer_options(self, remote_blob_uri, direction):
+        parsed = urlparse(remote_blob_uri)
+        return self._transfer_options(parsed.scheme, parsed.netloc, direction)
+
+    def _uses_caches(self):
+        return self.cloud_storage_slim.listing_cache is not None or self.cloud_storage_slim.bucket_index is not None
+
+    async def _notify_write(self, remote_path):
+        # the bucket index stats the blob with the blocking client
+        if self._uses_caches():
+            await self._run(self.cloud_storage_slim._notify_write, remote_path)
+
+    async def _download_uri(self, remote_blob_uri, local_blob_path, **kwargs):
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        timeout = self._aiohttp.ClientTimeout(total=kwargs["timeout"]) if "timeout" in kwargs else None
+        retrier, throttle = self._http_transfer_options(remote_blob_uri, "read")
+
+        async def download_uri():
+            # same as HttpRemoteFile, certificates are not verified
+            async with self._get_http_session().get(remote_blob_uri, ssl=False, timeout=timeout) as response:
+                response.raise_for_status()
+                with open(local_blob_path, "wb") as f:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        await _throttle_bytes(throttle, len(chunk))
+                        await self._run(f.write, chunk)
+
+        await retrier.call_async(download_uri)
+
+    async def _upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        timeout = self._aiohttp.ClientTimeout(total=kwargs["timeout"]) if "timeout" in kwargs else None
+        retrier, throttle = self._http_transfer_options(remote_blob_uri, "write")
+        # presigned PUT URLs need a Content-Length, not a chunked body
+        headers = dict(kwargs.get("headers") or {})
+        headers["Content-Length"] = str(os.path.getsize(local_blob_path))
+
+        async def upload_uri():
+            with open(local_blob_path, "rb") as f:
+
+                async def chunks():
+                    while True:
+                        data = await self._run(f.read, chunk_size)
+                        if not data:
+                            return
+                        await _throttle_bytes(throttle, len(data))
+                        yield data
+
+                async with self._get_http_session().put(
+                    remote_blob_uri, data=chunks(), headers=headers, ssl=False, timeout=timeout
+                ) as response:
+                    response.raise_for_status()
+
+        # a whole object PUT replaces the object, repeating it is harmless
+        await retrier.call_async(upload_uri)
+
+    async def _download(
+        self,
+        client,
+        remote_path,
+        local_path,
+        parallelism=DEFAULT_PARALLELISM,
+        part_size=DEFAULT_PART_SIZE,
+        max_buffer_bytes=None,
+        **kwargs,
+    ):
+        """
+        download a blob as concurrent ranged reads like
+        segmented.segmented_download, at most `parallelism` parts in flight
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        retrier, throttle = self._transfer_options(scheme, bucket_name, "read")
+        parallelism, part_size = fit_buffer(parallelism, part_size, max_buffer_bytes)
+        blob_info = await retrier.call_async(client.stat_blob, bucket_name, blob_path)
+        await self._run(_allocate, local_path, blob_info.size)
+        slots = asyncio.Semaphore(parallelism)
+
+        async def download_part(start, end):
+            async with slots:
+                await _throttle_bytes(throttle, end - start)
+                data = await retrier.call_async(client.read_range, bucket_name, blob_path, start, end)
+                if len(data) != end - start:
+                    raise IOError(f"Short read on range [{start}, {end}) of {blob_path}: got {len(data)} bytes")
+                await self._run(_write_range, local_path, start, data)
+
+        await _gather_all(download_part(start, end) for start, end in split_ranges(blob_info.size, part_size))
+
+    async def _upload(
+        self,
+        client,
+        local_path,
+        remote_path,
+        parallelism=DEFAULT_PARALLELISM,
+        part_size=DEFAULT_PART_SIZE,
+        max_buffer_bytes=None,
+        **kwargs,
+    ):
+        """
+        upload a local file like multipart.multipart_upload_file: with one
+        request when it fits in a part, else as concurrent parts
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        retrier, throttle = self._transfer_options(scheme, bucket_name, "write")
+        parallelism, part_size = fit_buffer(parallelism, part_size, max_buffer_bytes)
+        size = os.path.getsize(local_path)
+        if size <= part_size:
+            data = await self._run(_read_range, local_path, 0, size)
+            await _throttle_bytes(throttle, len(data))
+            await retrier.call_async(client.upload_bytes, bucket_name, data, blob_path)
+            return
+
+        upload = await retrier.call_async(client.create_multipart_upload, bucket_name, blob_path, idempotent=False)
+        part_size = fit_part_size(size, part_size, upload.max_parts)
+        slots = asyncio.Semaphore(parallelism)
+
+        async def upload_part(part_number, start, end):
+            async with slots:
+                data = await self._run(_read_range, local_path, start, end)
+                await _throttle_bytes(throttle, len(data))
+                return part_number, await retrier.call_async(upload.upload_part, part_number, data)
+
+        try:
+            parts = await _gather_all(
+                upload_part(part_number, start, end)
+                for part_number, (start, end) in enumerate(split_ranges(size, part_size), start=1)
+            )
+            await retrier.call_async(upload.complete, parts, idempotent=False)
+        except BaseException:
+            await retrier.call_async(upload.abort)
+            raise
+
+    async def _upload_to(self, local_path, remote_path, **kwargs):
+        try:
+            await self._upload(self._get_async_client(urlparse(remote_path).scheme), local_path, remote_path, **kwargs)
+        finally:
+            await self._notify_write(remote_path)
+
+    async def _download_from(self, remote_path, local_path, **kwargs):
+        await self._download(self._get_async_client(urlparse(remote_path).scheme), remote_path, local_path, **kwargs)
+
+    def _native_transfer(self, source_path, dest_path, **kwargs):
+        """
+        the coroutine function doing a copyto on the event loop, None when
+        it runs on the executor
+        """
+        if kwargs.get("skip_identical") or kwargs.get("checksum") or kwargs.get("resumable"):
+            return None
+        source_scheme = urlparse(source_path).scheme
+        dest_scheme = urlparse(dest_path).scheme
+        if check_dest_local_file(dest_path) and not check_source_local_file(source_path):
+            if source_scheme in ("http", "https"):
+                return self._download_uri if self._aiohttp is not None else None
+            if self.cloud_storage_slim.blob_cache is not None or self._uses_memory_budget(kwargs):
+                return None
+            return self._download_from if self._get_async_client(source_scheme) is not None else None
+        if check_source_local_file(source_path) and not check_dest_local_file(dest_path):
+            if dest_scheme in ("http", "https"):
+                return self._upload_uri if self._aiohttp is not None else None
+            if self._uses_memory_budget(kwargs):
+                return None
+            return self._upload_to if self._get_async_client(dest_scheme) is not None else None
+        return None
+
+    def _uses_memory_budget(self, kwargs):
+        # MemoryBudget.acquire blocks the thread it is called on
+        return kwargs.get("memory_budget") is not None or self.cloud_storage_slim.memory_budget is not None
+
+    async def _observed_copyto(self, transfer, source_path, dest_path, **kwargs):
+        """
+        a copyto done on the event loop, reported to the observers like the
+        ones of CloudStorageSlim; checksums are not verified on this path
+        """
+        started = time.monotonic()
+        error = None
+        try:
+            await transfer(source_path, dest_path, **kwargs)
+            return TransferResult(source_path, dest_path)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = time.monotonic() - started
+            for observer in self.cloud_storage_slim.observers:
+                observer.on_transfer(source_path, dest_path, seconds, error)
+
+    async def copyto(self, source_path, dest_path, **kwargs):
+        """
+        returns a TransferResult, see CloudStorageSlim.copyto
+        """
+        transfer = self._native_transfer(source_path, dest_path, **kwargs)
+        if transfer is not None:
+            return await self._observed_copyto(transfer, source_path, dest_path, **kwargs)
+        return await self._run(self.cloud_storage_slim.copyto, source_path, dest_path, **kwargs)
+
+    async def download(self, remote_path, local_path, **kwargs):
+        if not check_dest_local_file(local_path):
+            raise ValueError(f"Invalid local destination: {local_path}")
+        return await self.copyto(remote_path, local_path, **kwargs)
+
+    async def upload(self, local_path, remote_path, **kwargs):
+        if not check_source_local_file(local_path):
+            raise ValueError(f"Invalid local source: {local_path}")
+        return await self.copyto(local_path, remote_path, **kwargs)
+
+    async def copy(self, source_path, dest_path, **kwargs):
+        return await self._run(self.cloud_storage_slim.copy, source_path, dest_path, **kwargs)
+
+    async def sync(self, source_path, dest_path, **kwargs):
+        return await self._run(self.cloud_storage_slim.sync, source_path, dest_path, **kwargs)
+
+    async def get_bytes(self, remote_path, **kwargs):
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_async_client(scheme)
+        if client is None:
+            return await self._run(self.cloud_storage_slim.get_bytes, remote_path, **kwargs)
+        retrier, throttle = self._transfer_options(scheme, bucket_name, "read")
+        data = await retrier.call_async(client.download_bytes, bucket_name, blob_path)
+        await _throttle_bytes(throttle, len(data))
+        return data
+
+    async def put_bytes(self, remote_path, data, **kwargs):
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_async_client(scheme)
+        if client is None:
+            return await self._run(self.cloud_storage_slim.put_bytes, remote_path, data, **kwargs)
+        if not isinstance(data, (bytes, bytearray)):
+            data = memoryview(data).tobytes()
+        retrier, throttle = self._transfer_options(scheme, bucket_name, "write")
+        try:
+            await _throttle_bytes(throttle, len(data))
+            # a whole object PUT replaces the object, repeating it is harmless
+            await retrier.call_async(client.upload_bytes, bucket_name, data, blob_path)
+        finally:
+            await self._notify_write(remote_path)
+
+    async def exists(self, remote_path):
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_async_client(scheme)
+        if client is None or self._uses_caches():
+            return await self._run(self.cloud_storage_slim.exists, remote_path)
+
+        async def get_first_blob():
+            async for blob_info in client.iter_blobs(bucket_name, blob_path):
+                return blob_info.key
+            return None
+
+        # a key sorts before every other key it is a prefix of
+        return await self.cloud_storage_slim.retrier(scheme, bucket_name).call_async(get_first_blob) == blob_path
+
+    async def _iter_blobs(self, client, scheme, bucket_name, pattern):
+        """
+        like RetryingStorage.iter_blobs, a failed listing resumes after the
+        last key it returned
+        """
+        retrier = self.cloud_storage_slim.retrier(scheme, bucket_name)
+        start_after = None
+        attempt = 0
+        while True:
+            try:
+                async for blob_info in client.iter_blobs(bucket_name, pattern, start_after):
+                    yield blob_info
+                    start_after = blob_info.key
+                    attempt = 0
+                return
+            except Exception as e:
+                if not await retrier.backoff_async(e, attempt, operation="list"):
+                    raise
+                attempt += 1
+
+    async def ls(self, remote_path, include="", detail=False, parallel=1):
+        """
+        async iterator over the listing; with a native client pages are
+        awaited on the event loop, otherwise they are fetched on the
+        executor while the consumer keeps the event loop
+        """
+        scheme, bucket_name, blob_path = parse_path_uri(remote_path)
+        client = self._get_async_client(scheme)
+        if client is not None and parallel == 1 and not self._uses_caches():
+            async for blob_info in self._iter_blobs(client, scheme, bucket_name, f"{blob_path}{include}"):
+                yield blob_info if detail else blob_info.key
+            return
+        blobs = await self._run(
+            self.cloud_storage_slim.ls, remote_path, include, stream=True, detail=detail, parallel=parallel
+        )
+        while True:
+            batch = await self._run(lambda: list(itertools.islice(blobs, LS_BATCH_SIZE)))
+            for blob in batch:
+                yield blob
+            if len(batch) < LS_BATCH_SIZE:
+                return
+
+
+def _installed(module_name):
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except ModuleNotFoundError:
+        # a parent package is missing
+        return False
+
+
+def _allocate(local_blob_path, size):
+    with open(local_blob_path, "wb") as f:
+        f.truncate(size)
+
+
+def _write_range(local_blob_path, start, data):
+    with open(local_blob_path, "r+b") as f:
+        f.seek(start)
+        f.write(data)
+
+
+async def _gather_all(coroutines):
+    """
+    await all coroutines and return their results in order, the first
+    failure cancels the others before it is raised
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _throttle_bytes(throttle, nbytes):
+    """
+    wait until nbytes may be transferred without blocking the event loop,
+    a no-op without a throttle
+    """
+    if throttle is not None:
+        delay = throttle.transfer_delay(nbytes)
+        if delay:
+            await asyncio.sleep(delay)
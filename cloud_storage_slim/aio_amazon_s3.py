@@ -0,0 +1,116 @@
+import asyncio
+import importlib
+import contextlib
+from cloud_storage_slim import DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, normalize_etag, to_timestamp, etag_md5
+
+
+def _blob_info(key, response, size_key):
+    return BlobInfo(
+        key,
+        response[size_key],
+        normalize_etag(response.get("ETag")),
+        to_timestamp(response.get("LastModified")),
+        etag_md5(response.get("ETag")),
+    )
+
+
+class AsyncS3MultipartUpload:
+    max_parts = 10000
+
+    def __init__(self, s3_client, bucket_name, remote_blob_path, upload_id):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.remote_blob_path = remote_blob_path
+        self.upload_id = upload_id
+
+    async def upload_part(self, part_number, data):
+        response = await self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.remote_blob_path,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return response["ETag"]
+
+    async def complete(self, parts):
+        await self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.remote_blob_path,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etag} for n, etag in parts]},
+        )
+
+    async def abort(self):
+        await self.s3_client.abort_multipart_upload(
+            Bucket=self.bucket_name, Key=self.remote_blob_path, UploadId=self.upload_id
+        )
+
+
+class AsyncAmazonS3Storage:
+    """
+    S3 backend of AsyncCloudStorageSlim on aiobotocore, every request is
+    awaited on the event loop. The client is created on first use and
+    released by close.
+    """
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True):
+        botocore_config = importlib.import_module("botocore.config")
+        self._session = importlib.import_module("aiobotocore.session").get_session()
+        self._config = botocore_config.Config(max_pool_connections=pool_maxsize, tcp_keepalive=keep_alive)
+        self._s3_client = None
+        self._exit_stack = contextlib.AsyncExitStack()
+        self._lock = asyncio.Lock()
+
+    async def _client(self):
+        async with self._lock:
+            if self._s3_client is None:
+                self._s3_client = await self._exit_stack.enter_async_context(
+                    self._session.create_client("s3", config=self._config)
+                )
+            return self._s3_client
+
+    async def close(self):
+        await self._exit_stack.aclose()
+        self._s3_client = None
+
+    async def stat_blob(self, bucket_name, remote_blob_path):
+        s3_client = await self._client()
+        response = await s3_client.head_object(Bucket=bucket_name, Key=remote_blob_path)
+        return _blob_info(remote_blob_path, response, "ContentLength")
+
+    async def read_range(self, bucket_name, remote_blob_path, start, end):
+        s3_client = await self._client()
+        response = await s3_client.get_object(
+            Bucket=bucket_name, Key=remote_blob_path, Range=f"bytes={start}-{end - 1}"
+        )
+        async with response["Body"] as body:
+            return await body.read()
+
+    async def download_bytes(self, bucket_name, remote_blob_path):
+        s3_client = await self._client()
+        response = await s3_client.get_object(Bucket=bucket_name, Key=remote_blob_path)
+        async with response["Body"] as body:
+            return await body.read()
+
+    async def upload_bytes(self, bucket_name, data, remote_blob_path):
+        s3_client = await self._client()
+        await s3_client.put_object(Bucket=bucket_name, Key=remote_blob_path, Body=data)
+
+    async def create_multipart_upload(self, bucket_name, remote_blob_path):
+        s3_client = await self._client()
+        response = await s3_client.create_multipart_upload(Bucket=bucket_name, Key=remote_blob_path)
+        return AsyncS3MultipartUpload(s3_client, bucket_name, remote_blob_path, response["UploadId"])
+
+    async def iter_blobs(self, bucket_name, pattern, start_after=None):
+        s3_client = await self._client()
+        list_options = {"StartAfter": start_after} if start_after else {}
+        paginator = s3_client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=bucket_name, Prefix=pattern, **list_options):
+            for item in page.get("Contents", []):
+                yield _blob_info(item["Key"], item, "Size")
+
+    async def delete_blob(self, bucket_name, remote_blob_path):
+        s3_client = await self._client()
+        await s3_client.delete_object(Bucket=bucket_name, Key=remote_blob_path)
@@ -0,0 +1,89 @@
+import os
+import importlib
+from cloud_storage_slim import DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.azure_storage import AzureBlockUpload, AzureStorage
+
+
+class AsyncAzureBlockUpload:
+    """
+    Block blob upload: parts are staged as blocks and committed as a block list.
+    """
+
+    max_parts = AzureBlockUpload.max_parts
+
+    def __init__(self, azure_storage_blob, blob_client):
+        self.azure_storage_blob = azure_storage_blob
+        self.blob_client = blob_client
+
+    async def upload_part(self, part_number, data):
+        block_id = AzureBlockUpload._block_id(part_number)
+        await self.blob_client.stage_block(block_id, data, length=len(data))
+        return block_id
+
+    async def complete(self, parts):
+        block_list = [self.azure_storage_blob.BlobBlock(block_id=block_id) for _, block_id in parts]
+        await self.blob_client.commit_block_list(block_list)
+
+    async def abort(self):
+        # uncommitted blocks are discarded by the service
+        pass
+
+
+class AsyncAzureStorage:
+    """
+    Azure backend of AsyncCloudStorageSlim on azure.storage.blob.aio, every
+    request is awaited on the event loop. Released by close.
+    """
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True):
+        self.azure_storage_blob = importlib.import_module("azure.storage.blob")
+        azure_storage_blob_aio = importlib.import_module("azure.storage.blob.aio")
+        az_account_name = os.environ.get("AZURE_STORAGE_ACCOUNT_NAME")
+        az_account_key = os.environ.get("AZURE_STORAGE_ACCOUNT_KEY")
+        connection_string = (
+            f"DefaultEndpointsProtocol=https;AccountName={az_account_name};"
+            f"AccountKey={az_account_key};EndpointSuffix=core.windows.net"
+        )
+        # the aiohttp transport of the SDK pools connections per client
+        self.blob_service_client = azure_storage_blob_aio.BlobServiceClient.from_connection_string(
+            connection_string, connection_pool_size=pool_maxsize
+        )
+
+    async def close(self):
+        await self.blob_service_client.close()
+
+    def _blob_client(self, container_name, remote_blob_path):
+        return self.blob_service_client.get_blob_client(container=container_name, blob=remote_blob_path)
+
+    async def stat_blob(self, container_name, remote_blob_path):
+        properties = await self._blob_client(container_name, remote_blob_path).get_blob_properties()
+        return AzureStorage._blob_info(properties)
+
+    async def read_range(self, container_name, remote_blob_path, start, end):
+        # one Get Blob of the range, the SDK would otherwise split it
+        length = end - start
+        downloader = await self._blob_client(container_name, remote_blob_path).download_blob(
+            offset=start, length=length, max_single_get_size=length, max_chunk_get_size=length
+        )
+        return await downloader.readall()
+
+    async def download_bytes(self, container_name, remote_blob_path):
+        downloader = await self._blob_client(container_name, remote_blob_path).download_blob()
+        return await downloader.readall()
+
+    async def upload_bytes(self, container_name, data, remote_blob_path):
+        await self._blob_client(container_name, remote_blob_path).upload_blob(data, overwrite=True)
+
+    async def create_multipart_upload(self, container_name, remote_blob_path):
+        return AsyncAzureBlockUpload(self.azure_storage_blob, self._blob_client(container_name, remote_blob_path))
+
+    async def iter_blobs(self, container_name, pattern, start_after=None):
+        container_client = self.blob_service_client.get_container_client(container_name)
+        # start_from is inclusive
+        list_options = {"start_from": start_after} if start_after else {}
+        async for blob in container_client.list_blobs(name_starts_with=pattern, **list_options):
+            if blob.name != start_after:
+                yield AzureStorage._blob_info(blob)
+
+    async def delete_blob(self, container_name, remote_blob_path):
+        await self._blob_client(container_name, remote_blob_path).delete_blob()
@@ -1,36 +1,224 @@
 import os
+import threading
 import importlib
-from cloud_storage_slim import CloudStorage
+from cloud_storage_slim import CloudStorage, DEFAULT_SIGNED_URL_EXPIRATION, DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, normalize_etag, to_timestamp, etag_md5, configure_requests_session
+from cloud_storage_slim.segmented import segmented_download
+from cloud_storage_slim.multipart import (
+    MultipartUpload,
+    multipart_upload_file,
+    multipart_upload_chunks,
+    multipart_copy,
+    DEFAULT_COPY_PART_SIZE,
+)
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.ratelimit import throttle_bytes
+from cloud_storage_slim.retry import retry_call
+from cloud_storage_slim.checksum import Checksums
+
+
+class OSSMultipartUpload(MultipartUpload):
+    def __init__(self, oss2, bucket, remote_blob_path, upload_id=None):
+        self.oss2 = oss2
+        self.bucket = bucket
+        self.remote_blob_path = remote_blob_path
+        if upload_id is None:
+            upload_id = bucket.init_multipart_upload(remote_blob_path).upload_id
+        self.upload_id = upload_id
+
+    def upload_part(self, part_number, data):
+        result = self.bucket.upload_part(self.remote_blob_path, self.upload_id, part_number, data)
+        return result.etag
+
+    def copy_part(self, part_number, source_bucket_name, source_blob_path, start, end):
+        result = self.bucket.upload_part_copy(
+            source_bucket_name, source_blob_path, (start, end - 1), self.remote_blob_path, self.upload_id, part_number
+        )
+        return result.etag
+
+    def complete(self, parts):
+        part_infos = [self.oss2.models.PartInfo(n, etag) for n, etag in parts]
+        self.bucket.complete_multipart_upload(self.remote_blob_path, self.upload_id, part_infos)
+
+    def abort(self):
+        self.bucket.abort_multipart_upload(self.remote_blob_path, self.upload_id)
 
 
 class AlibabaCloudOSS(CloudStorage):
-    def __init__(self) -> None:
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True) -> None:
         self.oss2 = importlib.import_module("oss2")
         self.endpoint = os.environ.get("OSS_ENDPOINT")
         self.auth = self.oss2.ProviderAuth(self.oss2.credentials.EnvironmentVariableCredentialsProvider())
+        # one connection pool shared by every bucket handle
+        self.session = self.oss2.Session()
+        configure_requests_session(self.session.session, pool_maxsize, keep_alive)
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    def _get_bucket(self, bucket_name):
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.get(bucket_name)
+                if bucket is None:
+                    bucket = self.oss2.Bucket(self.auth, self.endpoint, bucket_name, session=self.session)
+                    self._buckets[bucket_name] = bucket
+        return bucket
 
     def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
-        bucket = self.oss2.Bucket(self.auth, self.endpoint, bucket_name)
-        bucket.get_object_to_file(remote_blob_path, local_blob_path)
+        download_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        segmented_download(self, bucket_name, remote_blob_path, local_blob_path, **download_options)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        bucket = self._get_bucket(bucket_name)
+        meta = bucket.get_object_meta(remote_blob_path)
+        return BlobInfo(
+            remote_blob_path,
+            meta.content_length,
+            normalize_etag(meta.etag),
+            to_timestamp(meta.last_modified),
+            etag_md5(meta.etag),
+        )
+
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        meta = self._get_bucket(bucket_name).get_object_meta(remote_blob_path)
+        crc64ecma = meta.headers.get("x-oss-hash-crc64ecma")
+        return Checksums(etag_md5(meta.etag), crc64ecma=int(crc64ecma) if crc64ecma else None)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        bucket = self._get_bucket(bucket_name)
+        # byte_range is inclusive on both ends
+        return bucket.get_object(remote_blob_path, byte_range=(start, end - 1)).read()
 
     def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
-        bucket = self.oss2.Bucket(self.auth, self.endpoint, bucket_name)
-        bucket.put_object_from_file(remote_blob_path, local_blob_path)
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        multipart_upload_file(self, bucket_name, local_blob_path, remote_blob_path, **upload_options)
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        bucket = self._get_bucket(bucket_name)
+        return bucket.get_object(remote_blob_path).read()
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        bucket = self._get_bucket(bucket_name)
+        bucket.put_object(remote_blob_path, data)
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, upload_id=None, **kwargs):
+        bucket = self._get_bucket(bucket_name)
+        return OSSMultipartUpload(self.oss2, bucket, remote_blob_path, upload_id)
+
+    def list_multipart_uploads(self, bucket_name, pattern):
+        bucket = self._get_bucket(bucket_name)
+        for upload_info in self.oss2.MultipartUploadIterator(bucket, prefix=pattern):
+            yield upload_info.key, upload_info.upload_id, to_timestamp(upload_info.initiation_date)
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        bucket = self._get_bucket(bucket_name)
+        return bucket.sign_url("GET", remote_blob_path, expiration)
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        retrier = kwargs.get("retrier")
+        size = retry_call(retrier, self.stat_blob, source_bucket_name, source_blob_path).size
+        copy_options = {k: v for k, v in kwargs.items() if k in ["parallelism", "retrier"]}
+        part_size = kwargs.get("copy_part_size", DEFAULT_COPY_PART_SIZE)
+        if size <= part_size:
+            # a single CopyObject request handles up to 1 GiB
+            bucket = self._get_bucket(dest_bucket_name)
+            retry_call(retrier, bucket.copy_object, source_bucket_name, source_blob_path, dest_blob_path)
+            return
+        multipart_copy(
+            self, source_bucket_name, source_blob_path, size, dest_bucket_name, dest_blob_path,
+            part_size=part_size, **copy_options,
+        )
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        throttle = kwargs.get("throttle")
+        bucket = self._get_bucket(bucket_name)
+        result = bucket.get_object(remote_blob_path)
+        while True:
+            chunk = result.read(chunk_size)
+            if not chunk:
+                break
+            throttle_bytes(throttle, len(chunk))
+            yield chunk
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k in ["parallelism", "part_size", "max_buffer_bytes", "memory_budget", "retrier", "throttle"]
+        }
+        multipart_upload_chunks(self, bucket_name, chunks, remote_blob_path, **upload_options)
 
     def list_blobs(self, bucket_name, pattern):
-        res_blob_list = []
-        bucket = self.oss2.Bucket(self.auth, self.endpoint, bucket_name)
-        for obj in self.oss2.ObjectIterator(bucket, prefix=pattern):
+        return [blob_info.key for blob_info in self.iter_blobs(bucket_name, pattern)]
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        bucket = self._get_bucket(bucket_name)
+        for obj in self.oss2.ObjectIteratorV2(bucket, prefix=pattern, start_after=start_after or ""):
             if obj.key.startswith(pattern):
-                res_blob_list.append(obj.key)
-        return res_blob_list
+                yield BlobInfo(
+                    obj.key,
+                    obj.size,
+                    normalize_etag(obj.etag),
+                    to_timestamp(obj.last_modified),
+                    etag_md5(obj.etag),
+                )
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        """
+        one level of a delimiter listing: yields the common prefixes below
+        pattern and the BlobInfo of the blobs directly under it in key order
+        """
+        bucket = self._get_bucket(bucket_name)
+        # the iterator sorts the objects and prefixes of every page
+        for obj in self.oss2.ObjectIteratorV2(bucket, prefix=pattern, delimiter=delimiter):
+            if obj.is_prefix():
+                yield obj.key
+            else:
+                yield BlobInfo(
+                    obj.key,
+                    obj.size,
+                    normalize_etag(obj.etag),
+                    to_timestamp(obj.last_modified),
+                    etag_md5(obj.etag),
+                )
 
     def get_first_blob(self, bucket_name, pattern):
-        bucket = self.oss2.Bucket(self.auth, self.endpoint, bucket_name)
-        for obj in self.oss2.ObjectIterator(bucket, prefix=pattern):
-            if obj.key.startswith(pattern):
-                return obj.key
-        return None
+        blob_info = next(self.iter_blobs(bucket_name, pattern), None)
+        return blob_info.key if blob_info is not None else None
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        bucket = self._get_bucket(bucket_name)
+        bucket.delete_object(remote_blob_path)
 
     def get_native_client(self):
         return self.auth
@@ -40,3 +228,9 @@ class AlibabaCloudOSS(CloudStorage):
     
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
         raise NotImplementedError("Alibaba Cloud OSS does not support uploading to URI")
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Alibaba Cloud OSS does not support reading from URI")
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Alibaba Cloud OSS does not support writing to URI")
@@ -1,24 +1,243 @@
 import boto3
-from cloud_storage_slim import CloudStorage
+import botocore.config
+from cloud_storage_slim import CloudStorage, DEFAULT_SIGNED_URL_EXPIRATION, DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, normalize_etag, to_timestamp, etag_md5
+from cloud_storage_slim.segmented import segmented_download
+from cloud_storage_slim.multipart import (
+    MultipartUpload,
+    multipart_upload_file,
+    multipart_upload_chunks,
+    multipart_copy,
+    DEFAULT_COPY_PART_SIZE,
+)
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.ratelimit import throttle_bytes
+from cloud_storage_slim.retry import retry_call
+from cloud_storage_slim.checksum import Checksums
+from cloud_storage_slim.listing import sorted_entries
+
+
+class S3MultipartUpload(MultipartUpload):
+    def __init__(self, s3_client, bucket_name, remote_blob_path, upload_id=None):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.remote_blob_path = remote_blob_path
+        if upload_id is None:
+            upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=remote_blob_path)["UploadId"]
+        self.upload_id = upload_id
+
+    def upload_part(self, part_number, data):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.remote_blob_path,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return response["ETag"]
+
+    def copy_part(self, part_number, source_bucket_name, source_blob_path, start, end):
+        response = self.s3_client.upload_part_copy(
+            Bucket=self.bucket_name,
+            Key=self.remote_blob_path,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            CopySource={"Bucket": source_bucket_name, "Key": source_blob_path},
+            CopySourceRange=f"bytes={start}-{end - 1}",
+        )
+        return response["CopyPartResult"]["ETag"]
+
+    def complete(self, parts):
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.remote_blob_path,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etag} for n, etag in parts]},
+        )
+
+    def abort(self):
+        self.s3_client.abort_multipart_upload(
+            Bucket=self.bucket_name, Key=self.remote_blob_path, UploadId=self.upload_id
+        )
 
 
 class AmazonS3Storage(CloudStorage):
-    def __init__(self):
-        self.s3_client = boto3.client("s3")
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True):
+        config = botocore.config.Config(max_pool_connections=pool_maxsize, tcp_keepalive=keep_alive)
+        self.s3_client = boto3.client("s3", config=config)
 
     def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
-        self.s3_client.download_file(bucket_name, remote_blob_path, local_blob_path)
+        download_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        segmented_download(self, bucket_name, remote_blob_path, local_blob_path, **download_options)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        response = self.s3_client.head_object(Bucket=bucket_name, Key=remote_blob_path)
+        return BlobInfo(
+            remote_blob_path,
+            response["ContentLength"],
+            normalize_etag(response.get("ETag")),
+            to_timestamp(response.get("LastModified")),
+            etag_md5(response.get("ETag")),
+        )
+
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        response = self.s3_client.head_object(Bucket=bucket_name, Key=remote_blob_path)
+        # the ETags of SSE-KMS and SSE-C objects are not derived from the content
+        if str(response.get("ServerSideEncryption", "")).startswith("aws:kms") or response.get("SSECustomerAlgorithm"):
+            return Checksums()
+        etag = normalize_etag(response.get("ETag"))
+        multipart_etag = etag.lower() if etag is not None and "-" in etag else None
+        return Checksums(etag_md5(etag), multipart_etag=multipart_etag)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        response = self.s3_client.get_object(
+            Bucket=bucket_name, Key=remote_blob_path, Range=f"bytes={start}-{end - 1}"
+        )
+        return response["Body"].read()
 
     def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
-        self.s3_client.upload_file(local_blob_path, bucket_name, remote_blob_path)
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        multipart_upload_file(self, bucket_name, local_blob_path, remote_blob_path, **upload_options)
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        response = self.s3_client.get_object(Bucket=bucket_name, Key=remote_blob_path)
+        return response["Body"].read()
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        self.s3_client.put_object(Bucket=bucket_name, Key=remote_blob_path, Body=data)
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, upload_id=None, **kwargs):
+        return S3MultipartUpload(self.s3_client, bucket_name, remote_blob_path, upload_id)
+
+    def list_multipart_uploads(self, bucket_name, pattern):
+        paginator = self.s3_client.get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=pattern):
+            for upload in page.get("Uploads", []):
+                yield upload["Key"], upload["UploadId"], to_timestamp(upload["Initiated"])
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        return self.s3_client.generate_presigned_url(
+            "get_object", Params={"Bucket": bucket_name, "Key": remote_blob_path}, ExpiresIn=expiration
+        )
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        retrier = kwargs.get("retrier")
+        size = retry_call(retrier, self.stat_blob, source_bucket_name, source_blob_path).size
+        copy_options = {k: v for k, v in kwargs.items() if k in ["parallelism", "retrier"]}
+        part_size = kwargs.get("copy_part_size", DEFAULT_COPY_PART_SIZE)
+        if size <= part_size:
+            # a single CopyObject request handles up to 5 GiB
+            retry_call(
+                retrier,
+                self.s3_client.copy_object,
+                Bucket=dest_bucket_name,
+                Key=dest_blob_path,
+                CopySource={"Bucket": source_bucket_name, "Key": source_blob_path},
+            )
+            return
+        multipart_copy(
+            self, source_bucket_name, source_blob_path, size, dest_bucket_name, dest_blob_path,
+            part_size=part_size, **copy_options,
+        )
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        throttle = kwargs.get("throttle")
+        response = self.s3_client.get_object(Bucket=bucket_name, Key=remote_blob_path)
+        body = response["Body"]
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                throttle_bytes(throttle, len(chunk))
+                yield chunk
+        finally:
+            body.close()
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "retrier",
+                "throttle",
+                "part_hasher",
+            ]
+        }
+        multipart_upload_chunks(self, bucket_name, chunks, remote_blob_path, **upload_options)
 
     def list_blobs(self, bucket_name, pattern):
-        response = self.s3_client.list_objects_v2(Bucket=bucket_name, Prefix=pattern)
-        return [item["Key"] for item in response.get("Contents", [])]
+        return [blob_info.key for blob_info in self.iter_blobs(bucket_name, pattern)]
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        list_options = {"StartAfter": start_after} if start_after else {}
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=pattern, **list_options):
+            for item in page.get("Contents", []):
+                yield BlobInfo(
+                    item["Key"],
+                    item["Size"],
+                    normalize_etag(item.get("ETag")),
+                    to_timestamp(item.get("LastModified")),
+                    etag_md5(item.get("ETag")),
+                )
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        """
+        one level of a delimiter listing: yields the common prefixes below
+        pattern and the BlobInfo of the blobs directly under it in key order
+        """
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=pattern, Delimiter=delimiter):
+            blob_infos = [
+                BlobInfo(
+                    item["Key"],
+                    item["Size"],
+                    normalize_etag(item.get("ETag")),
+                    to_timestamp(item.get("LastModified")),
+                    etag_md5(item.get("ETag")),
+                )
+                for item in page.get("Contents", [])
+            ]
+            yield from sorted_entries((item["Prefix"] for item in page.get("CommonPrefixes", [])), blob_infos)
 
     def get_first_blob(self, bucket_name, pattern):
-        blobs_list = self.list_blobs(bucket_name, pattern)
-        return blobs_list[0] if blobs_list else None
+        blob_info = next(self.iter_blobs(bucket_name, pattern), None)
+        return blob_info.key if blob_info is not None else None
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        self.s3_client.delete_object(Bucket=bucket_name, Key=remote_blob_path)
 
     def get_native_client(self):
         return self.s3_client
@@ -28,3 +247,9 @@ class AmazonS3Storage(CloudStorage):
 
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
         raise NotImplementedError("Amazon S3 does not support uploading to URI")
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Amazon S3 does not support reading from URI")
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Amazon S3 does not support writing to URI")
@@ -1,12 +1,71 @@
 import importlib
 import os
+import time
+import datetime
+import base64
 import logging
-from cloud_storage_slim import CloudStorage
+from cloud_storage_slim import CloudStorage, DEFAULT_SIGNED_URL_EXPIRATION, DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, normalize_etag, to_timestamp, base64_md5, configure_requests_session
+from cloud_storage_slim.segmented import segmented_download
+from cloud_storage_slim.multipart import (
+    MultipartUpload,
+    multipart_upload_file,
+    multipart_upload_chunks,
+    multipart_copy_from_url,
+    DEFAULT_COPY_PART_SIZE,
+)
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.ratelimit import throttle_bytes
+from cloud_storage_slim.retry import retry_call
+
+DEFAULT_COPY_POLL_INTERVAL = 1
+# seconds a server-side copy may stay pending before it is aborted
+DEFAULT_COPY_TIMEOUT = 3600
+
+
+class AzureBlockUpload(MultipartUpload):
+    """
+    Block blob upload: parts are staged as blocks and committed as a block list.
+    Uncommitted blocks cannot be deleted explicitly, the service discards them.
+    """
+
+    max_parts = 50000
+    # staged blocks are addressed by part number alone, a later attempt on
+    # the same blob commits them whatever id it resumes with
+    upload_id = "staged-blocks"
+
+    def __init__(self, azure_storage_blob, blob_client):
+        self.azure_storage_blob = azure_storage_blob
+        self.blob_client = blob_client
+
+    @staticmethod
+    def _block_id(part_number):
+        # block ids of one blob must all have the same length
+        return base64.b64encode(f"{part_number:08d}".encode()).decode()
+
+    def upload_part(self, part_number, data):
+        block_id = self._block_id(part_number)
+        self.blob_client.stage_block(block_id, data, length=len(data))
+        return block_id
+
+    def complete(self, parts):
+        block_list = [self.azure_storage_blob.BlobBlock(block_id=block_id) for _, block_id in parts]
+        self.blob_client.commit_block_list(block_list)
+
+    def copy_part_from_url(self, part_number, source_url, start, end):
+        block_id = self._block_id(part_number)
+        self.blob_client.stage_block_from_url(block_id, source_url, source_offset=start, source_length=end - start)
+        return block_id
+
+    def abort(self):
+        pass
 
 
 class AzureStorage(CloudStorage):
-    def __init__(self) -> None:
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True) -> None:
         self.azure_storage_blob = importlib.import_module("azure.storage.blob")
+        azure_transport = importlib.import_module("azure.core.pipeline.transport")
+        requests_module = importlib.import_module("requests")
         self.azure_identity = importlib.import_module("azure.identity")
 
         logging.basicConfig(level=logging.WARNING)
@@ -15,43 +74,216 @@ class AzureStorage(CloudStorage):
 
         az_account_name = os.environ.get("AZURE_STORAGE_ACCOUNT_NAME")
         az_account_key = os.environ.get("AZURE_STORAGE_ACCOUNT_KEY")
+        self.account_name = az_account_name
+        self.account_key = az_account_key
         connection_string = f"DefaultEndpointsProtocol=https;AccountName={az_account_name};AccountKey={az_account_key};EndpointSuffix=core.windows.net"
+        session = configure_requests_session(requests_module.Session(), pool_maxsize, keep_alive)
         self.blob_service_client = (
             self.azure_storage_blob.BlobServiceClient.from_connection_string(
-                connection_string
+                connection_string,
+                transport=azure_transport.RequestsTransport(session=session, session_owner=False),
             )
         )
 
     def download(self, container_name, remote_blob_path, local_blob_path, **kwargs):
+        download_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        segmented_download(self, container_name, remote_blob_path, local_blob_path, **download_options)
+
+    def stat_blob(self, container_name, remote_blob_path):
         blob_client = self.blob_service_client.get_blob_client(
             container=container_name, blob=remote_blob_path
         )
+        return self._blob_info(blob_client.get_blob_properties())
+
+    @staticmethod
+    def _blob_info(properties):
+        return BlobInfo(
+            properties.name,
+            properties.size,
+            normalize_etag(properties.etag),
+            to_timestamp(properties.last_modified),
+            base64_md5(properties.content_settings.content_md5),
+        )
 
-        with open(local_blob_path, "wb") as download_file:
-            download_file.write(blob_client.download_blob().readall())
+    def read_range(self, container_name, remote_blob_path, start, end):
+        blob_client = self.blob_service_client.get_blob_client(
+            container=container_name, blob=remote_blob_path
+        )
+        return blob_client.download_blob(offset=start, length=end - start).readall()
 
     def upload(self, container_name, local_blob_path, remote_blob_path, **kwargs):
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        multipart_upload_file(self, container_name, local_blob_path, remote_blob_path, **upload_options)
+
+    def download_bytes(self, container_name, remote_blob_path, **kwargs):
+        blob_client = self.blob_service_client.get_blob_client(
+            container=container_name, blob=remote_blob_path
+        )
+        return blob_client.download_blob().readall()
+
+    def upload_bytes(self, container_name, data, remote_blob_path, **kwargs):
+        blob_client = self.blob_service_client.get_blob_client(
+            container=container_name, blob=remote_blob_path
+        )
+
+        blob_client.upload_blob(data, overwrite=True)
+
+    def create_multipart_upload(self, container_name, remote_blob_path, upload_id=None, **kwargs):
+        blob_client = self.blob_service_client.get_blob_client(
+            container=container_name, blob=remote_blob_path
+        )
+        return AzureBlockUpload(self.azure_storage_blob, blob_client)
+
+    def signed_url(self, container_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        sas_token = self.azure_storage_blob.generate_blob_sas(
+            account_name=self.account_name,
+            container_name=container_name,
+            blob_name=remote_blob_path,
+            account_key=self.account_key,
+            permission=self.azure_storage_blob.BlobSasPermissions(read=True),
+            expiry=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expiration),
+        )
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=remote_blob_path)
+        return f"{blob_client.url}?{sas_token}"
+
+    def copy_from_url(self, source_url, size, container_name, remote_blob_path, **kwargs):
+        """
+        sources of unknown size or up to copy_part_size are fetched with one
+        Put Blob From URL request, bigger ones as blocks staged concurrently
+        from the URL
+        """
+        copy_options = {k: v for k, v in kwargs.items() if k in ["parallelism", "retrier"]}
+        part_size = kwargs.get("copy_part_size", DEFAULT_COPY_PART_SIZE)
+        if size is None or size <= part_size:
+            blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=remote_blob_path)
+            retry_call(kwargs.get("retrier"), blob_client.upload_blob_from_url, source_url, overwrite=True)
+            return
+        multipart_copy_from_url(
+            self, source_url, size, container_name, remote_blob_path, part_size=part_size, **copy_options
+        )
+
+    def copy_blob(self, source_container_name, source_blob_path, dest_container_name, dest_blob_path, **kwargs):
+        """
+        the copy runs asynchronously in the service, within one storage
+        account the account key authorizes reading the source URL; a copy
+        still pending after copy_timeout seconds is aborted
+        """
+        source_blob_client = self.blob_service_client.get_blob_client(
+            container=source_container_name, blob=source_blob_path
+        )
+        dest_blob_client = self.blob_service_client.get_blob_client(
+            container=dest_container_name, blob=dest_blob_path
+        )
+        retrier = kwargs.get("retrier")
+        retry_call(retrier, dest_blob_client.start_copy_from_url, source_blob_client.url)
+        self._wait_for_copy(
+            dest_blob_client,
+            kwargs.get("copy_poll_interval", DEFAULT_COPY_POLL_INTERVAL),
+            kwargs.get("copy_timeout", DEFAULT_COPY_TIMEOUT),
+            retrier,
+        )
+
+    @staticmethod
+    def _wait_for_copy(blob_client, poll_interval, timeout, retrier=None):
+        deadline = time.monotonic() + timeout
+        copy = retry_call(retrier, blob_client.get_blob_properties).copy
+        while copy.status == "pending":
+            if time.monotonic() >= deadline:
+                try:
+                    blob_client.abort_copy(copy.id)
+                except Exception:
+                    # the copy may have ended since the last poll
+                    copy = blob_client.get_blob_properties().copy
+                    if copy.status != "pending":
+                        break
+                    raise
+                raise IOError(f"Copy to {blob_client.url} still pending after {timeout}s, aborted")
+            time.sleep(poll_interval)
+            copy = retry_call(retrier, blob_client.get_blob_properties).copy
+        if copy.status != "success":
+            raise IOError(f"Copy to {blob_client.url} {copy.status}: {copy.status_description}")
+
+    def iter_chunks(self, container_name, remote_blob_path, **kwargs):
         blob_client = self.blob_service_client.get_blob_client(
             container=container_name, blob=remote_blob_path
         )
 
-        with open(local_blob_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        throttle = kwargs.get("throttle")
+        # the downloader otherwise buffers 32 MiB first and 4 MiB per chunk
+        downloader = blob_client.download_blob(max_single_get_size=chunk_size, max_chunk_get_size=chunk_size)
+        for chunk in downloader.chunks():
+            throttle_bytes(throttle, len(chunk))
+            yield chunk
+
+    def write_chunks(self, container_name, chunks, remote_blob_path, **kwargs):
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k in ["parallelism", "part_size", "max_buffer_bytes", "memory_budget", "retrier", "throttle"]
+        }
+        multipart_upload_chunks(self, container_name, chunks, remote_blob_path, **upload_options)
 
     def list_blobs(self, container_name, pattern):
+        return [blob_info.key for blob_info in self.iter_blobs(container_name, pattern)]
+
+    def iter_blobs(self, container_name, pattern, start_after=None):
         container_client = self.blob_service_client.get_container_client(container_name)
-        blobs_list = list(container_client.list_blobs(name_starts_with=pattern))
-        blobs_list_names = [blob.name for blob in blobs_list]
-        return blobs_list_names
+        # start_from is inclusive
+        list_options = {"start_from": start_after} if start_after else {}
+        for blob in container_client.list_blobs(name_starts_with=pattern, **list_options):
+            if blob.name != start_after:
+                yield self._blob_info(blob)
 
-    def get_first_blob(self, container_name, pattern):
+    def list_prefixes(self, container_name, pattern, delimiter="/"):
+        """
+        one level of a delimiter listing: yields the common prefixes below
+        pattern and the BlobInfo of the blobs directly under it in key order
+        """
         container_client = self.blob_service_client.get_container_client(container_name)
-        blobs_list = list(container_client.list_blobs(name_starts_with=pattern))
+        for item in container_client.walk_blobs(name_starts_with=pattern, delimiter=delimiter):
+            if isinstance(item, self.azure_storage_blob.BlobPrefix):
+                yield item.name
+            else:
+                yield self._blob_info(item)
 
-        if len(blobs_list) == 0:
-            return None
+    def get_first_blob(self, container_name, pattern):
+        blob_info = next(self.iter_blobs(container_name, pattern), None)
+        return blob_info.key if blob_info is not None else None
 
-        return blobs_list[0].name
+    def delete_blob(self, container_name, remote_blob_path):
+        blob_client = self.blob_service_client.get_blob_client(
+            container=container_name, blob=remote_blob_path
+        )
+        blob_client.delete_blob()
 
     def get_native_client(self):
         return self.blob_service_client
@@ -61,3 +293,9 @@ class AzureStorage(CloudStorage):
 
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
         raise NotImplementedError("Azure Storage does not support uploading to URI")
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Azure Storage does not support reading from URI")
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Azure Storage does not support writing to URI")
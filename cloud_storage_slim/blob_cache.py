@@ -0,0 +1,216 @@
+import os
+import sys
+import glob
+import uuid
+import shutil
+import hashlib
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows
+    fcntl = None
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+# ioctl cloning a file into another on Linux filesystems with reflinks (btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def _open_locked(path, shared=False, blocking=True):
+    """
+    the file at path opened and flocked, None when blocking is False and
+    the lock is held elsewhere. Holders of the lock may remove the file, a
+    lock taken on a removed file is taken again on the one at path.
+    """
+    while True:
+        f = open(path, "a")
+        if fcntl is None:
+            return f
+        try:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+
+@contextlib.contextmanager
+def _file_lock(path, shared=False):
+    """
+    advisory lock shared between processes, a no-op where fcntl is missing
+    """
+    f = _open_locked(path, shared)
+    try:
+        yield
+    finally:
+        f.close()
+
+
+def _clone_file(source_path, dest_path, reflink=True):
+    """
+    copy source_path to dest_path, sharing its blocks copy-on-write where
+    the filesystem supports it
+    """
+    if reflink and fcntl is not None and sys.platform.startswith("linux"):
+        with open(source_path, "rb") as source, open(dest_path, "wb") as dest:
+            try:
+                fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+                return
+            except OSError:
+                # not supported by the filesystem or across filesystems
+                pass
+    shutil.copyfile(source_path, dest_path)
+
+
+def blob_version(blob_info):
+    """
+    identify the content of a blob from its metadata, the etag changes with
+    every overwrite, size and mtime stand in when the backend has none
+    """
+    if blob_info.etag:
+        return blob_info.etag
+    return f"{blob_info.size}-{blob_info.mtime}"
+
+
+class BlobCache:
+    """
+    Local cache of downloaded blobs keyed by URI and version.
+
+    Cached files live under `path`/objects and are read-only. Destinations
+    get their own writable copy, a reflink sharing the blocks of the cached
+    file where the filesystem supports it (unless `reflink` is False). Once
+    the cache holds more than `max_bytes` the least recently used files are
+    removed. Processes sharing the directory coordinate with a lock file per
+    blob under `path`/locks, removed along with the blob: a blob is
+    downloaded once per version and eviction never removes a file that is
+    being downloaded or handed out, it removes older ones in its place.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, reflink=True):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), ".cloud_storage_slim", "cache")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.reflink = reflink
+        self._objects_path = os.path.join(path, "objects")
+        self._locks_path = os.path.join(path, "locks")
+        os.makedirs(self._objects_path, exist_ok=True)
+        os.makedirs(self._locks_path, exist_ok=True)
+
+    def _entry_name(self, uri, version):
+        return hashlib.sha256(f"{uri}\0{version}".encode("utf-8")).hexdigest()
+
+    def get(self, uri, version):
+        """
+        return the path of the cached blob or None, marks it as recently used
+        """
+        entry_path = os.path.join(self._objects_path, self._entry_name(uri, version))
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        return entry_path
+
+    @contextlib.contextmanager
+    def open_entry(self, uri, version, download):
+        """
+        yield the path of the cached blob, calling download(tmp_path) to fill
+        the cache on a miss; the file is not evicted before the block exits
+        """
+        entry_name = self._entry_name(uri, version)
+        entry_path = os.path.join(self._objects_path, entry_name)
+        lock_path = os.path.join(self._locks_path, entry_name)
+        while True:
+            # the shared lock keeps the blob from being evicted while in use
+            with _file_lock(lock_path, shared=True):
+                if self.get(uri, version) is not None:
+                    yield entry_path
+                    break
+            with _file_lock(lock_path):
+                # another process may have finished the download meanwhile
+                if self.get(uri, version) is None:
+                    tmp_path = f"{entry_path}.{uuid.uuid4().hex}.tmp"
+                    try:
+                        download(tmp_path)
+                        os.chmod(tmp_path, 0o444)
+                        os.replace(tmp_path, entry_path)
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+        self.evict()
+
+    def copy_to(self, uri, version, local_blob_path, download):
+        """
+        place the blob at local_blob_path from the cache, downloading it first
+        on a miss
+        """
+        with self.open_entry(uri, version, download) as entry_path:
+            tmp_path = f"{local_blob_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                # a hardlink would share the read-only inode of the cache
+                _clone_file(entry_path, tmp_path, self.reflink)
+                os.replace(tmp_path, local_blob_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def _remove_entry(self, entry_name):
+        """
+        remove a blob with its lock file and leftover downloads, False when
+        it is in use
+        """
+        lock_path = os.path.join(self._locks_path, entry_name)
+        f = _open_locked(lock_path, blocking=False)
+        if f is None:
+            return False
+        try:
+            entry_path = os.path.join(self._objects_path, entry_name)
+            for path in [entry_path] + glob.glob(f"{glob.escape(entry_path)}.*.tmp"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            os.remove(lock_path)
+        finally:
+            f.close()
+        return True
+
+    def evict(self):
+        """
+        remove least recently used blobs until the cache fits in max_bytes,
+        blobs in use are kept and newer ones removed in their place; lock
+        files and downloads left without a blob are removed too
+        """
+        entries = []
+        orphans = set(os.listdir(self._locks_path))
+        with os.scandir(self._objects_path) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp"):
+                    orphans.add(entry.name.split(".", 1)[0])
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if self._remove_entry(entry_name):
+                total_bytes -= size
+        for entry_name in orphans.difference(entry_name for _, _, entry_name in entries):
+            self._remove_entry(entry_name)
+
+    def clear(self):
+        """
+        remove every blob that is not in use
+        """
+        for entry_name in os.listdir(self._objects_path):
+            if not entry_name.endswith(".tmp"):
+                self._remove_entry(entry_name)
+        self.evict()
@@ -0,0 +1,140 @@
+import os
+import time
+import sqlite3
+import threading
+from cloud_storage_slim.utils import BlobInfo
+
+DEFAULT_INDEX_FILENAME = "bucket_index.sqlite3"
+
+
+def _prefix_upper_bound(prefix):
+    # smallest string greater than every string starting with prefix
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _indexed_fields(blob_info):
+    # the CRCs are not indexed, a crc64ecma does not fit a SQLite INTEGER
+    return (blob_info.key, blob_info.size, blob_info.etag, blob_info.mtime, blob_info.md5)
+
+
+class BucketIndex:
+    """
+    On-disk SQLite index of remote listings.
+
+    `refresh` records every blob under a prefix, afterwards lookups of that
+    prefix or any longer one are answered from the index with a range scan
+    on the primary key. Answers are as fresh as the last refresh plus the
+    writes made through the CloudStorageSlim instance using the index.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), ".cloud_storage_slim", DEFAULT_INDEX_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "scheme TEXT, bucket TEXT, key TEXT, size INTEGER, etag TEXT, mtime REAL, md5 TEXT, "
+                "PRIMARY KEY (scheme, bucket, key)) WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS prefixes ("
+                "scheme TEXT, bucket TEXT, prefix TEXT, last_key TEXT, refreshed_at REAL, "
+                "PRIMARY KEY (scheme, bucket, prefix))"
+            )
+
+    def _prefix_condition(self, scheme, bucket_name, prefix):
+        condition = "scheme = ? AND bucket = ? AND key >= ?"
+        params = [scheme, bucket_name, prefix]
+        upper_bound = _prefix_upper_bound(prefix)
+        if upper_bound is not None:
+            condition += " AND key < ?"
+            params.append(upper_bound)
+        return condition, params
+
+    def _covering_prefix(self, scheme, bucket_name, prefix):
+        rows = self._connection.execute(
+            "SELECT prefix FROM prefixes WHERE scheme = ? AND bucket = ?", (scheme, bucket_name)
+        )
+        for (indexed_prefix,) in rows:
+            if prefix.startswith(indexed_prefix):
+                return indexed_prefix
+        return None
+
+    def covers(self, scheme, bucket_name, prefix):
+        with self._lock:
+            return self._covering_prefix(scheme, bucket_name, prefix) is not None
+
+    def refresh(self, client, scheme, bucket_name, prefix="", incremental=False):
+        """
+        list prefix with the backend client and store the result
+
+        incremental=True only lists the keys after the last key seen by the
+        previous refresh of the same prefix, which picks up blobs appended
+        in key order (logs, checkpoints, ...) with a single short listing;
+        deletes and overwrites of older keys need a full refresh
+        returns the number of blobs listed
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_key FROM prefixes WHERE scheme = ? AND bucket = ? AND prefix = ?",
+                (scheme, bucket_name, prefix),
+            ).fetchone()
+
+        start_after = row[0] if incremental and row is not None else None
+        blob_infos = list(client.iter_blobs(bucket_name, prefix, start_after=start_after))
+        last_key = blob_infos[-1].key if blob_infos else start_after
+
+        with self._lock, self._connection:
+            if start_after is None:
+                condition, params = self._prefix_condition(scheme, bucket_name, prefix)
+                self._connection.execute(f"DELETE FROM blobs WHERE {condition}", params)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((scheme, bucket_name) + _indexed_fields(blob_info) for blob_info in blob_infos),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO prefixes VALUES (?, ?, ?, ?, ?)",
+                (scheme, bucket_name, prefix, last_key, time.time()),
+            )
+        return len(blob_infos)
+
+    def list_blob_infos(self, scheme, bucket_name, prefix, limit=None):
+        """
+        return the indexed BlobInfo list under prefix in key order, or None
+        when no refreshed prefix covers it
+        """
+        with self._lock:
+            if self._covering_prefix(scheme, bucket_name, prefix) is None:
+                return None
+            condition, params = self._prefix_condition(scheme, bucket_name, prefix)
+            query = f"SELECT key, size, etag, mtime, md5 FROM blobs WHERE {condition} ORDER BY key"
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
+            return [BlobInfo(*row) for row in self._connection.execute(query, params)]
+
+    def put(self, scheme, bucket_name, blob_info):
+        with self._lock, self._connection:
+            if self._covering_prefix(scheme, bucket_name, blob_info.key) is None:
+                return
+            self._connection.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scheme, bucket_name) + _indexed_fields(blob_info),
+            )
+
+    def delete(self, scheme, bucket_name, key):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM blobs WHERE scheme = ? AND bucket = ? AND key = ?", (scheme, bucket_name, key)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -1,36 +1,271 @@
 import os
 import importlib
-from cloud_storage_slim import CloudStorage
+from cloud_storage_slim import CloudStorage, DEFAULT_SIGNED_URL_EXPIRATION, DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, normalize_etag, to_timestamp, etag_md5
+from cloud_storage_slim.segmented import segmented_download
+from cloud_storage_slim.multipart import (
+    MultipartUpload,
+    multipart_upload_file,
+    multipart_upload_chunks,
+    multipart_copy,
+    DEFAULT_COPY_PART_SIZE,
+)
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.ratelimit import throttle_bytes
+from cloud_storage_slim.retry import retry_call
+from cloud_storage_slim.checksum import Checksums
+from cloud_storage_slim.listing import sorted_entries
+
+
+def _crc64ecma(output):
+    crc64ecma = getattr(output, "hash_crc64_ecma", None)
+    return int(crc64ecma) if crc64ecma else None
+
+
+class TorchMultipartUpload(MultipartUpload):
+    def __init__(self, tos, storage_client, bucket_name, remote_blob_path, upload_id=None):
+        self.tos = tos
+        self.storage_client = storage_client
+        self.bucket_name = bucket_name
+        self.remote_blob_path = remote_blob_path
+        if upload_id is None:
+            upload_id = storage_client.create_multipart_upload(bucket_name, remote_blob_path).upload_id
+        self.upload_id = upload_id
+
+    def upload_part(self, part_number, data):
+        output = self.storage_client.upload_part(
+            self.bucket_name, self.remote_blob_path, self.upload_id, part_number, content=data
+        )
+        return output.etag
+
+    def copy_part(self, part_number, source_bucket_name, source_blob_path, start, end):
+        output = self.storage_client.upload_part_copy(
+            self.bucket_name,
+            self.remote_blob_path,
+            self.upload_id,
+            part_number,
+            source_bucket_name,
+            source_blob_path,
+            copy_source_range_start=start,
+            copy_source_range_end=end - 1,
+        )
+        return output.etag
+
+    def complete(self, parts):
+        uploaded_parts = [self.tos.models2.UploadedPart(n, etag) for n, etag in parts]
+        self.storage_client.complete_multipart_upload(
+            self.bucket_name, self.remote_blob_path, self.upload_id, parts=uploaded_parts
+        )
+
+    def abort(self):
+        self.storage_client.abort_multipart_upload(self.bucket_name, self.remote_blob_path, self.upload_id)
 
 
 class TorchObjectStorage(CloudStorage):
-    def __init__(self) -> None:
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True) -> None:
         storage_module = importlib.import_module("tos")
+        self.tos = storage_module
         ak = os.getenv("TOS_ACCESS_KEY_ID", None)
         sk = os.getenv("TOS_SECRET_ACCESS_KEY", None)
         endpoint = os.getenv("TOS_ENDPOINT_URL", None)
         region = os.getenv("TOS_DEFAULT_REGION", None)
-        self.storage_client = storage_module.TosClientV2(ak, sk, endpoint, region)
+        # the TOS SDK always reuses connections, only the pool size is configurable
+        self.storage_client = storage_module.TosClientV2(ak, sk, endpoint, region, max_connections=pool_maxsize)
 
     def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
-        self.storage_client.download_file(bucket=bucket_name, key=remote_blob_path, file_path=local_blob_path)
+        download_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        segmented_download(self, bucket_name, remote_blob_path, local_blob_path, **download_options)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        output = self.storage_client.head_object(bucket_name, remote_blob_path)
+        return BlobInfo(
+            remote_blob_path,
+            output.content_length,
+            normalize_etag(output.etag),
+            to_timestamp(output.last_modified),
+            etag_md5(output.etag),
+        )
+
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        output = self.storage_client.head_object(bucket_name, remote_blob_path)
+        return Checksums(etag_md5(output.etag), crc64ecma=_crc64ecma(output))
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        output = self.storage_client.get_object(
+            bucket_name, remote_blob_path, range_start=start, range_end=end - 1
+        )
+        return output.read()
 
     def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
-        self.storage_client.upload_file(bucket_name, remote_blob_path, local_blob_path)
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        multipart_upload_file(self, bucket_name, local_blob_path, remote_blob_path, **upload_options)
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        return self.storage_client.get_object(bucket_name, remote_blob_path).read()
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        self.storage_client.put_object(bucket_name, remote_blob_path, content=data)
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, upload_id=None, **kwargs):
+        return TorchMultipartUpload(self.tos, self.storage_client, bucket_name, remote_blob_path, upload_id)
+
+    def list_multipart_uploads(self, bucket_name, pattern):
+        key_marker = ""
+        upload_id_marker = ""
+        while True:
+            output = self.storage_client.list_multipart_uploads(
+                bucket_name, prefix=pattern, key_marker=key_marker, upload_id_marker=upload_id_marker
+            )
+            for upload in output.uploads:
+                yield upload.key, upload.upload_id, to_timestamp(upload.initiated)
+            if not output.is_truncated:
+                return
+            key_marker = output.next_key_marker
+            upload_id_marker = output.next_upload_id_marker
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        output = self.storage_client.pre_signed_url(
+            self.tos.HttpMethodType.Http_Method_Get, bucket_name, remote_blob_path, expires=expiration
+        )
+        return output.signed_url
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        retrier = kwargs.get("retrier")
+        size = retry_call(retrier, self.stat_blob, source_bucket_name, source_blob_path).size
+        copy_options = {k: v for k, v in kwargs.items() if k in ["parallelism", "retrier"]}
+        part_size = kwargs.get("copy_part_size", DEFAULT_COPY_PART_SIZE)
+        if size <= part_size:
+            # a single CopyObject request handles up to 5 GiB
+            retry_call(
+                retrier,
+                self.storage_client.copy_object,
+                dest_bucket_name,
+                dest_blob_path,
+                source_bucket_name,
+                source_blob_path,
+            )
+            return
+        multipart_copy(
+            self, source_bucket_name, source_blob_path, size, dest_bucket_name, dest_blob_path,
+            part_size=part_size, **copy_options,
+        )
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        throttle = kwargs.get("throttle")
+        output = self.storage_client.get_object(bucket_name, remote_blob_path)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            throttle_bytes(throttle, len(chunk))
+            yield chunk
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k in ["parallelism", "part_size", "max_buffer_bytes", "memory_budget", "retrier", "throttle"]
+        }
+        multipart_upload_chunks(self, bucket_name, chunks, remote_blob_path, **upload_options)
 
     def list_blobs(self, bucket_name, pattern):
-        list_objects = self.storage_client.list_objects(bucket_name, prefix=pattern)
-        blobs_list = list_objects.contents
-        blobs_list_names = [blob.key for blob in blobs_list]
-        return blobs_list_names
+        return [blob_info.key for blob_info in self.iter_blobs(bucket_name, pattern)]
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        continuation_token = None
+        while True:
+            list_objects = self.storage_client.list_objects_type2(
+                bucket_name,
+                prefix=pattern,
+                start_after=start_after,
+                continuation_token=continuation_token,
+                list_only_once=True,
+            )
+            for blob in list_objects.contents:
+                yield BlobInfo(
+                    blob.key,
+                    blob.size,
+                    normalize_etag(blob.etag),
+                    to_timestamp(blob.last_modified),
+                    etag_md5(blob.etag),
+                    crc64ecma=_crc64ecma(blob),
+                )
+            if not list_objects.is_truncated:
+                return
+            continuation_token = list_objects.next_continuation_token
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        """
+        one level of a delimiter listing: yields the common prefixes below
+        pattern and the BlobInfo of the blobs directly under it in key order
+        """
+        continuation_token = None
+        while True:
+            list_objects = self.storage_client.list_objects_type2(
+                bucket_name,
+                prefix=pattern,
+                delimiter=delimiter,
+                continuation_token=continuation_token,
+                list_only_once=True,
+            )
+            blob_infos = [
+                BlobInfo(
+                    blob.key,
+                    blob.size,
+                    normalize_etag(blob.etag),
+                    to_timestamp(blob.last_modified),
+                    etag_md5(blob.etag),
+                    crc64ecma=_crc64ecma(blob),
+                )
+                for blob in list_objects.contents
+            ]
+            prefixes = [common_prefix.prefix for common_prefix in list_objects.common_prefixes]
+            yield from sorted_entries(prefixes, blob_infos)
+            if not list_objects.is_truncated:
+                return
+            continuation_token = list_objects.next_continuation_token
 
     def get_first_blob(self, bucket_name, pattern):
-        list_objects = self.storage_client.list_objects(bucket_name, prefix=pattern, max_keys=1)
+        list_objects = self.storage_client.list_objects_type2(
+            bucket_name, prefix=pattern, max_keys=1, list_only_once=True
+        )
         blobs_list = list_objects.contents
         if len(blobs_list) == 0:
             return None
         return blobs_list[0].key
 
+    def delete_blob(self, bucket_name, remote_blob_path):
+        self.storage_client.delete_object(bucket_name, remote_blob_path)
+
     def get_native_client(self):
         return self.storage_client
 
@@ -39,3 +274,9 @@ class TorchObjectStorage(CloudStorage):
 
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
         raise NotImplementedError("Torch Object Storage does not support uploading to URI")
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Torch Object Storage does not support reading from URI")
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Torch Object Storage does not support writing to URI")
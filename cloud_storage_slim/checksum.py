@@ -0,0 +1,191 @@
+import hashlib
+import threading
+import collections
+import importlib.util
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+
+# CRC-64/XZ as reported by OSS and TOS, in the parameters of crcmod
+CRC64_ECMA_POLY = 0x142F0E1EBA9EA3693
+CRC64_ECMA_XOR_OUT = 0xFFFFFFFFFFFFFFFF
+
+# outcome of one copyto: md5 is the hex md5 of the bytes transferred, None
+# when it was not computed, verified tells whether a provider reported md5
+# matched it, skipped that the destination was already identical
+TransferResult = collections.namedtuple(
+    "TransferResult", ["source", "dest", "md5", "verified", "skipped"], defaults=(None, False, False)
+)
+
+# checksums of a blob content, each None when unknown: the hex md5, the
+# crc32c (GCS) and crc64ecma (OSS, TOS) as integers and the S3 ETag of a
+# multipart upload, "<hex md5 of the part md5s>-<number of parts>"
+Checksums = collections.namedtuple(
+    "Checksums", ["md5", "crc32c", "crc64ecma", "multipart_etag"], defaults=(None, None, None, None)
+)
+
+
+class _Crc32c:
+    def __init__(self):
+        import google_crc32c
+
+        self._checksum = google_crc32c.Checksum()
+
+    def update(self, data):
+        self._checksum.update(data)
+
+    def value(self):
+        return int.from_bytes(self._checksum.digest(), "big")
+
+
+class _Crc64Ecma:
+    def __init__(self):
+        import crcmod
+
+        self._crc = crcmod.Crc(CRC64_ECMA_POLY, initCrc=0, xorOut=CRC64_ECMA_XOR_OUT, rev=True)
+
+    def update(self, data):
+        self._crc.update(data)
+
+    def value(self):
+        return self._crc.crcValue
+
+
+# checksum name: (implementation, module it needs), the module comes with
+# the SDK of the providers reporting that checksum
+CRC_ALGORITHMS = {
+    "crc32c": (_Crc32c, "google_crc32c"),
+    "crc64ecma": (_Crc64Ecma, "crcmod"),
+}
+
+
+class OrderedHasher:
+    """
+    MD5 of a local file computed while its parts are transferred concurrently.
+
+    Parts are fed with `update_at` in whatever order they finish. A part that
+    starts where the hash stands is hashed from memory; a part finishing ahead
+    of its turn is only recorded and read back from `local_path` once every
+    byte before it is hashed, usually from the page cache. Workers never wait
+    for each other. Sequential streams use `update`.
+
+    `algorithms` adds checksums of CRC_ALGORITHMS computed along the md5,
+    those whose module is not installed are skipped. With "multipart_etag"
+    the md5 of every part passed to `add_part` is kept for the ETag S3 gives
+    multipart uploads.
+    """
+
+    def __init__(self, local_path=None, algorithms=()):
+        self.local_path = local_path
+        self.size = 0
+        self._md5 = hashlib.md5()
+        self._crcs = {
+            name: CRC_ALGORITHMS[name][0]()
+            for name in algorithms
+            if name in CRC_ALGORITHMS and importlib.util.find_spec(CRC_ALGORITHMS[name][1]) is not None
+        }
+        self._part_md5s = {} if "multipart_etag" in algorithms else None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _update(self, data):
+        self._md5.update(data)
+        for crc in self._crcs.values():
+            crc.update(data)
+
+    def _read_back(self, start, end):
+        with open(self.local_path, "rb") as f:
+            f.seek(start)
+            while start < end:
+                data = f.read(min(DEFAULT_CHUNK_SIZE, end - start))
+                if not data:
+                    raise IOError(f"{self.local_path} ended at {start} bytes while hashing up to {end}")
+                self._update(data)
+                start += len(data)
+
+    def update_at(self, offset, data):
+        """
+        hash the part at offset, its bytes must already be in local_path
+        """
+        with self._lock:
+            if offset != self.size:
+                self._pending[offset] = offset + len(data)
+                return
+            self._update(data)
+            self.size += len(data)
+            while self.size in self._pending:
+                end = self._pending.pop(self.size)
+                self._read_back(self.size, end)
+                self.size = end
+
+    def update_range(self, start, end):
+        """
+        hash bytes [start, end) of local_path, e.g. parts an earlier attempt
+        already transferred
+        """
+        with self._lock:
+            self._pending[start] = end
+            while self.size in self._pending:
+                end = self._pending.pop(self.size)
+                self._read_back(self.size, end)
+                self.size = end
+
+    def update(self, data):
+        with self._lock:
+            self._update(data)
+            self.size += len(data)
+
+    def add_part(self, part_number, data):
+        """
+        record the md5 of a multipart upload part, a no-op without
+        "multipart_etag"
+        """
+        if self._part_md5s is not None:
+            self._part_md5s[part_number] = hashlib.md5(data).digest()
+
+    def add_part_range(self, part_number, start, end):
+        """
+        add_part for bytes [start, end) of local_path, e.g. a part an
+        earlier attempt already uploaded
+        """
+        if self._part_md5s is None:
+            return
+        md5 = hashlib.md5()
+        with open(self.local_path, "rb") as f:
+            f.seek(start)
+            while start < end:
+                data = f.read(min(DEFAULT_CHUNK_SIZE, end - start))
+                if not data:
+                    raise IOError(f"{self.local_path} ended at {start} bytes while hashing up to {end}")
+                md5.update(data)
+                start += len(data)
+        self._part_md5s[part_number] = md5.digest()
+
+    def hexdigest(self):
+        return self._md5.hexdigest()
+
+    def multipart_etag(self):
+        if not self._part_md5s:
+            return None
+        digests = b"".join(self._part_md5s[part_number] for part_number in sorted(self._part_md5s))
+        return f"{hashlib.md5(digests).hexdigest()}-{len(self._part_md5s)}"
+
+    def checksums(self):
+        with self._lock:
+            crcs = {name: crc.value() for name, crc in self._crcs.items()}
+            return Checksums(self._md5.hexdigest(), multipart_etag=self.multipart_etag(), **crcs)
+
+
+def hashed_chunks(chunks, hasher):
+    """
+    pass chunks through, hashing them on the way
+    """
+    for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
+
+def file_md5(local_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    md5 = hashlib.md5()
+    with open(local_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
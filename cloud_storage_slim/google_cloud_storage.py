@@ -1,39 +1,336 @@
+import os
+import uuid
+import base64
+import datetime
 import importlib
-from cloud_storage_slim import CloudStorage
+import mimetypes
+from cloud_storage_slim import CloudStorage, DEFAULT_SIGNED_URL_EXPIRATION, DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, normalize_etag, to_timestamp, base64_md5, configure_requests_session
+from cloud_storage_slim.segmented import DEFAULT_PART_SIZE, segmented_download
+from cloud_storage_slim.multipart import MultipartUpload, multipart_upload_file
+from cloud_storage_slim.memory import reserve
+from cloud_storage_slim.retry import retry_call
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE
+from cloud_storage_slim.ratelimit import throttle_bytes
+from cloud_storage_slim.checksum import Checksums
+from cloud_storage_slim.listing import sorted_entries
+
+# parts of a composite upload are staged under <blob><STAGING_INFIX><upload id>/,
+# listings leave them out
+STAGING_INFIX = ".cloud_storage_slim-"
+# the chunks of a resumable upload are multiples of 256 KiB
+RESUMABLE_CHUNK_ALIGNMENT = 256 * 1024
+
+
+def _resumable_chunk_size(chunk_size):
+    return max(RESUMABLE_CHUNK_ALIGNMENT, chunk_size // RESUMABLE_CHUNK_ALIGNMENT * RESUMABLE_CHUNK_ALIGNMENT)
+
+
+def _crc32c(blob):
+    return int.from_bytes(base64.b64decode(blob.crc32c), "big") if blob.crc32c else None
+
+
+class GCSCompositeUpload(MultipartUpload):
+    """
+    Parts are uploaded as temporary objects next to the destination and then
+    composed into it, at most 32 source objects per compose request.
+    """
+
+    # component count limit of a composite object
+    max_parts = 1024
+
+    def __init__(self, bucket, remote_blob_path, content_type=None, predefined_acl=None, upload_id=None):
+        self.bucket = bucket
+        self.remote_blob_path = remote_blob_path
+        self.content_type = content_type
+        self.predefined_acl = predefined_acl
+        self.upload_id = upload_id or uuid.uuid4().hex
+        self.staging_prefix = f"{remote_blob_path}{STAGING_INFIX}{self.upload_id}/"
+
+    def upload_part(self, part_number, data):
+        blob = self.bucket.blob(f"{self.staging_prefix}{part_number:05d}")
+        blob.upload_from_string(data, content_type="application/octet-stream")
+        return blob.name
+
+    def complete(self, parts):
+        sources = [self.bucket.blob(name) for _, name in parts]
+        destination = self.bucket.blob(self.remote_blob_path)
+        destination.content_type = self.content_type or "application/octet-stream"
+
+        destination.compose(sources[:32])
+        for i in range(32, len(sources), 31):
+            destination.compose([destination] + sources[i:i + 31])
+
+        if self.predefined_acl is not None:
+            destination.acl.save_predefined(self.predefined_acl)
+        self._delete_staged_parts()
+
+    def abort(self):
+        self._delete_staged_parts()
+
+    def _delete_staged_parts(self):
+        staged_blobs = list(self.bucket.list_blobs(prefix=self.staging_prefix))
+        self.bucket.delete_blobs(staged_blobs, on_error=lambda blob: None)
 
 
 class GoogleCloudStorage(CloudStorage):
-    def __init__(self) -> None:
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True) -> None:
         storage_module = importlib.import_module("google.cloud.storage")
         self.storage_client = storage_module.Client()
+        # the client talks through an authorized requests session
+        configure_requests_session(self.storage_client._http, pool_maxsize, keep_alive)
 
     def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
+        download_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+            ]
+        }
+        segmented_download(self, bucket_name, remote_blob_path, local_blob_path, **download_options)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
         bucket = self.storage_client.bucket(bucket_name)
         blob = bucket.blob(remote_blob_path)
+        blob.reload()
+        return self._blob_info(blob)
 
-        blob.download_to_filename(local_blob_path)
+    @staticmethod
+    def _blob_info(blob):
+        return BlobInfo(
+            blob.name,
+            blob.size,
+            normalize_etag(blob.etag),
+            to_timestamp(blob.updated),
+            base64_md5(blob.md5_hash),
+            _crc32c(blob),
+        )
+
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        blob = self.storage_client.bucket(bucket_name).blob(remote_blob_path)
+        blob.reload()
+        # composite objects have a crc32c but no md5
+        return Checksums(base64_md5(blob.md5_hash), crc32c=_crc32c(blob))
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        bucket = self.storage_client.bucket(bucket_name)
+        blob = bucket.blob(remote_blob_path)
+        # end is exclusive here and inclusive for the GCS API
+        return blob.download_as_bytes(start=start, end=end - 1)
 
     def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
+        """
+        a resumable upload sending part_size chunks one after the other,
+        the object keeps its md5
+
+        composite_upload_threshold=<bytes> uploads files of at least that
+        size as parallel parts composed into the object instead. It is
+        faster on fast links, but the object has no md5 (only crc32c), each
+        part costs two more class A operations, parts are staged as
+        objects under <blob>.cloud_storage_slim-<id>/ until the upload ends
+        (and after a crash, see list_multipart_uploads), Nearline, Coldline
+        and Archive buckets bill their early deletion and a retention policy
+        keeps them from being deleted
+        """
+        content_type, _ = mimetypes.guess_type(local_blob_path)
+        composite_upload_threshold = kwargs.get("composite_upload_threshold")
+        size = os.path.getsize(local_blob_path)
+        if composite_upload_threshold is not None and size >= composite_upload_threshold:
+            self._composite_upload(bucket_name, local_blob_path, remote_blob_path, content_type, **kwargs)
+            return
+
+        part_size = kwargs.get("part_size", DEFAULT_PART_SIZE)
+        if kwargs.get("max_buffer_bytes") is not None:
+            part_size = min(part_size, kwargs["max_buffer_bytes"])
+        chunk_size = _resumable_chunk_size(part_size)
+        hasher = kwargs.get("hasher")
+        throttle = kwargs.get("throttle")
+        upload_options = {k: v for k, v in kwargs.items() if k in ["predefined_acl"]}
+        if size <= chunk_size:
+            with reserve(kwargs.get("memory_budget"), size), open(local_blob_path, "rb") as f:
+                data = f.read()
+                if hasher is not None:
+                    hasher.update(data)
+                throttle_bytes(throttle, len(data))
+                retry_call(
+                    kwargs.get("retrier"),
+                    self.upload_bytes,
+                    bucket_name,
+                    data,
+                    remote_blob_path,
+                    content_type=content_type,
+                    **upload_options,
+                )
+            return
+
+        blob = self.storage_client.bucket(bucket_name).blob(remote_blob_path)
+        # the SDK retries the chunks of a resumable session, the upload is
+        # committed once whatever the retries
+        retry = importlib.import_module("google.cloud.storage.retry").DEFAULT_RETRY
+        with reserve(kwargs.get("memory_budget"), chunk_size), open(local_blob_path, "rb") as f:
+            with blob.open(
+                "wb",
+                chunk_size=chunk_size,
+                content_type=content_type or "application/octet-stream",
+                retry=retry,
+                **upload_options,
+            ) as writer:
+                for data in iter(lambda: f.read(chunk_size), b""):
+                    if hasher is not None:
+                        hasher.update(data)
+                    throttle_bytes(throttle, len(data))
+                    writer.write(data)
+
+    def _composite_upload(self, bucket_name, local_blob_path, remote_blob_path, content_type, **kwargs):
+        upload_options = {
+            k: v
+            for k, v in kwargs.items()
+            if k
+            in [
+                "parallelism",
+                "part_size",
+                "max_buffer_bytes",
+                "memory_budget",
+                "hasher",
+                "journal",
+                "retrier",
+                "throttle",
+                "predefined_acl",
+            ]
+        }
+        multipart_upload_file(
+            self, bucket_name, local_blob_path, remote_blob_path, content_type=content_type, **upload_options
+        )
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        bucket = self.storage_client.bucket(bucket_name)
+        return bucket.blob(remote_blob_path).download_as_bytes()
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        bucket = self.storage_client.bucket(bucket_name)
+        blob = bucket.blob(remote_blob_path)
+
+        upload_options = {k: v for k, v in kwargs.items() if k in ["predefined_acl"]}
+        content_type = kwargs.get("content_type") or "application/octet-stream"
+        blob.upload_from_string(data, content_type=content_type, **upload_options)
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, upload_id=None, **kwargs):
+        bucket = self.storage_client.bucket(bucket_name)
+        return GCSCompositeUpload(
+            bucket,
+            remote_blob_path,
+            content_type=kwargs.get("content_type"),
+            predefined_acl=kwargs.get("predefined_acl"),
+            upload_id=upload_id,
+        )
+
+    def list_multipart_uploads(self, bucket_name, pattern):
+        """
+        composite uploads are found by their staged parts
+        """
+        initiated_by_upload = {}
+        for blob in self.storage_client.list_blobs(bucket_name, prefix=pattern):
+            if STAGING_INFIX not in blob.name:
+                continue
+            remote_blob_path, staged_part = blob.name.rsplit(STAGING_INFIX, 1)
+            upload = (remote_blob_path, staged_part.split("/", 1)[0])
+            initiated = to_timestamp(blob.time_created)
+            initiated_by_upload[upload] = min(initiated, initiated_by_upload.get(upload, initiated))
+        for (remote_blob_path, upload_id), initiated in initiated_by_upload.items():
+            yield remote_blob_path, upload_id, initiated
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        blob = self.storage_client.bucket(bucket_name).blob(remote_blob_path)
+        return blob.generate_signed_url(version="v4", expiration=datetime.timedelta(seconds=expiration), method="GET")
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        """
+        objects.rewrite copies any size, across locations and storage classes
+        too, large copies take several calls that continue from a token
+        """
+        retrier = kwargs.get("retrier")
+        source_blob = self.storage_client.bucket(source_bucket_name).blob(source_blob_path)
+        dest_blob = self.storage_client.bucket(dest_bucket_name).blob(dest_blob_path)
+        # every call is retried alone, continuing from the last token
+        token, _, _ = retry_call(retrier, dest_blob.rewrite, source_blob)
+        while token is not None:
+            token, _, _ = retry_call(retrier, dest_blob.rewrite, source_blob, token=token)
+
+        predefined_acl = kwargs.get("predefined_acl")
+        if predefined_acl is not None:
+            retry_call(retrier, dest_blob.acl.save_predefined, predefined_acl)
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        throttle = kwargs.get("throttle")
+        bucket = self.storage_client.bucket(bucket_name)
+        blob = bucket.blob(remote_blob_path)
+
+        with blob.open("rb", chunk_size=chunk_size) as reader:
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                throttle_bytes(throttle, len(chunk))
+                yield chunk
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        """
+        chunk_size of the resumable upload must be a multiple of 256 KiB,
+        it is lowered to fit max_buffer_bytes down to 256 KiB
+        """
         bucket = self.storage_client.bucket(bucket_name)
         blob = bucket.blob(remote_blob_path)
 
         upload_options = {k: v for k, v in kwargs.items() if k in ["predefined_acl"]}
-        blob.upload_from_filename(local_blob_path, **upload_options)
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        if kwargs.get("max_buffer_bytes") is not None:
+            chunk_size = _resumable_chunk_size(min(chunk_size, kwargs["max_buffer_bytes"]))
+        throttle = kwargs.get("throttle")
+        # an exception inside the block terminates the resumable upload
+        # instead of committing a partial object
+        with blob.open("wb", chunk_size=chunk_size, **upload_options) as writer:
+            for chunk in chunks:
+                throttle_bytes(throttle, len(chunk))
+                writer.write(chunk)
 
     def list_blobs(self, bucket_name, pattern):
-        bucket = self.storage_client.get_bucket(bucket_name)
-        blobs = bucket.list_blobs(prefix=pattern)
-        blobs_list = list(blobs)
-        blobs_list_names = [blob.name for blob in blobs_list]
-        return blobs_list_names
+        return [blob_info.key for blob_info in self.iter_blobs(bucket_name, pattern)]
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        # start_offset is inclusive
+        blobs = self.storage_client.list_blobs(bucket_name, prefix=pattern, start_offset=start_after)
+        for blob in blobs:
+            if blob.name != start_after and STAGING_INFIX not in blob.name:
+                yield self._blob_info(blob)
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        """
+        one level of a delimiter listing: yields the common prefixes below
+        pattern and the BlobInfo of the blobs directly under it in key order
+        """
+        blobs = self.storage_client.list_blobs(bucket_name, prefix=pattern, delimiter=delimiter)
+        for page in blobs.pages:
+            blob_infos = [self._blob_info(blob) for blob in page if STAGING_INFIX not in blob.name]
+            prefixes = [prefix for prefix in page.prefixes if STAGING_INFIX not in prefix]
+            yield from sorted_entries(prefixes, blob_infos)
 
     def get_first_blob(self, bucket_name, pattern):
-        bucket = self.storage_client.get_bucket(bucket_name)
-        blobs = bucket.list_blobs(prefix=pattern)
-        blobs_list = list(blobs)
-        if len(blobs_list) == 0:
-            return None
-        return blobs_list[0].name
+        blob_info = next(self.iter_blobs(bucket_name, pattern), None)
+        return blob_info.key if blob_info is not None else None
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        bucket = self.storage_client.bucket(bucket_name)
+        bucket.blob(remote_blob_path).delete()
 
     def get_native_client(self):
         return self.storage_client
@@ -43,4 +340,10 @@ class GoogleCloudStorage(CloudStorage):
 
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
         raise NotImplementedError("Google Cloud Storage does not support uploading to URI")
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Google Cloud Storage does not support reading from URI")
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        raise NotImplementedError("Google Cloud Storage does not support writing to URI")
     
\ No newline at end of file
@@ -1,13 +1,16 @@
 import importlib
 import urllib3
-from cloud_storage_slim import CloudStorage
+from cloud_storage_slim import CloudStorage, DEFAULT_POOL_MAXSIZE
+from cloud_storage_slim.utils import BlobInfo, configure_requests_session, normalize_etag
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE, SizedChunks
+from cloud_storage_slim.ratelimit import ThrottledReader, throttle_bytes, throttled_chunks
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class HttpRemoteFile(CloudStorage):
-    def __init__(self) -> None:
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True) -> None:
         storage_module = importlib.import_module("requests")
-        self.requests_session = storage_module.Session()
+        self.requests_session = configure_requests_session(storage_module.Session(), pool_maxsize, keep_alive)
 
     def download_uri(self, remote_blob_uri, local_blob_path, **kwargs):
         """
@@ -17,18 +20,75 @@ class HttpRemoteFile(CloudStorage):
         download_options = {k: v for k, v in kwargs.items() if k in enabled_options}
 
         response = self.requests_session.get(remote_blob_uri, stream=True, verify=False, **download_options)
-
-        with open(local_blob_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        try:
+            # an error page must not be saved as the file
+            response.raise_for_status()
+            throttle = kwargs.get("throttle")
+            with open(local_blob_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if chunk:
+                        throttle_bytes(throttle, len(chunk))
+                        f.write(chunk)
+        finally:
+            response.close()
 
     def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
+        # headers go with the request, the session is shared between threads
+        throttle = kwargs.get("throttle")
         with open(local_blob_path, 'rb') as f:
-            if "headers" in kwargs:
-                headers = kwargs["headers"]
-                self.requests_session.headers.update(headers)
-            self.requests_session.put(remote_blob_uri, data=f, verify=False)
+            data = ThrottledReader(f, throttle) if throttle is not None else f
+            response = self.requests_session.put(
+                remote_blob_uri, data=data, headers=kwargs.get("headers"), verify=False
+            )
+        response.raise_for_status()
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        enabled_options = ["timeout"]
+        download_options = {k: v for k, v in kwargs.items() if k in enabled_options}
+        chunk_size = kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE)
+
+        response = self.requests_session.get(remote_blob_uri, stream=True, verify=False, **download_options)
+        try:
+            response.raise_for_status()
+            throttle = kwargs.get("throttle")
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    throttle_bytes(throttle, len(chunk))
+                    yield chunk
+        finally:
+            response.close()
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        """
+        with the total `size` of the chunks the request has a Content-Length,
+        without it the body is sent with chunked transfer encoding
+        """
+        enabled_options = ["timeout", "headers"]
+        upload_options = {k: v for k, v in kwargs.items() if k in enabled_options}
+
+        chunks = throttled_chunks(chunks, kwargs.get("throttle"))
+        if kwargs.get("size") is not None:
+            chunks = SizedChunks(chunks, kwargs["size"])
+        response = self.requests_session.put(remote_blob_uri, data=chunks, verify=False, **upload_options)
+        response.raise_for_status()
+
+    def stat_uri(self, remote_blob_uri):
+        response = self.requests_session.head(remote_blob_uri, allow_redirects=True, verify=False)
+        response.raise_for_status()
+        return BlobInfo(
+            remote_blob_uri,
+            int(response.headers["Content-Length"]),
+            normalize_etag(response.headers.get("ETag")),
+            None,
+        )
+
+    def read_range_uri(self, remote_blob_uri, start, end):
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        response = self.requests_session.get(remote_blob_uri, headers=headers, verify=False)
+        response.raise_for_status()
+        if response.status_code != 206 and not (start == 0 and len(response.content) == end):
+            raise IOError(f"{remote_blob_uri} does not support range requests")
+        return response.content
 
     def get_native_client(self):
         return self.requests_session
@@ -42,5 +102,35 @@ class HttpRemoteFile(CloudStorage):
     def list_blobs(self, bucket_name, pattern):
         raise NotImplementedError("HttpRemoteFile does not support listing blobs")
     
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        raise NotImplementedError("HttpRemoteFile does not support listing blobs")
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        raise NotImplementedError("HttpRemoteFile does not support listing prefixes")
+
     def get_first_blob(self, bucket_name, pattern):
         raise NotImplementedError("HttpRemoteFile does not support getting the first blob")
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        raise NotImplementedError("HttpRemoteFile does not support deleting blobs")
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        raise NotImplementedError("HttpRemoteFile does not support getting blob metadata from bucket")
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        raise NotImplementedError("HttpRemoteFile does not support ranged reads from bucket")
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        raise NotImplementedError("HttpRemoteFile does not support downloading from bucket")
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        raise NotImplementedError("HttpRemoteFile does not support uploading to bucket")
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, **kwargs):
+        raise NotImplementedError("HttpRemoteFile does not support multipart uploads")
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        raise NotImplementedError("HttpRemoteFile does not support reading from bucket")
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        raise NotImplementedError("HttpRemoteFile does not support writing to bucket")
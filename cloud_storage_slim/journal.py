@@ -0,0 +1,103 @@
+import os
+import json
+import threading
+
+
+class TransferJournal:
+    """
+    Append-only checkpoint of one multipart upload or segmented download.
+
+    The first line is the header identifying the transfer (source, dest,
+    source size and version, part size); every later line records the
+    upload id, a completed part with its token or a completed byte range.
+    Loading a journal whose header differs from `header` starts over, so a
+    changed source or different options never resume stale progress.
+    Lines are flushed as they are written, a killed process keeps them.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.upload_id = None
+        self.parts = {}
+        self.ranges = set()
+        self._lock = threading.Lock()
+        self._file = None
+        self._loaded = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        try:
+            if not lines or json.loads(lines[0]) != self.header:
+                return
+        except ValueError:
+            return
+        self._loaded = True
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line cut short when the process was killed
+                continue
+            if "upload_id" in record:
+                self.upload_id = record["upload_id"]
+            elif "part" in record:
+                self.parts[record["part"]] = record["token"]
+            elif "range" in record:
+                self.ranges.add(tuple(record["range"]))
+
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if self._loaded:
+                    self._file = open(self.path, "a")
+                    # start a fresh line after a cut short one
+                    self._file.write("\n")
+                else:
+                    self._file = open(self.path, "w")
+                    self._file.write(json.dumps(self.header) + "\n")
+                    self._loaded = True
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    @property
+    def resumed(self):
+        """
+        whether progress of an earlier attempt was loaded
+        """
+        return self.upload_id is not None or bool(self.parts) or bool(self.ranges)
+
+    def start_upload(self, upload_id):
+        self._append({"upload_id": upload_id})
+        self.upload_id = upload_id
+
+    def record_part(self, part_number, token):
+        self._append({"part": part_number, "token": token})
+        with self._lock:
+            self.parts[part_number] = token
+
+    def record_range(self, start, end):
+        self._append({"range": [start, end]})
+        with self._lock:
+            self.ranges.add((start, end))
+
+    def remove(self):
+        """
+        forget every recorded step and delete the journal, called once the
+        transfer completed or its progress cannot be used
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._loaded = False
+            self.upload_id = None
+            self.parts = {}
+            self.ranges = set()
+            if os.path.exists(self.path):
+                os.remove(self.path)
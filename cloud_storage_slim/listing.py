@@ -0,0 +1,233 @@
+import queue
+import threading
+import collections
+import concurrent.futures
+from os.path import commonprefix
+
+DEFAULT_MAX_SHARD_DEPTH = 2
+# blobs directly under a prefix the delimiter listing reads before the rest
+# of that level is split into key ranges instead
+DEFAULT_MAX_LEVEL_BLOBS = 1000
+# shards are handed from the workers to the consumer in pages of this many
+# BlobInfo, at most DEFAULT_MAX_SHARD_PAGES pages ahead per shard
+DEFAULT_SHARD_PAGE_SIZE = 1000
+DEFAULT_MAX_SHARD_PAGES = 2
+# seconds a worker waits on a full page queue before checking it was stopped
+SHARD_POLL_INTERVAL = 0.1
+
+
+class KeyRange(collections.namedtuple("KeyRange", ["pattern", "start_after", "last"])):
+    """
+    The keys under `pattern` greater than `start_after` and not greater than
+    `last`, a whole prefix when both are None.
+    """
+
+    __slots__ = ()
+
+    def sort_key(self):
+        # the smallest key greater than start_after
+        return self.pattern if self.start_after is None else self.start_after + "\0"
+
+
+def entry_key(entry):
+    """
+    the key of a list_prefixes entry, a common prefix or a BlobInfo
+    """
+    return entry if isinstance(entry, str) else entry.key
+
+
+def sorted_entries(prefixes, blob_infos):
+    """
+    the common prefixes and BlobInfo of one listing page in key order
+    """
+    return sorted(list(prefixes) + list(blob_infos), key=entry_key)
+
+
+def split_key_range(pattern, keys):
+    """
+    Split the keys under `pattern` after the last of `keys`, a sorted sample
+    of them, into KeyRange.
+
+    Boundaries are the last key cut after each character up to where the
+    sample starts varying, followed by a greater character seen in the
+    sample, so a keyspace like the sample is split into ranges that shrink
+    towards the sample, tenfold per position for decimal names. Boundaries
+    only balance the ranges: together they always cover every key.
+    """
+    last_key = keys[-1]
+    alphabet = sorted({c for key in keys for c in key[len(pattern):]})
+    varying = len(commonprefix([keys[0], last_key]))
+    boundaries = set()
+    for position in range(len(pattern), min(varying + 1, len(last_key))):
+        boundaries.update(last_key[:position] + c for c in alphabet if c > last_key[position])
+    bounds = [last_key] + sorted(boundaries)
+    return [KeyRange(pattern, start_after, last) for start_after, last in zip(bounds, bounds[1:] + [None])]
+
+
+def _list_level(client, bucket_name, pattern, delimiter, max_level_blobs):
+    """
+    one level of the delimiter listing of pattern: (common prefixes, BlobInfo
+    directly under it, KeyRange of the rest when the level was cut short)
+    """
+    prefixes = []
+    blob_infos = []
+    for entry in client.list_prefixes(bucket_name, pattern, delimiter):
+        if isinstance(entry, str):
+            prefixes.append(entry)
+            continue
+        blob_infos.append(entry)
+        if len(blob_infos) >= max_level_blobs:
+            # a flat level, paging through it here would list it sequentially
+            key_ranges = split_key_range(pattern, [blob_info.key for blob_info in blob_infos])
+            return prefixes, blob_infos, key_ranges
+    return prefixes, blob_infos, []
+
+
+def split_shards(
+    client,
+    bucket_name,
+    pattern,
+    parallel,
+    delimiter="/",
+    max_depth=DEFAULT_MAX_SHARD_DEPTH,
+    executor=None,
+    max_level_blobs=DEFAULT_MAX_LEVEL_BLOBS,
+):
+    """
+    Split the keyspace under `pattern` into shards with delimiter listings.
+
+    Returns a list of (sort key, shard) where a shard is either a KeyRange to
+    be walked later or the BlobInfo of a blob found directly under an
+    expanded level. Prefixes are expanded one level at a time until there
+    are at least `parallel` of them or `max_depth` levels were expanded.
+    A level with more than `max_level_blobs` blobs directly under it is not
+    listed further: the keys after the last one read are split into key
+    ranges with split_key_range, so a flat keyspace is walked in parallel
+    with start-after listings.
+    """
+    units = []
+    prefixes = [pattern]
+    for _ in range(max_depth):
+
+        def list_level(prefix):
+            return _list_level(client, bucket_name, prefix, delimiter, max_level_blobs)
+
+        levels = list(executor.map(list_level, prefixes)) if executor is not None else map(list_level, prefixes)
+
+        prefixes = []
+        for level_prefixes, level_blob_infos, key_ranges in levels:
+            units.extend((blob_info.key, blob_info) for blob_info in level_blob_infos)
+            units.extend((key_range.sort_key(), key_range) for key_range in key_ranges)
+            prefixes.extend(level_prefixes)
+        if len(prefixes) >= parallel:
+            break
+    units.extend((prefix, KeyRange(prefix, None, None)) for prefix in prefixes)
+    # every key under a prefix sorts after the prefix and before any other
+    # key or prefix greater than it, so the shards are contiguous ranges
+    units.sort(key=lambda unit: unit[0])
+    return units
+
+
+def iter_key_range(client, bucket_name, key_range):
+    """
+    yield the BlobInfo of the keys in a KeyRange
+    """
+    for blob_info in client.iter_blobs(bucket_name, key_range.pattern, key_range.start_after):
+        if key_range.last is not None and blob_info.key > key_range.last:
+            return
+        yield blob_info
+
+
+def _put(pages, item, stopped):
+    while not stopped.is_set():
+        try:
+            pages.put(item, timeout=SHARD_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _list_shard(client, bucket_name, key_range, pages, stopped, page_size):
+    """
+    list a shard into pages, a page queue ending with None or the error
+    """
+    if stopped.is_set():
+        return
+    try:
+        page = []
+        for blob_info in iter_key_range(client, bucket_name, key_range):
+            page.append(blob_info)
+            if len(page) == page_size:
+                if not _put(pages, page, stopped):
+                    return
+                page = []
+        if page and not _put(pages, page, stopped):
+            return
+        _put(pages, None, stopped)
+    except Exception as e:
+        _put(pages, e, stopped)
+
+
+def iter_blobs_parallel(
+    client,
+    bucket_name,
+    pattern,
+    parallel,
+    delimiter="/",
+    max_depth=DEFAULT_MAX_SHARD_DEPTH,
+    page_size=DEFAULT_SHARD_PAGE_SIZE,
+    max_pages=DEFAULT_MAX_SHARD_PAGES,
+):
+    """
+    Walk a listing as concurrent shards and yield BlobInfo in key order.
+
+    Each KeyRange found by `split_shards` is listed with `iter_blobs` on its
+    own worker, at most `parallel` shards ahead of the consumer, and the
+    shards are yielded in order. Workers hand their shard over in pages of
+    `page_size` and stop once `max_pages` pages are waiting, so memory is
+    bounded by parallel * max_pages * page_size BlobInfo however large a
+    shard is.
+    """
+    stopped = threading.Event()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+        units = iter(split_shards(client, bucket_name, pattern, parallel, delimiter, max_depth, executor))
+        pending = collections.deque()
+        in_flight = 0
+
+        def fill():
+            nonlocal in_flight
+            while in_flight < parallel:
+                unit = next(units, None)
+                if unit is None:
+                    return
+                _, shard = unit
+                if isinstance(shard, KeyRange):
+                    pages = queue.Queue(max_pages)
+                    executor.submit(_list_shard, client, bucket_name, shard, pages, stopped, page_size)
+                    pending.append(pages)
+                    in_flight += 1
+                else:
+                    pending.append(shard)
+
+        try:
+            fill()
+            while pending:
+                shard = pending.popleft()
+                if isinstance(shard, queue.Queue):
+                    while True:
+                        page = shard.get()
+                        if page is None:
+                            break
+                        if isinstance(page, Exception):
+                            raise page
+                        for blob_info in page:
+                            yield blob_info
+                    in_flight -= 1
+                    fill()
+                else:
+                    fill()
+                    yield shard
+        finally:
+            # workers blocked on a full page queue give up
+            stopped.set()
@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1024
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "max_entries", "entries"])
+
+
+class ListingCache:
+    """
+    In-process cache of complete listings keyed by (scheme, bucket, prefix).
+
+    Entries expire `ttl` seconds after they were stored and the least
+    recently used entry is evicted once there are more than `max_entries`.
+    A listing of a prefix also answers lookups of any longer prefix, and
+    writing a key drops every listing it could appear in.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, scheme, bucket_name, prefix, first_only, now):
+        for entry_key, (expires_at, blob_infos, complete) in list(self._entries.items()):
+            entry_scheme, entry_bucket_name, entry_prefix = entry_key
+            if entry_scheme != scheme or entry_bucket_name != bucket_name or not prefix.startswith(entry_prefix):
+                continue
+            if expires_at <= now:
+                del self._entries[entry_key]
+                continue
+            if complete:
+                return entry_key, [blob_info for blob_info in blob_infos if blob_info.key.startswith(prefix)]
+            if first_only and entry_prefix == prefix:
+                return entry_key, blob_infos
+        return None, None
+
+    def get(self, scheme, bucket_name, prefix, first_only=False):
+        """
+        return the cached BlobInfo list of every blob under prefix, or None
+
+        with first_only the list may hold only the first blob, which also
+        lets entries stored by a get_first_blob lookup answer
+        """
+        with self._lock:
+            entry_key, blob_infos = self._lookup(scheme, bucket_name, prefix, first_only, time.monotonic())
+            if entry_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return blob_infos[:1] if first_only else blob_infos
+
+    def put(self, scheme, bucket_name, prefix, blob_infos, complete=True):
+        """
+        store the listing of prefix, complete=False marks a listing that
+        only holds the first blob
+        """
+        with self._lock:
+            entry_key = (scheme, bucket_name, prefix)
+            self._entries[entry_key] = (time.monotonic() + self.ttl, list(blob_infos), complete)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scheme, bucket_name, key):
+        """
+        drop every listing that the blob at key belongs to
+        """
+        with self._lock:
+            for entry_key in list(self._entries):
+                entry_scheme, entry_bucket_name, entry_prefix = entry_key
+                if entry_scheme == scheme and entry_bucket_name == bucket_name and key.startswith(entry_prefix):
+                    del self._entries[entry_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.max_entries, len(self._entries))
@@ -0,0 +1,66 @@
+import threading
+import contextlib
+
+
+class MemoryBudget:
+    """
+    Byte budget shared by concurrent transfers.
+
+    Part downloads and uploads reserve the size of their buffer before
+    allocating it and block while the budget is used up. A reservation larger
+    than the whole budget is trimmed to it, so it runs alone instead of
+    waiting forever.
+    """
+
+    def __init__(self, max_bytes):
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        self.max_bytes = max_bytes
+        self.bytes_in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        """
+        block until nbytes are available, returns the bytes to release
+        """
+        nbytes = min(nbytes, self.max_bytes)
+        with self._condition:
+            while self.bytes_in_use + nbytes > self.max_bytes:
+                self._condition.wait()
+            self.bytes_in_use += nbytes
+        return nbytes
+
+    def release(self, nbytes):
+        with self._condition:
+            self.bytes_in_use -= nbytes
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def reserve(self, nbytes):
+        nbytes = self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+
+def fit_buffer(parallelism, part_size, max_buffer_bytes):
+    """
+    Lower parallelism, then part_size, until `parallelism` buffers of
+    `part_size` bytes fit in max_buffer_bytes. Returns (parallelism, part_size).
+    """
+    if max_buffer_bytes is None:
+        return parallelism, part_size
+    if max_buffer_bytes <= 0:
+        raise ValueError(f"max_buffer_bytes must be positive, got {max_buffer_bytes}")
+    part_size = min(part_size, max_buffer_bytes)
+    return max(1, min(parallelism, max_buffer_bytes // part_size)), part_size
+
+
+def reserve(memory_budget, nbytes):
+    """
+    reserve nbytes of memory_budget, a no-op context without a budget
+    """
+    if memory_budget is None:
+        return contextlib.nullcontext()
+    return memory_budget.reserve(nbytes)
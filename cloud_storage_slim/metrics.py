@@ -0,0 +1,212 @@
+import time
+import bisect
+import threading
+import collections
+
+# seconds, from a cached HEAD to a multi-GiB part
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# request kinds by the name of the backend call
+OPERATIONS = {
+    "stat_blob": "head",
+    "stat_uri": "head",
+    "stat_checksums": "head",
+    "read_range": "get",
+    "read_range_uri": "get",
+    "download_bytes": "get",
+    "download_uri": "get",
+    "get_first_chunk": "get",
+    "upload_bytes": "put",
+    "upload_uri": "put",
+    "upload_part": "put",
+    "list_blobs": "list",
+    "list_prefixes": "list",
+    "get_first_blob": "list",
+    "delete_blob": "delete",
+    "copy_blob": "copy",
+    "copy_from_url": "copy",
+    "copy_object": "copy",
+    "copy_part": "copy",
+    "copy_part_from_url": "copy",
+    "upload_blob_from_url": "copy",
+    "start_copy_from_url": "copy",
+    "rewrite": "copy",
+    "create_multipart_upload": "create_multipart_upload",
+    "complete": "complete_multipart_upload",
+    "abort": "abort_multipart_upload",
+}
+
+
+def operation_name(func):
+    name = getattr(func, "__name__", None)
+    return OPERATIONS.get(name, name or "request")
+
+
+class TransferObserver:
+    """
+    Receives the events of every request and transfer of a CloudStorageSlim.
+
+    Methods are called on the transfer threads, often once per chunk, and
+    must return quickly without raising; subclasses override what they need.
+    `direction` is "read" for bytes coming from a bucket and "write" for
+    bytes sent to it. HTTP sources are tagged with their host as bucket.
+    """
+
+    def on_request(self, scheme, bucket_name, operation, seconds, error=None):
+        """
+        one request attempt finished, error is the exception it raised
+        """
+        pass
+
+    def on_retry(self, scheme, bucket_name, operation, error):
+        """
+        a failed request is about to be retried
+        """
+        pass
+
+    def on_bytes(self, scheme, bucket_name, direction, nbytes):
+        pass
+
+    def on_transfer(self, source_path, dest_path, seconds, error=None):
+        """
+        a copyto finished
+        """
+        pass
+
+
+class Histogram:
+    """
+    Count of observed values per bucket (not cumulative), their sum and count.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # the last count is for values above every bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {
+            "buckets": dict(zip([*self.bounds, float("inf")], self.counts)),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class MetricsAggregator(TransferObserver):
+    """
+    TransferObserver keeping counters and latency histograms by scheme,
+    bucket and operation, exported with `snapshot` as a dict or with
+    `to_prometheus` in the Prometheus text format. Every event costs one
+    lock round and a few dict updates.
+    """
+
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = collections.Counter()
+        self._retries = collections.Counter()
+        self._bytes = collections.Counter()
+        self._transfers = collections.Counter()
+        self._transfer_latencies = Histogram(self.latency_buckets)
+
+    def on_request(self, scheme, bucket_name, operation, seconds, error=None):
+        key = (scheme, bucket_name, operation)
+        with self._lock:
+            histogram = self._latencies.get(key)
+            if histogram is None:
+                histogram = self._latencies[key] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+            if error is not None:
+                self._errors[key + (type(error).__name__,)] += 1
+
+    def on_retry(self, scheme, bucket_name, operation, error):
+        with self._lock:
+            self._retries[(scheme, bucket_name, operation)] += 1
+
+    def on_bytes(self, scheme, bucket_name, direction, nbytes):
+        with self._lock:
+            self._bytes[(scheme, bucket_name, direction)] += nbytes
+
+    def on_transfer(self, source_path, dest_path, seconds, error=None):
+        with self._lock:
+            self._transfers["failed" if error is not None else "succeeded"] += 1
+            self._transfer_latencies.observe(seconds)
+
+    def snapshot(self):
+        """
+        a dict of every metric, throughput is the average bytes/sec since
+        the aggregator was created
+        """
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            return {
+                "elapsed": elapsed,
+                "requests": [
+                    {"scheme": s, "bucket": b, "operation": o, "latency": histogram.snapshot()}
+                    for (s, b, o), histogram in self._latencies.items()
+                ],
+                "errors": [
+                    {"scheme": s, "bucket": b, "operation": o, "error": e, "count": count}
+                    for (s, b, o, e), count in self._errors.items()
+                ],
+                "retries": [
+                    {"scheme": s, "bucket": b, "operation": o, "count": count}
+                    for (s, b, o), count in self._retries.items()
+                ],
+                "bytes": [
+                    {"scheme": s, "bucket": b, "direction": d, "bytes": count, "throughput": count / elapsed}
+                    for (s, b, d), count in self._bytes.items()
+                ],
+                "transfers": dict(self._transfers, latency=self._transfer_latencies.snapshot()),
+            }
+
+    def to_prometheus(self, prefix="cloud_storage_slim"):
+        lines = []
+
+        def histogram_lines(name, histogram, **labels):
+            cumulative = 0
+            for bound, count in zip([*histogram.bounds, "+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+        with self._lock:
+            lines.append(f"# TYPE {prefix}_request_seconds histogram")
+            for (s, b, o), histogram in sorted(self._latencies.items()):
+                histogram_lines(f"{prefix}_request_seconds", histogram, scheme=s, bucket=b, operation=o)
+            lines.append(f"# TYPE {prefix}_request_errors_total counter")
+            for (s, b, o, e), count in sorted(self._errors.items()):
+                labels = _labels(scheme=s, bucket=b, operation=o, error=e)
+                lines.append(f"{prefix}_request_errors_total{labels} {count}")
+            lines.append(f"# TYPE {prefix}_request_retries_total counter")
+            for (s, b, o), count in sorted(self._retries.items()):
+                lines.append(f"{prefix}_request_retries_total{_labels(scheme=s, bucket=b, operation=o)} {count}")
+            lines.append(f"# TYPE {prefix}_bytes_total counter")
+            for (s, b, d), count in sorted(self._bytes.items()):
+                lines.append(f"{prefix}_bytes_total{_labels(scheme=s, bucket=b, direction=d)} {count}")
+            lines.append(f"# TYPE {prefix}_transfers_total counter")
+            for outcome, count in sorted(self._transfers.items()):
+                lines.append(f"{prefix}_transfers_total{_labels(outcome=outcome)} {count}")
+            lines.append(f"# TYPE {prefix}_transfer_seconds histogram")
+            histogram_lines(f"{prefix}_transfer_seconds", self._transfer_latencies)
+        return "\n".join(lines) + "\n"
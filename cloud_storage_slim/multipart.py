@@ -0,0 +1,374 @@
+import os
+import itertools
+import threading
+import concurrent.futures
+from abc import ABC, abstractmethod
+from cloud_storage_slim.segmented import DEFAULT_PART_SIZE, DEFAULT_PARALLELISM, split_ranges
+from cloud_storage_slim.memory import fit_buffer, reserve
+from cloud_storage_slim.retry import retry_call
+from cloud_storage_slim.ratelimit import throttle_bytes
+
+# server-side part copies move no bytes through this host, so bigger parts
+# only mean fewer requests
+DEFAULT_COPY_PART_SIZE = 256 * 1024 * 1024
+
+
+class MultipartUpload(ABC):
+    """
+    One in-progress multipart (or block) upload on a backend.
+
+    Backends return an instance from `create_multipart_upload`; the engine in
+    this module uploads the parts concurrently and then completes the upload,
+    or aborts it if any part fails.
+    """
+
+    # the maximum number of parts the provider accepts for one object
+    max_parts = 10000
+    # passed back as create_multipart_upload(upload_id=...) to resume the upload
+    upload_id = None
+
+    @abstractmethod
+    def upload_part(self, part_number, data):
+        """
+        Upload one part, numbered from 1, and return the token `complete` needs for it.
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, parts):
+        """
+        Assemble the object from `parts`, a list of (part_number, token) in order.
+        """
+        pass
+
+    @abstractmethod
+    def abort(self):
+        pass
+
+    def copy_part(self, part_number, source_bucket_name, source_blob_path, start, end):
+        """
+        Copy bytes [start, end) of a blob of the same provider into one part
+        server-side and return the token `complete` needs for it.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support copying parts")
+
+    def copy_part_from_url(self, part_number, source_url, start, end):
+        """
+        Let the provider fetch bytes [start, end) of `source_url` into one part
+        and return the token `complete` needs for it.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support copying parts from URL")
+
+
+def fit_part_size(size, part_size, max_parts):
+    """
+    Grow `part_size` when `size` would otherwise need more than `max_parts` parts.
+    """
+    min_part_size = -(size // -max_parts)  # Ceiling division
+    return max(part_size, min_part_size)
+
+
+def _read_range(local_blob_path, start, end):
+    with open(local_blob_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _upload_parts(
+    upload,
+    parts_data,
+    parallelism,
+    send_part=None,
+    memory_budget=None,
+    part_size=None,
+    journal=None,
+    retrier=None,
+    throttle=None,
+):
+    """
+    Upload (part_number, data or callable returning data) pairs and complete.
+    `parts_data` is consumed lazily; at most `parallelism` parts are in flight.
+    `send_part(part_number, data)` replaces `upload.upload_part` when given.
+    With a `memory_budget`, `part_size` bytes are reserved before each part is
+    read from `parts_data` or its callable and released once it is uploaded.
+    With a TransferJournal, every uploaded part is recorded, parts it already
+    holds are completed along with the new ones, and a failed upload is left
+    open for the next attempt instead of being aborted.
+    Part requests go through `retrier` when given; completing is not
+    idempotent and is only retried when throttled. Every part waits for its
+    bytes of `throttle` before it is sent.
+    """
+    slots = threading.BoundedSemaphore(parallelism)
+    send_part = send_part or upload.upload_part
+
+    def upload_one(part_number, data, reserved_bytes):
+        try:
+            if callable(data):
+                data = data()
+            throttle_bytes(throttle, len(data))
+            token = retry_call(retrier, send_part, part_number, data)
+            if journal is not None:
+                journal.record_part(part_number, token)
+            return part_number, token
+        finally:
+            if reserved_bytes:
+                memory_budget.release(reserved_bytes)
+            slots.release()
+
+    futures = []
+    parts_data = iter(parts_data)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+            while True:
+                slots.acquire()
+                reserved_bytes = memory_budget.acquire(part_size) if memory_budget is not None else 0
+                part = next(parts_data, None)
+                if part is None or any(future.done() and future.exception() for future in futures):
+                    if reserved_bytes:
+                        memory_budget.release(reserved_bytes)
+                    slots.release()
+                    break
+                part_number, data = part
+                futures.append(executor.submit(upload_one, part_number, data, reserved_bytes))
+        parts = [future.result() for future in futures]
+        if journal is not None:
+            # the journal also holds the parts of earlier attempts
+            parts = journal.parts.items()
+        retry_call(retrier, upload.complete, sorted(parts), idempotent=False)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        if journal is None:
+            retry_call(retrier, upload.abort)
+        raise
+
+
+def multipart_upload_file(
+    client,
+    bucket_name,
+    local_blob_path,
+    remote_blob_path,
+    parallelism=DEFAULT_PARALLELISM,
+    part_size=DEFAULT_PART_SIZE,
+    max_buffer_bytes=None,
+    memory_budget=None,
+    hasher=None,
+    journal=None,
+    retrier=None,
+    throttle=None,
+    **kwargs,
+):
+    """
+    Upload a local file as concurrent parts.
+
+    Files that fit in a single part are sent with one `upload_bytes` request.
+    Buffers are sized to fit `max_buffer_bytes` and reserved in `memory_budget`
+    like segmented downloads, unless the provider part limit needs bigger parts.
+    An OrderedHasher passed as `hasher` is fed every part once it is read,
+    along with its part number for the multipart ETag.
+    With a TransferJournal the upload it recorded is resumed, only uploading
+    the missing parts, and the journal is removed once the upload completed.
+    Every request goes through `retrier` and waits for its bytes of
+    `throttle` when given.
+    `client` is a CloudStorage backend; `kwargs` are forwarded to it.
+    """
+    parallelism, part_size = fit_buffer(parallelism, part_size, max_buffer_bytes)
+    size = os.path.getsize(local_blob_path)
+    if size <= part_size:
+        with reserve(memory_budget, size), open(local_blob_path, "rb") as f:
+            data = f.read()
+            if hasher is not None:
+                hasher.update(data)
+            throttle_bytes(throttle, len(data))
+            retry_call(retrier, client.upload_bytes, bucket_name, data, remote_blob_path, **kwargs)
+        return
+
+    resumed_parts = 0
+    if journal is not None and journal.upload_id is not None:
+        upload = client.create_multipart_upload(bucket_name, remote_blob_path, upload_id=journal.upload_id, **kwargs)
+        resumed_parts = len(journal.parts)
+    else:
+        upload = retry_call(
+            retrier, client.create_multipart_upload, bucket_name, remote_blob_path, idempotent=False, **kwargs
+        )
+        if journal is not None:
+            journal.start_upload(upload.upload_id)
+    part_size = fit_part_size(size, part_size, upload.max_parts)
+
+    def read_part(part_number, start, end):
+        data = _read_range(local_blob_path, start, end)
+        if hasher is not None:
+            hasher.update_at(start, data)
+            hasher.add_part(part_number, data)
+        return data
+
+    def missing_parts():
+        for part_number, (start, end) in enumerate(split_ranges(size, part_size), start=1):
+            if journal is not None and part_number in journal.parts:
+                if hasher is not None:
+                    hasher.update_range(start, end)
+                    hasher.add_part_range(part_number, start, end)
+                continue
+            yield part_number, lambda part_number=part_number, start=start, end=end: read_part(part_number, start, end)
+
+    try:
+        _upload_parts(
+            upload,
+            missing_parts(),
+            parallelism,
+            memory_budget=memory_budget,
+            part_size=part_size,
+            journal=journal,
+            retrier=retrier,
+            throttle=throttle,
+        )
+    except BaseException:
+        if resumed_parts and len(journal.parts) == resumed_parts:
+            # not a single part went through, the recorded upload is most
+            # likely gone, start a new one next time
+            journal.remove()
+        raise
+    if journal is not None:
+        journal.remove()
+
+
+def _iter_parts(chunks, part_size):
+    # the buffer never grows past part_size, whatever the size of the chunks
+    buffer = bytearray()
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view:
+            n = part_size - len(buffer)
+            buffer += view[:n]
+            view = view[n:]
+            if len(buffer) == part_size:
+                yield bytes(buffer)
+                buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def multipart_upload_chunks(
+    client,
+    bucket_name,
+    chunks,
+    remote_blob_path,
+    parallelism=DEFAULT_PARALLELISM,
+    part_size=DEFAULT_PART_SIZE,
+    max_buffer_bytes=None,
+    memory_budget=None,
+    retrier=None,
+    throttle=None,
+    part_hasher=None,
+    **kwargs,
+):
+    """
+    Upload an iterable of byte chunks of unknown total size as concurrent parts.
+
+    Memory use is bounded by `parallelism` parts of `part_size` bytes being
+    sent and one more being assembled from the chunks, both lowered to fit
+    `max_buffer_bytes`, and parts are reserved in `memory_budget`. A stream that ends within the first part is sent with
+    one `upload_bytes` request. Every request goes through `retrier` and
+    waits for its bytes of `throttle` when given, the chunks themselves are
+    never read twice. The chunks are hashed by the caller, an OrderedHasher
+    passed as `part_hasher` only records the md5 of every part.
+    """
+    if max_buffer_bytes is not None:
+        parallelism, part_size = fit_buffer(parallelism + 1, part_size, max_buffer_bytes)
+        if parallelism == 1:
+            part_size = max(1, max_buffer_bytes // 2)
+        parallelism = max(1, parallelism - 1)
+    parts = _iter_parts(chunks, part_size)
+    first_part = next(parts, b"")
+    second_part = next(parts, None)
+    if second_part is None:
+        throttle_bytes(throttle, len(first_part))
+        retry_call(retrier, client.upload_bytes, bucket_name, first_part, remote_blob_path, **kwargs)
+        return
+
+    upload = retry_call(
+        retrier, client.create_multipart_upload, bucket_name, remote_blob_path, idempotent=False, **kwargs
+    )
+
+    def numbered_parts():
+        for part_number, data in enumerate(itertools.chain([first_part, second_part], parts), start=1):
+            if part_number > upload.max_parts:
+                raise ValueError(
+                    f"Upload of {remote_blob_path} needs more than {upload.max_parts} parts, increase part_size"
+                )
+            if part_hasher is not None:
+                part_hasher.add_part(part_number, data)
+            yield part_number, data
+
+    _upload_parts(
+        upload,
+        numbered_parts(),
+        parallelism,
+        memory_budget=memory_budget,
+        part_size=part_size,
+        retrier=retrier,
+        throttle=throttle,
+    )
+
+
+def _copy_parts(upload, size, part_size, parallelism, copy_part, retrier=None):
+    """
+    `copy_part(part_number, (start, end))` copies one part, every part copy
+    is retried alone through `retrier`
+    """
+    part_size = fit_part_size(size, part_size, upload.max_parts)
+    parts_data = enumerate(split_ranges(size, part_size), start=1)
+    _upload_parts(upload, parts_data, parallelism, send_part=copy_part, retrier=retrier)
+
+
+def multipart_copy(
+    client,
+    source_bucket_name,
+    source_blob_path,
+    size,
+    dest_bucket_name,
+    dest_blob_path,
+    parallelism=DEFAULT_PARALLELISM,
+    part_size=DEFAULT_COPY_PART_SIZE,
+    retrier=None,
+    **kwargs,
+):
+    """
+    Copy a blob server-side as concurrent part copies, for objects above the
+    single request copy limit of the provider.
+    Every request goes through `retrier` when given, a throttled part copy
+    is retried alone.
+    """
+    upload = retry_call(
+        retrier, client.create_multipart_upload, dest_bucket_name, dest_blob_path, idempotent=False, **kwargs
+    )
+
+    def copy_part(part_number, byte_range):
+        return upload.copy_part(part_number, source_bucket_name, source_blob_path, *byte_range)
+
+    _copy_parts(upload, size, part_size, parallelism, copy_part, retrier)
+
+
+def multipart_copy_from_url(
+    client,
+    source_url,
+    size,
+    dest_bucket_name,
+    dest_blob_path,
+    parallelism=DEFAULT_PARALLELISM,
+    part_size=DEFAULT_COPY_PART_SIZE,
+    retrier=None,
+    **kwargs,
+):
+    """
+    Have the destination provider fetch `size` bytes of `source_url` as
+    concurrent part copies, every request going through `retrier` when given.
+    """
+    upload = retry_call(
+        retrier, client.create_multipart_upload, dest_bucket_name, dest_blob_path, idempotent=False, **kwargs
+    )
+
+    def copy_part_from_url(part_number, byte_range):
+        return upload.copy_part_from_url(part_number, source_url, *byte_range)
+
+    _copy_parts(upload, size, part_size, parallelism, copy_part_from_url, retrier)
@@ -0,0 +1,139 @@
+import time
+import itertools
+import threading
+import contextlib
+import collections
+from cloud_storage_slim.metrics import TransferObserver
+
+# finished spans kept by a Profiler for summary and inspection
+DEFAULT_MAX_SPANS = 10000
+
+
+class Span:
+    """
+    One timed phase: `start` is the wall clock time it began, `duration`
+    its length in seconds and `error` the exception it raised, if any.
+    """
+
+    def __init__(self, name, span_id, parent_id, attributes):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def add_bytes(self, nbytes):
+        self.attributes["bytes"] = self.attributes.get("bytes", 0) + nbytes
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread": self.thread,
+            "start": self.start,
+            "duration": self.duration,
+            "error": type(self.error).__name__ if self.error is not None else None,
+            "attributes": dict(self.attributes),
+        }
+
+
+class Profiler(TransferObserver):
+    """
+    Opt-in recorder of nested spans for the phases of copyto and ls (client
+    creation, listing, download, upload, ...) and for every backend request
+    attempt, named "<scheme>.<operation>" like "s3.get".
+
+    Spans nest within a thread; requests made by the part workers and the
+    streaming producer of a transfer are roots of their own thread, tagged
+    with their scheme and bucket. Transferred bytes are added to the open
+    spans of the thread that moved them.
+
+    Every finished span is passed as a dict to each of `sinks`, callables
+    that must return quickly, and kept for `summary`. With
+    `opentelemetry=True` spans are also started on the "cloud_storage_slim"
+    tracer of opentelemetry-api, which must be installed.
+    """
+
+    def __init__(self, sinks=(), opentelemetry=False, max_spans=DEFAULT_MAX_SPANS):
+        self.sinks = list(sinks)
+        self.spans = collections.deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tracer = None
+        if opentelemetry:
+            from opentelemetry import trace
+
+            self._tracer = trace.get_tracer("cloud_storage_slim")
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        stack = self._stack()
+        span = Span(name, next(self._ids), stack[-1].span_id if stack else None, attributes)
+        stack.append(span)
+        started = time.monotonic()
+        tracing = self._tracer.start_as_current_span(name) if self._tracer else contextlib.nullcontext()
+        try:
+            with tracing as otel_span:
+                try:
+                    yield span
+                finally:
+                    if otel_span is not None:
+                        # OpenTelemetry drops None attributes with a warning
+                        otel_span.set_attributes({k: v for k, v in span.attributes.items() if v is not None})
+        except Exception as e:
+            span.error = e
+            raise
+        finally:
+            span.duration = time.monotonic() - started
+            stack.pop()
+            self._emit(span)
+
+    def _emit(self, span):
+        with self._lock:
+            self.spans.append(span)
+        if self.sinks:
+            event = span.to_dict()
+            for sink in self.sinks:
+                sink(event)
+
+    def on_bytes(self, scheme, bucket_name, direction, nbytes):
+        for span in self._stack():
+            span.add_bytes(nbytes)
+
+    def summary(self):
+        """
+        count, total seconds, bytes and errors of the kept spans by name,
+        the slowest first
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total = totals.get(span.name)
+            if total is None:
+                total = totals[span.name] = {"name": span.name, "count": 0, "seconds": 0.0, "bytes": 0, "errors": 0}
+            total["count"] += 1
+            total["seconds"] += span.duration
+            total["bytes"] += span.attributes.get("bytes", 0)
+            total["errors"] += span.error is not None
+        return sorted(totals.values(), key=lambda total: total["seconds"], reverse=True)
+
+
+def profile(profiler, name, **attributes):
+    """
+    a span of profiler, a no-op context without one
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(name, **attributes)
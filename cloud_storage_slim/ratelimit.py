@@ -0,0 +1,177 @@
+import os
+import copy
+import time
+import threading
+
+# key of the limits applying to every scheme and bucket
+ALL_KEY = "*"
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, up to `burst` (one second's worth by default)
+    saved while idle.
+
+    A caller takes its tokens at once, letting the balance go negative, and
+    sleeps until the debt is paid back, so every chunk costs one lock round
+    and callers are served in the order they arrived.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n):
+        """
+        take n tokens, returns the seconds to wait before using them
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def consume(self, n):
+        delay = self.reserve(n)
+        if delay:
+            time.sleep(delay)
+
+
+class Throttle:
+    """
+    The bandwidth and request rate TokenBuckets that apply to one bucket,
+    e.g. the global, scheme and bucket limits. A wait lasts as long as the
+    most constrained of them needs.
+
+    Transferred bytes are also reported to `observers`, metrics.TransferObserver
+    instances, tagged with the scheme, bucket and the direction of the view
+    returned by `directed`.
+    """
+
+    def __init__(self, byte_buckets, request_buckets, observers=(), scheme=None, bucket_name=None):
+        self.byte_buckets = byte_buckets
+        self.request_buckets = request_buckets
+        self.observers = observers
+        self.scheme = scheme
+        self.bucket_name = bucket_name
+        self.direction = None
+
+    def directed(self, direction):
+        """
+        a view sharing the token buckets whose bytes are reported as
+        direction, "read" or "write"
+        """
+        view = copy.copy(self)
+        view.direction = direction
+        return view
+
+    @staticmethod
+    def _reserve(token_buckets, n):
+        return max((token_bucket.reserve(n) for token_bucket in token_buckets), default=0)
+
+    def request_delay(self):
+        """
+        take the tokens of one request, returns the seconds to wait before
+        sending it, for callers that cannot block like asyncio tasks
+        """
+        return self._reserve(self.request_buckets, 1)
+
+    def transfer_delay(self, nbytes):
+        """
+        take the tokens of nbytes and report them, returns the seconds to
+        wait before moving them
+        """
+        delay = self._reserve(self.byte_buckets, nbytes)
+        for observer in self.observers:
+            observer.on_bytes(self.scheme, self.bucket_name, self.direction, nbytes)
+        return delay
+
+    def request(self):
+        delay = self.request_delay()
+        if delay:
+            time.sleep(delay)
+
+    def transfer(self, nbytes):
+        delay = self.transfer_delay(nbytes)
+        if delay:
+            time.sleep(delay)
+
+
+def _normalize_key(key):
+    # gs:// and gcs:// address the same buckets
+    if key == "gcs" or key.startswith("gcs://"):
+        return "gs" + key[3:]
+    return key
+
+
+class RateLimits:
+    """
+    Bandwidth (bytes/sec) and request rate (requests/sec) limits by key:
+    "*" for all traffic, a scheme ("s3") or a bucket ("s3://bucket"); HTTP
+    sources are keyed by host ("https://example.com"). Traffic to a bucket
+    is held to every limit that matches it, each limit is shared by all
+    threads and transfers it covers.
+    """
+
+    def __init__(self, bandwidth_limits=None, request_rate_limits=None):
+        self._byte_buckets = {_normalize_key(k): TokenBucket(v) for k, v in (bandwidth_limits or {}).items()}
+        self._request_buckets = {_normalize_key(k): TokenBucket(v) for k, v in (request_rate_limits or {}).items()}
+
+    def throttle(self, scheme, bucket_name, observers=()):
+        """
+        the Throttle of a bucket, None when no limit applies to it and
+        there are no observers
+        """
+        keys = [ALL_KEY]
+        if scheme is not None:
+            keys += [_normalize_key(scheme), _normalize_key(f"{scheme}://{bucket_name}")]
+        byte_buckets = [self._byte_buckets[key] for key in keys if key in self._byte_buckets]
+        request_buckets = [self._request_buckets[key] for key in keys if key in self._request_buckets]
+        if not byte_buckets and not request_buckets and not observers:
+            return None
+        return Throttle(byte_buckets, request_buckets, observers, scheme, bucket_name)
+
+
+def throttle_bytes(throttle, nbytes):
+    """
+    wait until nbytes may be transferred, a no-op without a throttle
+    """
+    if throttle is not None:
+        throttle.transfer(nbytes)
+
+
+def throttled_chunks(chunks, throttle):
+    """
+    pass chunks through, each after waiting for its bytes
+    """
+    for chunk in chunks:
+        throttle_bytes(throttle, len(chunk))
+        yield chunk
+
+
+class ThrottledReader:
+    """
+    A binary file whose reads wait for `throttle`, sent as a request body
+    it keeps its Content-Length.
+    """
+
+    def __init__(self, f, throttle):
+        self.f = f
+        self.throttle = throttle
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        throttle_bytes(self.throttle, len(data))
+        return data
+
+    def __len__(self):
+        return os.fstat(self.f.fileno()).st_size - self.f.tell()
+
+    def __iter__(self):
+        return iter(lambda: self.read(1024 * 1024), b"")
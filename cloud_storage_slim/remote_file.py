@@ -0,0 +1,228 @@
+import io
+import queue
+import threading
+import collections
+from cloud_storage_slim.streaming import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_BUFFERED_CHUNKS
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_MAX_READ_AHEAD = 16 * 1024 * 1024
+DEFAULT_CACHE_BLOCKS = 32
+
+_END_OF_STREAM = object()
+_ABORT = object()
+
+
+class RemoteFileReader(io.RawIOBase):
+    """
+    Seekable read-only file over ranged reads of a remote blob.
+
+    Bytes are fetched in blocks of `block_size` and the last `cache_blocks`
+    blocks are kept, so random reads close to each other cost one request.
+    While reads stay sequential every fetch doubles the number of blocks read
+    ahead, up to `max_read_ahead` bytes; a seek elsewhere starts over at one
+    block. `read_range(start, end)` returns bytes [start, end) of the blob.
+    """
+
+    def __init__(
+        self,
+        read_range,
+        size,
+        block_size=DEFAULT_BLOCK_SIZE,
+        max_read_ahead=DEFAULT_MAX_READ_AHEAD,
+        cache_blocks=DEFAULT_CACHE_BLOCKS,
+    ):
+        if block_size <= 0:
+            raise ValueError(f"block_size must be positive, got {block_size}")
+        self._read_range = read_range
+        self.size = size
+        self.block_size = block_size
+        self.cache_blocks = max(1, cache_blocks)
+        self.max_read_ahead_blocks = max(1, min(max_read_ahead // block_size, self.cache_blocks))
+        self._blocks = collections.OrderedDict()
+        self._position = 0
+        self._next_index = 0
+        self._read_ahead_blocks = 1
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def _fetch(self, index):
+        if index != self._next_index:
+            # random access, do not read ahead of a seek
+            self._read_ahead_blocks = 1
+        last_index = -(self.size // -self.block_size)  # Ceiling division
+        count = min(self._read_ahead_blocks, last_index - index)
+        start = index * self.block_size
+        end = min((index + count) * self.block_size, self.size)
+        data = self._read_range(start, end)
+        if len(data) != end - start:
+            raise IOError(f"Short read on range [{start}, {end}): got {len(data)} bytes")
+
+        # blocks are views of one response buffer, no copies
+        view = memoryview(data)
+        for i in range(count):
+            self._blocks[index + i] = view[i * self.block_size:(i + 1) * self.block_size]
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        self._next_index = index + count
+        self._read_ahead_blocks = min(self._read_ahead_blocks * 2, self.max_read_ahead_blocks)
+        return self._blocks[index]
+
+    def _get_block(self, index):
+        block = self._blocks.get(index)
+        if block is None:
+            return self._fetch(index)
+        self._blocks.move_to_end(index)
+        return block
+
+    def readinto(self, b):
+        target = memoryview(b).cast("B")
+        written = 0
+        while written < len(target) and self._position < self.size:
+            index, offset = divmod(self._position, self.block_size)
+            block = self._get_block(index)
+            n = min(len(target) - written, len(block) - offset)
+            target[written:written + n] = block[offset:offset + n]
+            written += n
+            self._position += n
+        return written
+
+    def close(self):
+        self._blocks.clear()
+        super().close()
+
+
+class RemoteFileWriter(io.RawIOBase):
+    """
+    Write-only file streaming into a remote blob.
+
+    Writes are cut into chunks of `chunk_size` bytes and handed to
+    `write_chunks(chunks)`, which runs on a background thread for the whole
+    life of the file, so parts are uploaded while the caller keeps writing.
+    At most `max_buffered_chunks` chunks wait for the upload; writes block
+    once they are full. The blob is only committed by `close()`, leaving a
+    `with` block with an exception aborts the upload instead.
+    """
+
+    def __init__(
+        self,
+        write_chunks,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_buffered_chunks=DEFAULT_MAX_BUFFERED_CHUNKS,
+    ):
+        self._write_chunks = write_chunks
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._position = 0
+        self._queue = queue.Queue(maxsize=max(1, max_buffered_chunks))
+        self._done = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+
+    def _chunks(self):
+        while True:
+            item = self._queue.get()
+            if item is _END_OF_STREAM:
+                return
+            if item is _ABORT:
+                raise IOError("Write aborted")
+            yield item
+
+    def _consume(self):
+        try:
+            self._write_chunks(self._chunks())
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+        raise IOError("Upload stopped before the end of the stream")
+
+    def _put(self, item):
+        while not self._done.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError("write to closed file")
+        if self._done.is_set():
+            self._raise_error()
+        data = memoryview(b).cast("B")
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.chunk_size:
+            if not self._put(bytes(self._buffer[:self.chunk_size])):
+                self._raise_error()
+            del self._buffer[:self.chunk_size]
+        return len(data)
+
+    def close(self):
+        """
+        upload what is left and wait until the blob is committed
+        """
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._put(bytes(self._buffer))
+                self._buffer.clear()
+            self._put(_END_OF_STREAM)
+            self._thread.join()
+            if self._error is not None:
+                raise self._error
+        finally:
+            super().close()
+
+    def abort(self):
+        """
+        stop the upload without committing the blob
+        """
+        if self.closed:
+            return
+        try:
+            self._put(_ABORT)
+            self._thread.join()
+        finally:
+            self._buffer.clear()
+            super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
@@ -0,0 +1,318 @@
+import time
+import random
+import asyncio
+import threading
+from cloud_storage_slim.metrics import operation_name
+from cloud_storage_slim.profiler import profile
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 0.2
+DEFAULT_MAX_DELAY = 20.0
+# seconds between two tries of a coroutine waiting for an AdaptiveLimiter slot
+ASYNC_LIMITER_POLL_INTERVAL = 0.01
+
+# outcomes of a failed request, see classify_error
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+
+# a throttled request was rejected before it was executed, retrying it is
+# safe for every operation
+THROTTLING_STATUS = {429, 503}
+THROTTLING_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "TooManyRequests",
+    "ServerBusy",
+    "QpsLimitExceeded",
+}
+# a transient failure may or may not have been executed, only idempotent
+# operations are retried
+TRANSIENT_STATUS = {408, 500, 502, 504}
+TRANSIENT_CODES = {"InternalError", "RequestTimeout", "OperationTimedOut"}
+# network errors of the standard library and the SDKs, matched by class name
+# so no SDK has to be imported
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError",
+    "TimeoutError",
+    "Timeout",
+    "EndpointConnectionError",
+    "ConnectionClosedError",
+    "ReadTimeoutError",
+    "ConnectTimeoutError",
+    "ChunkedEncodingError",
+    "ProtocolError",
+    "IncompleteRead",
+    "ServiceRequestError",
+    "ServiceResponseError",
+    "TransportError",
+    "RequestError",
+    "ClientConnectionError",
+    "ClientPayloadError",
+}
+
+
+def _error_status(error):
+    """
+    (HTTP status, provider error code) of an SDK exception, either may be None
+    """
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        return response.get("ResponseMetadata", {}).get("HTTPStatusCode"), response.get("Error", {}).get("Code")
+
+    status = None
+    code = getattr(error, "error_code", None)
+    for name in ("status_code", "status", "code"):
+        value = getattr(error, name, None)
+        if isinstance(value, int) and status is None:
+            status = value
+        elif isinstance(value, str) and code is None:
+            code = value
+    if status is None and response is not None:
+        # requests HTTPError
+        status = getattr(response, "status_code", None)
+    return status, code
+
+
+def classify_error(error):
+    """
+    THROTTLED, TRANSIENT or None when retrying cannot help
+    """
+    status, code = _error_status(error)
+    if status in THROTTLING_STATUS or code in THROTTLING_CODES:
+        return THROTTLED
+    if status in TRANSIENT_STATUS or code in TRANSIENT_CODES:
+        return TRANSIENT
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return TRANSIENT
+    return None
+
+
+class RetryPolicy:
+    """
+    How often and how long to wait before retrying a failed request.
+
+    Throttled requests are retried for every operation; transient failures
+    (timeouts, resets, 5xx) only for idempotent ones, since the first attempt
+    may have taken effect. The wait before retry n is drawn uniformly from
+    [0, min(max_delay, base_delay * 2 ** n)] so clients throttled together
+    do not come back together.
+    """
+
+    def __init__(
+        self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY
+    ):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, kind, idempotent, attempt):
+        if attempt + 1 >= self.max_attempts:
+            return False
+        return kind == THROTTLED or (kind == TRANSIENT and idempotent)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on the concurrent requests to one bucket.
+
+    Every successful request raises the limit by 1 / limit, about one more
+    request per round of `limit` requests; a throttled one halves it, down
+    to `min_limit`. Requests started before the last decrease do not
+    decrease it again, so one burst of throttling halves the limit once.
+    """
+
+    def __init__(self, max_limit, min_limit=1, decrease_factor=0.5):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Invalid limits: min_limit={min_limit}, max_limit={max_limit}")
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        # bumped by every decrease
+        self.epoch = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        block until a request may start, returns the epoch to pass to on_throttle
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return self.epoch
+
+    def try_acquire(self):
+        """
+        acquire without blocking, None when no request may start yet
+        """
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+            return self.epoch
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self._condition.notify_all()
+
+    def on_throttle(self, epoch):
+        with self._condition:
+            if epoch == self.epoch:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self.epoch += 1
+
+
+class Retrier:
+    """
+    Call operations against one bucket under a RetryPolicy, each attempt
+    holding a slot of an optional AdaptiveLimiter and counting as one
+    request of an optional ratelimit.Throttle. Every attempt and retry is
+    reported to `observers`, metrics.TransferObserver instances, tagged with
+    `scheme` and `bucket_name`, and recorded as a span of an optional
+    profiler.Profiler with the seconds it waited for the throttle and limiter.
+    """
+
+    def __init__(
+        self, policy=None, limiter=None, throttle=None, observers=(), scheme=None, bucket_name=None, profiler=None
+    ):
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+        self.throttle = throttle
+        self.observers = observers
+        self.scheme = scheme
+        self.bucket_name = bucket_name
+        self.profiler = profiler
+
+    def __call__(self, func, *args, idempotent=True, **kwargs):
+        operation = operation_name(func) if self.observers or self.profiler else None
+        attempt = 0
+        while True:
+            waited_since = time.monotonic()
+            if self.throttle is not None:
+                self.throttle.request()
+            epoch = self.limiter.acquire() if self.limiter is not None else None
+            started = time.monotonic()
+            try:
+                with profile(
+                    self.profiler,
+                    f"{self.scheme}.{operation}",
+                    bucket=self.bucket_name,
+                    attempt=attempt,
+                    waited=started - waited_since,
+                ):
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                if self.limiter is not None:
+                    self.limiter.release()
+                self._observe_request(operation, started, e)
+                if not self.backoff(e, attempt, idempotent, epoch, operation):
+                    raise
+                attempt += 1
+                continue
+            if self.limiter is not None:
+                self.limiter.release()
+                self.limiter.on_success()
+            self._observe_request(operation, started)
+            return result
+
+    async def call_async(self, func, *args, idempotent=True, **kwargs):
+        """
+        await the coroutine function func the way __call__ calls func,
+        waiting for the throttle, the limiter and the backoff without
+        blocking the event loop. Attempts are not profiled: spans nest by
+        thread and every task of the loop runs on the same one.
+        """
+        operation = operation_name(func) if self.observers else None
+        attempt = 0
+        while True:
+            if self.throttle is not None:
+                await asyncio.sleep(self.throttle.request_delay())
+            epoch = None
+            if self.limiter is not None:
+                epoch = self.limiter.try_acquire()
+                while epoch is None:
+                    await asyncio.sleep(ASYNC_LIMITER_POLL_INTERVAL)
+                    epoch = self.limiter.try_acquire()
+            started = time.monotonic()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if self.limiter is not None:
+                    self.limiter.release()
+                self._observe_request(operation, started, e)
+                if not await self.backoff_async(e, attempt, idempotent, epoch, operation):
+                    raise
+                attempt += 1
+                continue
+            if self.limiter is not None:
+                self.limiter.release()
+                self.limiter.on_success()
+            self._observe_request(operation, started)
+            return result
+
+    def _observe_request(self, operation, started, error=None):
+        if self.observers:
+            seconds = time.monotonic() - started
+            for observer in self.observers:
+                observer.on_request(self.scheme, self.bucket_name, operation, seconds, error)
+
+    def backoff(self, error, attempt, idempotent=True, epoch=None, operation=None):
+        """
+        sleep before retrying after error and return True, or return False
+        when it must be raised
+        """
+        delay = self._retry_delay(error, attempt, idempotent, epoch, operation)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
+    async def backoff_async(self, error, attempt, idempotent=True, epoch=None, operation=None):
+        """
+        backoff without blocking the event loop
+        """
+        delay = self._retry_delay(error, attempt, idempotent, epoch, operation)
+        if delay is None:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    def _retry_delay(self, error, attempt, idempotent=True, epoch=None, operation=None):
+        """
+        the seconds to wait before retrying after error, None when it must
+        be raised
+        """
+        kind = classify_error(error)
+        if kind == THROTTLED and self.limiter is not None:
+            self.limiter.on_throttle(self.limiter.epoch if epoch is None else epoch)
+        if not self.policy.should_retry(kind, idempotent, attempt):
+            return None
+        for observer in self.observers:
+            observer.on_retry(self.scheme, self.bucket_name, operation, error)
+        return self.policy.backoff(attempt)
+
+
+def retry_call(retrier, func, *args, idempotent=True, **kwargs):
+    """
+    call func through retrier, a plain call without one
+    """
+    if retrier is None:
+        return func(*args, **kwargs)
+    return retrier(func, *args, idempotent=idempotent, **kwargs)
@@ -0,0 +1,283 @@
+import threading
+from urllib.parse import urlparse
+from cloud_storage_slim import CloudStorage, DEFAULT_SIGNED_URL_EXPIRATION
+from cloud_storage_slim.retry import Retrier, AdaptiveLimiter
+from cloud_storage_slim.ratelimit import RateLimits, throttle_bytes
+from cloud_storage_slim.listing import entry_key
+
+
+class Retriers:
+    """
+    The Retrier and the "read" and "write" Throttle views of every
+    (scheme, bucket) pair, created on first use and shared by every client
+    of a CloudStorageSlim, the blocking backends and the asyncio ones alike,
+    so they count against the same AdaptiveLimiter and rate limits.
+    """
+
+    def __init__(self, policy, max_concurrency, rate_limits=None, observers=(), profiler=None):
+        self.policy = policy
+        self.max_concurrency = max_concurrency
+        self.rate_limits = rate_limits or RateLimits()
+        self.observers = observers
+        self.profiler = profiler
+        self._retriers = {}
+        self._throttles = {}
+        self._lock = threading.Lock()
+
+    def retrier(self, scheme, bucket_name):
+        """
+        the Retrier of every request to bucket_name, or to the host of a URI
+        """
+        key = (scheme, bucket_name)
+        with self._lock:
+            if key not in self._retriers:
+                throttle = self.rate_limits.throttle(*key, self.observers)
+                self._retriers[key] = Retrier(
+                    self.policy, AdaptiveLimiter(self.max_concurrency), throttle, self.observers, *key, self.profiler
+                )
+                for direction in ("read", "write"):
+                    self._throttles[key + (direction,)] = throttle.directed(direction) if throttle else None
+            return self._retriers[key]
+
+    def throttle(self, scheme, bucket_name, direction):
+        """
+        the Throttle view transfers of direction ("read" or "write") wait on,
+        None without limits nor observers
+        """
+        self.retrier(scheme, bucket_name)
+        return self._throttles[(scheme, bucket_name, direction)]
+
+
+class RetryingStorage(CloudStorage):
+    """
+    Wraps a CloudStorage backend, retrying its requests under a RetryPolicy
+    and limiting the concurrent requests to each bucket with an
+    AdaptiveLimiter that starts at `max_concurrency`.
+
+    Single requests are retried as a whole. Downloads, uploads, streamed
+    writes and server-side copies get a `retrier` the backends and part
+    engines call every request through, so a throttled part is retried
+    alone and the others keep going; the stream itself is never replayed.
+    Listings resume after the last key they returned. Other attributes are
+    those of the wrapped backend.
+
+    With `rate_limits`, a ratelimit.RateLimits, every attempt counts as a
+    request of the bucket's Throttle and transfers get it as `throttle` to
+    wait for their bytes chunk by chunk. Requests, retries and bytes are
+    reported to `observers` the same way, and request attempts are spans of
+    an optional profiler.Profiler. Clients passed the same `retriers`
+    share their Retrier per bucket.
+    """
+
+    def __init__(
+        self,
+        storage,
+        policy,
+        max_concurrency,
+        scheme=None,
+        rate_limits=None,
+        observers=(),
+        profiler=None,
+        retriers=None,
+    ):
+        self.storage = storage
+        self.scheme = scheme
+        self.retriers = retriers or Retriers(policy, max_concurrency, rate_limits, observers, profiler)
+
+    def __getattr__(self, name):
+        if name == "storage":
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    def retrier(self, bucket_name, scheme=None):
+        """
+        the Retrier shared by every request to bucket_name, or to the host
+        of a URI
+        """
+        return self.retriers.retrier(scheme or self.scheme, bucket_name)
+
+    def _uri_retrier(self, remote_blob_uri):
+        parsed = urlparse(remote_blob_uri)
+        return self.retrier(parsed.netloc, parsed.scheme)
+
+    def _throttle(self, retrier, direction):
+        return self.retriers.throttle(retrier.scheme, retrier.bucket_name, direction)
+
+    def _transfer_options(self, retrier, direction):
+        return {"retrier": retrier, "throttle": self._throttle(retrier, direction)}
+
+    def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
+        transfer_options = self._transfer_options(self.retrier(bucket_name), "read")
+        self.storage.download(bucket_name, remote_blob_path, local_blob_path, **transfer_options, **kwargs)
+
+    def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
+        transfer_options = self._transfer_options(self.retrier(bucket_name), "write")
+        self.storage.upload(bucket_name, local_blob_path, remote_blob_path, **transfer_options, **kwargs)
+
+    def download_uri(self, remote_blob_uri, local_blob_path, **kwargs):
+        retrier = self._uri_retrier(remote_blob_uri)
+        throttle = self._throttle(retrier, "read")
+        retrier(self.storage.download_uri, remote_blob_uri, local_blob_path, throttle=throttle, **kwargs)
+
+    def upload_uri(self, local_blob_path, remote_blob_uri, **kwargs):
+        retrier = self._uri_retrier(remote_blob_uri)
+        throttle = self._throttle(retrier, "write")
+        retrier(self.storage.upload_uri, local_blob_path, remote_blob_uri, throttle=throttle, **kwargs)
+
+    def stat_uri(self, remote_blob_uri):
+        return self._uri_retrier(remote_blob_uri)(self.storage.stat_uri, remote_blob_uri)
+
+    def read_range_uri(self, remote_blob_uri, start, end):
+        retrier = self._uri_retrier(remote_blob_uri)
+        throttle_bytes(self._throttle(retrier, "read"), end - start)
+        return retrier(self.storage.read_range_uri, remote_blob_uri, start, end)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        return self.retrier(bucket_name)(self.storage.stat_blob, bucket_name, remote_blob_path)
+
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        return self.retrier(bucket_name)(self.storage.stat_checksums, bucket_name, remote_blob_path)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        retrier = self.retrier(bucket_name)
+        throttle_bytes(self._throttle(retrier, "read"), end - start)
+        return retrier(self.storage.read_range, bucket_name, remote_blob_path, start, end)
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        retrier = self.retrier(bucket_name)
+        data = retrier(self.storage.download_bytes, bucket_name, remote_blob_path, **kwargs)
+        throttle_bytes(self._throttle(retrier, "read"), len(data))
+        return data
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        retrier = self.retrier(bucket_name)
+        throttle_bytes(self._throttle(retrier, "write"), len(data))
+        # a whole object PUT replaces the object, repeating it is harmless
+        retrier(self.storage.upload_bytes, bucket_name, data, remote_blob_path, **kwargs)
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, **kwargs):
+        return self.retrier(bucket_name)(
+            self.storage.create_multipart_upload, bucket_name, remote_blob_path, idempotent=False, **kwargs
+        )
+
+    def _iter_chunks(self, retrier, open_chunks):
+        """
+        retry until the first chunk arrived, a stream is not replayed after
+        """
+        def get_first_chunk():
+            chunks = open_chunks()
+            return chunks, next(chunks, None)
+
+        chunks, chunk = retrier(get_first_chunk)
+        if chunk is None:
+            return
+        yield chunk
+        yield from chunks
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        retrier = self.retrier(bucket_name)
+        throttle = self._throttle(retrier, "read")
+        return self._iter_chunks(
+            retrier, lambda: iter(self.storage.iter_chunks(bucket_name, remote_blob_path, throttle=throttle, **kwargs))
+        )
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        transfer_options = self._transfer_options(self.retrier(bucket_name), "write")
+        self.storage.write_chunks(bucket_name, chunks, remote_blob_path, **transfer_options, **kwargs)
+
+    def iter_chunks_uri(self, remote_blob_uri, **kwargs):
+        retrier = self._uri_retrier(remote_blob_uri)
+        throttle = self._throttle(retrier, "read")
+        return self._iter_chunks(
+            retrier, lambda: iter(self.storage.iter_chunks_uri(remote_blob_uri, throttle=throttle, **kwargs))
+        )
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, **kwargs):
+        retrier = self._uri_retrier(remote_blob_uri)
+        throttle = self._throttle(retrier, "write")
+        if throttle is not None:
+            throttle.request()
+        self.storage.write_chunks_uri(chunks, remote_blob_uri, throttle=throttle, **kwargs)
+
+    def list_blobs(self, bucket_name, pattern):
+        return self.retrier(bucket_name)(self.storage.list_blobs, bucket_name, pattern)
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        retrier = self.retrier(bucket_name)
+        attempt = 0
+        blob_infos = None
+        while True:
+            try:
+                if blob_infos is None:
+                    blob_infos = iter(self.storage.iter_blobs(bucket_name, pattern, start_after))
+                blob_info = next(blob_infos, None)
+            except Exception as e:
+                if not retrier.backoff(e, attempt, operation="list"):
+                    raise
+                attempt += 1
+                # list again after the last key returned
+                blob_infos = None
+                continue
+            if blob_info is None:
+                return
+            yield blob_info
+            start_after = blob_info.key
+            attempt = 0
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        retrier = self.retrier(bucket_name)
+        attempt = 0
+        entries = None
+        last_key = None
+        while True:
+            try:
+                if entries is None:
+                    entries = iter(self.storage.list_prefixes(bucket_name, pattern, delimiter))
+                entry = next(entries, None)
+            except Exception as e:
+                if not retrier.backoff(e, attempt, operation="list"):
+                    raise
+                attempt += 1
+                # a delimiter listing cannot start after a key, list again
+                # and skip what was already returned
+                entries = None
+                continue
+            if entry is None:
+                return
+            if last_key is not None and entry_key(entry) <= last_key:
+                continue
+            yield entry
+            last_key = entry_key(entry)
+            attempt = 0
+
+    def get_first_blob(self, bucket_name, pattern):
+        return self.retrier(bucket_name)(self.storage.get_first_blob, bucket_name, pattern)
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        self.retrier(bucket_name)(self.storage.delete_blob, bucket_name, remote_blob_path)
+
+    def get_native_client(self):
+        return self.storage.get_native_client()
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        # the backend retries each request, a multipart copy retries a
+        # throttled part alone instead of starting over
+        self.storage.copy_blob(
+            source_bucket_name,
+            source_blob_path,
+            dest_bucket_name,
+            dest_blob_path,
+            retrier=self.retrier(dest_bucket_name),
+            **kwargs,
+        )
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=DEFAULT_SIGNED_URL_EXPIRATION):
+        return self.storage.signed_url(bucket_name, remote_blob_path, expiration)
+
+    def copy_from_url(self, source_url, size, bucket_name, remote_blob_path, **kwargs):
+        self.storage.copy_from_url(
+            source_url, size, bucket_name, remote_blob_path, retrier=self.retrier(bucket_name), **kwargs
+        )
+
+    def list_multipart_uploads(self, bucket_name, pattern):
+        return self.storage.list_multipart_uploads(bucket_name, pattern)
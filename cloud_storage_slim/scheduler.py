@@ -0,0 +1,168 @@
+import bisect
+import threading
+import collections
+import concurrent.futures
+from urllib.parse import urlparse
+from cloud_storage_slim.utils import parse_path_uri
+from cloud_storage_slim.ratelimit import _normalize_key
+
+DEFAULT_TRANSFERS = 16
+DEFAULT_PER_BUCKET_TRANSFERS = 8
+DEFAULT_MAX_PENDING = 1024
+
+# result of one copy of a batch, error is None when it succeeded
+CopyResult = collections.namedtuple("CopyResult", ["source", "dest", "error"])
+
+
+def _is_remote(path):
+    scheme = urlparse(path).scheme
+    return scheme != "" and scheme != "file"
+
+
+class TransferScheduler:
+    """
+    Run many copies under global, per-scheme and per-bucket concurrency limits.
+
+    At most `transfers` copies run at once and at most `per_bucket_transfers`
+    touch the same bucket, gs:// and gcs:// counting as one. `limits`
+    overrides or adds limits by scheme ("s3") or bucket ("s3://bucket").
+    Items are taken from the producer on a thread of their own while fewer
+    than `max_pending` wait, so copies start while a listing is still
+    running. The waiting items start in size order ("small_first",
+    "large_first", or None for input order) as soon as the buckets they
+    touch have a free slot, so one busy bucket does not hold back the others.
+    """
+
+    def __init__(
+        self,
+        transfers=DEFAULT_TRANSFERS,
+        per_bucket_transfers=DEFAULT_PER_BUCKET_TRANSFERS,
+        limits=None,
+        order="small_first",
+        max_pending=DEFAULT_MAX_PENDING,
+    ):
+        if order not in ("small_first", "large_first", None):
+            raise ValueError(f"Unknown order: {order}")
+        self.transfers = transfers
+        self.per_bucket_transfers = per_bucket_transfers
+        self.limits = {_normalize_key(key): limit for key, limit in (limits or {}).items()}
+        self.order = order
+        self.max_pending = max_pending
+
+    def _slot_keys(self, source_path, dest_path):
+        keys = set()
+        for path in (source_path, dest_path):
+            if _is_remote(path):
+                scheme, bucket_name, _ = parse_path_uri(path)
+                keys.add(_normalize_key(scheme))
+                keys.add(_normalize_key(f"{scheme}://{bucket_name}"))
+        return keys
+
+    def _limit(self, key):
+        if key in self.limits:
+            return self.limits[key]
+        return self.per_bucket_transfers if "://" in key else None
+
+    def _order_key(self, index, size):
+        if self.order is None:
+            return (index,)
+        # unknown sizes go last
+        if self.order == "small_first":
+            return (size is None, size or 0, index)
+        return (size is None, -(size or 0), index)
+
+    def run(self, func, items):
+        """
+        call func(source, dest) for every (source, dest, size) item, size may
+        be None; returns a CopyResult per item in input order. An error of the
+        producer is raised once the copies already started have finished.
+        """
+        results = {}
+        # kept sorted by order key
+        pending = []
+        slots_in_use = collections.Counter()
+        in_flight = 0
+        condition = threading.Condition()
+        exhausted = False
+        producer_error = None
+        next_index = 0
+
+        def produce():
+            nonlocal exhausted, producer_error, next_index
+            try:
+                for source_path, dest_path, size in _wait_for_room(items, condition, pending, self.max_pending):
+                    keys = self._slot_keys(source_path, dest_path)
+                    with condition:
+                        order_key = self._order_key(next_index, size)
+                        bisect.insort(pending, (order_key, next_index, source_path, dest_path, keys))
+                        next_index += 1
+                        condition.notify_all()
+            except Exception as e:
+                producer_error = e
+            finally:
+                with condition:
+                    exhausted = True
+                    condition.notify_all()
+
+        def run_one(index, source_path, dest_path, keys):
+            nonlocal in_flight
+            error = None
+            try:
+                func(source_path, dest_path)
+            except Exception as e:
+                error = e
+            finally:
+                with condition:
+                    results[index] = CopyResult(source_path, dest_path, error)
+                    for key in keys:
+                        slots_in_use[key] -= 1
+                    in_flight -= 1
+                    condition.notify_all()
+
+        def has_slots(keys):
+            return all(self._limit(key) is None or slots_in_use[key] < self._limit(key) for key in keys)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.transfers) as executor:
+            while True:
+                with condition:
+                    if producer_error is not None or (exhausted and not pending):
+                        if in_flight == 0:
+                            break
+                        condition.wait()
+                        continue
+                    position = None
+                    if in_flight < self.transfers:
+                        position = next((i for i, item in enumerate(pending) if has_slots(item[4])), None)
+                    if position is None:
+                        condition.wait()
+                        continue
+                    _, index, source_path, dest_path, keys = pending.pop(position)
+                    for key in keys:
+                        slots_in_use[key] += 1
+                    in_flight += 1
+                    # room for the producer
+                    condition.notify_all()
+                executor.submit(run_one, index, source_path, dest_path, keys)
+        producer.join()
+
+        if producer_error is not None:
+            raise producer_error
+        return [results[index] for index in range(next_index)]
+
+
+def _wait_for_room(items, condition, pending, max_pending):
+    """
+    the items, each taken once fewer than max_pending wait; the producer
+    is consumed without holding the lock
+    """
+    items = iter(items)
+    while True:
+        with condition:
+            while len(pending) >= max_pending:
+                condition.wait()
+        item = next(items, None)
+        if item is None:
+            return
+        yield item
@@ -0,0 +1,230 @@
+import os
+import concurrent.futures
+from cloud_storage_slim.memory import fit_buffer, reserve
+from cloud_storage_slim.retry import retry_call
+from cloud_storage_slim.ratelimit import throttle_bytes
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_PARALLELISM = 8
+# vectored reads merge ranges less than a round trip's worth of bytes apart
+DEFAULT_MAX_GAP = 1024 * 1024
+DEFAULT_MAX_COALESCED_SIZE = 64 * 1024 * 1024
+
+
+def split_ranges(size, part_size):
+    """
+    Split `size` bytes into half-open [start, end) ranges of at most `part_size`.
+    """
+    if part_size <= 0:
+        raise ValueError(f"part_size must be positive, got {part_size}")
+    return [(start, min(start + part_size, size)) for start in range(0, size, part_size)]
+
+
+def _download_part(
+    client,
+    bucket_name,
+    remote_blob_path,
+    local_blob_path,
+    start,
+    end,
+    memory_budget=None,
+    hasher=None,
+    journal=None,
+    retrier=None,
+    throttle=None,
+):
+    with reserve(memory_budget, end - start):
+        throttle_bytes(throttle, end - start)
+        data = retry_call(retrier, client.read_range, bucket_name, remote_blob_path, start, end)
+        if len(data) != end - start:
+            raise IOError(
+                f"Short read on range [{start}, {end}) of {remote_blob_path}: got {len(data)} bytes"
+            )
+        with open(local_blob_path, "r+b") as f:
+            f.seek(start)
+            f.write(data)
+        if hasher is not None:
+            hasher.update_at(start, data)
+        if journal is not None:
+            journal.record_range(start, end)
+
+
+def segmented_download(
+    client,
+    bucket_name,
+    remote_blob_path,
+    local_blob_path,
+    parallelism=DEFAULT_PARALLELISM,
+    part_size=DEFAULT_PART_SIZE,
+    max_buffer_bytes=None,
+    memory_budget=None,
+    hasher=None,
+    journal=None,
+    retrier=None,
+    throttle=None,
+):
+    """
+    Download a blob as concurrent ranged reads.
+
+    The local file is preallocated to the blob size and every byte range is
+    written at its own offset, so parts may complete in any order.
+    At most `parallelism` parts of `part_size` bytes are held in memory, both
+    are lowered to fit `max_buffer_bytes` and every part is reserved in the
+    shared `memory_budget` while it is buffered. An OrderedHasher passed as
+    `hasher` is fed every part as it is written. With a TransferJournal the
+    ranges it recorded are kept from the existing local file and only the
+    missing ones are downloaded; the journal is removed once all are written.
+    Every request goes through `retrier`, a retry.Retrier, and every part
+    waits for its bytes of `throttle`, a ratelimit.Throttle, when given.
+    `client` is a CloudStorage backend providing `stat_blob` and `read_range`.
+    """
+    parallelism, part_size = fit_buffer(parallelism, part_size, max_buffer_bytes)
+    size = retry_call(retrier, client.stat_blob, bucket_name, remote_blob_path).size
+    ranges = split_ranges(size, part_size)
+
+    if (
+        journal is not None
+        and journal.ranges
+        and os.path.isfile(local_blob_path)
+        and os.path.getsize(local_blob_path) == size
+    ):
+        for start, end in ranges:
+            if (start, end) in journal.ranges and hasher is not None:
+                hasher.update_range(start, end)
+        ranges = [byte_range for byte_range in ranges if byte_range not in journal.ranges]
+    else:
+        if journal is not None:
+            # the partial file the journal describes is gone
+            journal.remove()
+        with open(local_blob_path, "wb") as f:
+            f.truncate(size)
+
+    _download_ranges(
+        client,
+        bucket_name,
+        remote_blob_path,
+        local_blob_path,
+        ranges,
+        parallelism,
+        memory_budget,
+        hasher,
+        journal,
+        retrier,
+        throttle,
+    )
+    if journal is not None:
+        journal.remove()
+
+
+def _download_ranges(
+    client,
+    bucket_name,
+    remote_blob_path,
+    local_blob_path,
+    ranges,
+    parallelism,
+    memory_budget,
+    hasher,
+    journal,
+    retrier,
+    throttle,
+):
+    part_options = {
+        "memory_budget": memory_budget,
+        "hasher": hasher,
+        "journal": journal,
+        "retrier": retrier,
+        "throttle": throttle,
+    }
+    if parallelism <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            _download_part(client, bucket_name, remote_blob_path, local_blob_path, start, end, **part_options)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = [
+            executor.submit(
+                _download_part,
+                client,
+                bucket_name,
+                remote_blob_path,
+                local_blob_path,
+                start,
+                end,
+                **part_options,
+            )
+            for start, end in ranges
+        ]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def coalesce_ranges(ranges, max_gap=DEFAULT_MAX_GAP, max_coalesced_size=DEFAULT_MAX_COALESCED_SIZE):
+    """
+    Merge (offset, length) ranges whose gap is at most `max_gap` bytes into
+    half-open [start, end) reads of at most `max_coalesced_size` bytes,
+    unless a single range is larger. Returns (start, end, indices) triples,
+    `indices` are the positions in `ranges` each read serves.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    reads = []
+    for i in order:
+        offset, length = ranges[i]
+        if offset < 0 or length < 0:
+            raise ValueError(f"Invalid range: offset {offset}, length {length}")
+        if reads:
+            start, end, indices = reads[-1]
+            if offset - end <= max_gap and max(end, offset + length) - start <= max_coalesced_size:
+                reads[-1] = (start, max(end, offset + length), indices + [i])
+                continue
+        reads.append((offset, offset + length, [i]))
+    return reads
+
+
+def read_ranges(
+    read_range,
+    ranges,
+    max_gap=DEFAULT_MAX_GAP,
+    max_coalesced_size=DEFAULT_MAX_COALESCED_SIZE,
+    parallelism=DEFAULT_PARALLELISM,
+):
+    """
+    Read many (offset, length) ranges of one blob with as few requests as
+    `coalesce_ranges` allows, issued concurrently.
+
+    Returns one memoryview per range in input order; views of ranges served
+    by the same request share its buffer instead of copying it.
+    `read_range(start, end)` returns bytes [start, end) of the blob.
+    """
+    results = [None] * len(ranges)
+
+    def read_one(start, end, indices):
+        data = read_range(start, end) if end > start else b""
+        if len(data) != end - start:
+            raise IOError(f"Short read on range [{start}, {end}): got {len(data)} bytes")
+        view = memoryview(data)
+        for i in indices:
+            offset, length = ranges[i]
+            results[i] = view[offset - start:offset - start + length]
+
+    reads = coalesce_ranges(ranges, max_gap, max_coalesced_size)
+    if parallelism <= 1 or len(reads) <= 1:
+        for read in reads:
+            read_one(*read)
+        return results
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(parallelism, len(reads))) as executor:
+        futures = [executor.submit(read_one, *read) for read in reads]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
@@ -0,0 +1,124 @@
+import io
+import queue
+import threading
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_BUFFERED_CHUNKS = 4
+
+_END_OF_STREAM = object()
+
+
+class ChunkPipe:
+    """
+    Bounded in-memory buffer between a chunk producer and a chunk consumer.
+
+    The producer iterable is drained on a background thread while the consumer
+    iterates over the pipe, so a download can keep running while the upload
+    consumes what has already arrived. At most `max_buffered_chunks` chunks are
+    held in memory; the producer blocks once the buffer is full.
+    """
+
+    def __init__(self, chunks, max_buffered_chunks=DEFAULT_MAX_BUFFERED_CHUNKS):
+        self._chunks = chunks
+        self._queue = queue.Queue(maxsize=max(1, max_buffered_chunks))
+        self._closed = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for chunk in self._chunks:
+                if chunk and not self._put(chunk):
+                    break
+        except BaseException as e:
+            self._error = e
+        finally:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+            self._put(_END_OF_STREAM)
+
+    def __iter__(self):
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END_OF_STREAM:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stop the producer, e.g. when the consumer failed half way.
+        """
+        self._closed.set()
+
+
+class SizedChunks:
+    """
+    Chunks adding up to `size` bytes. Sent as a request body it keeps a
+    Content-Length instead of falling back to chunked transfer encoding,
+    which presigned S3 PUT and Azure SAS Put Blob URLs reject.
+    """
+
+    def __init__(self, chunks, size):
+        self.chunks = chunks
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        sent = 0
+        for chunk in self.chunks:
+            sent += len(chunk)
+            if sent > self.size:
+                raise IOError(f"Chunks exceed the declared size of {self.size} bytes")
+            yield chunk
+        if sent != self.size:
+            raise IOError(f"Chunks ended after {sent} of {self.size} bytes")
+
+
+class ChunkReader(io.RawIOBase):
+    """
+    Read-only file-like view over an iterable of byte chunks.
+
+    `read(n)` only returns fewer than `n` bytes at the end of the stream,
+    which is what SDKs reading fixed-size upload parts from a stream expect.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._view = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        target = memoryview(b).cast("B")
+        written = 0
+        while written < len(target):
+            if not self._view:
+                try:
+                    self._view = memoryview(next(self._chunks)).cast("B")
+                except StopIteration:
+                    break
+                continue
+            n = min(len(target) - written, len(self._view))
+            target[written:written + n] = self._view[:n]
+            self._view = self._view[n:]
+            written += n
+        return written
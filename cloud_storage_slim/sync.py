@@ -0,0 +1,52 @@
+CHECKSUM_FIELDS = ("md5", "crc32c", "crc64ecma")
+
+
+def is_same_blob(source_info, dest_info, same_provider=False):
+    """
+    Sizes must match. The first checksum both sides report decides (md5,
+    then crc32c, then crc64ecma); between buckets of the same provider equal
+    ETags do too. Without anything to compare the blob is copied again,
+    modification times say nothing about the content.
+    """
+    if source_info.size != dest_info.size:
+        return False
+    for field in CHECKSUM_FIELDS:
+        source_checksum = getattr(source_info, field)
+        dest_checksum = getattr(dest_info, field)
+        if source_checksum and dest_checksum:
+            return source_checksum == dest_checksum
+    if same_provider and source_info.etag and dest_info.etag:
+        return source_info.etag == dest_info.etag
+    return False
+
+
+def _with_md5(source_info, dest_info, source_md5, dest_md5):
+    """
+    fill in the md5 of a side listed without one, a local directory, when
+    the other side has one or can compute it too
+    """
+    if source_info.md5 is None and source_md5 is not None and (dest_info.md5 or dest_md5 is not None):
+        source_info = source_info._replace(md5=source_md5(source_info.key))
+    if dest_info.md5 is None and dest_md5 is not None and source_info.md5:
+        dest_info = dest_info._replace(md5=dest_md5(dest_info.key))
+    return source_info, dest_info
+
+
+def diff_blob_infos(source_infos, dest_infos, same_provider=False, source_md5=None, dest_md5=None):
+    """
+    Join two listings on their relative keys.
+
+    Returns (keys to copy, keys to delete): source keys that are missing or
+    changed on the destination, and destination keys absent from the source.
+    `source_md5` and `dest_md5` compute the md5 of a key of their side; they
+    are only called for keys of the same size on both sides.
+    """
+    dest_by_key = {info.key: info for info in dest_infos}
+    keys_to_copy = []
+    for source_info in source_infos:
+        dest_info = dest_by_key.pop(source_info.key, None)
+        if dest_info is not None and source_info.size == dest_info.size:
+            source_info, dest_info = _with_md5(source_info, dest_info, source_md5, dest_md5)
+        if dest_info is None or not is_same_blob(source_info, dest_info, same_provider):
+            keys_to_copy.append(source_info.key)
+    return keys_to_copy, sorted(dest_by_key)
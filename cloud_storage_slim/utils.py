@@ -1,10 +1,20 @@
 import os
 import re
+import base64
 import logging
+from collections import namedtuple
+from datetime import datetime
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# metadata of a remote blob, mtime is a unix timestamp in seconds and md5
+# the hex digest of the content when the provider reports one
+# crc32c (GCS) and crc64ecma (TOS) are set by listings that report them
+BlobInfo = namedtuple(
+    "BlobInfo", ["key", "size", "etag", "mtime", "md5", "crc32c", "crc64ecma"], defaults=(None, None, None)
+)
+
 
 def check_remote_file(path_uri):
     path_scheme = urlparse(path_uri).scheme
@@ -55,3 +65,55 @@ def parse_path_uri(storage_bucket):
     bucket_name = parsed_url.netloc
     blob_path = parsed_url.path.lstrip("/")
     return scheme, bucket_name, blob_path
+
+
+def normalize_etag(etag):
+    if etag is None:
+        return None
+    return etag.strip('"')
+
+
+def etag_md5(etag):
+    """
+    S3 compatible providers use the hex md5 of the content as etag, except
+    for multipart uploads whose etag looks like "<hex>-<number of parts>"
+    """
+    etag = normalize_etag(etag)
+    if etag is not None and re.fullmatch(r"[0-9a-fA-F]{32}", etag):
+        return etag.lower()
+    return None
+
+
+def base64_md5(value):
+    """
+    GCS and Azure report the md5 as base64 text or raw bytes
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = base64.b64decode(value)
+    return bytes(value).hex()
+
+
+def to_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def configure_requests_session(session, pool_maxsize, keep_alive=True):
+    """
+    size the connection pools of a requests session, pool_maxsize is the
+    number of connections kept per host, keep_alive=False closes every
+    connection after its response
+    """
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
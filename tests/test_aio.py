@@ -0,0 +1,154 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.aio import AsyncCloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+
+
+class ListingStorage:
+    def __init__(self, num_blobs):
+        self.keys = [f"data/{i:06d}" for i in range(num_blobs)]
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        for key in self.keys:
+            if key.startswith(pattern):
+                yield BlobInfo(key, 1, "etag", 0)
+
+
+class AsyncUpload:
+    max_parts = 10000
+
+    def __init__(self, storage, remote_blob_path):
+        self.storage = storage
+        self.remote_blob_path = remote_blob_path
+        self.parts = {}
+
+    async def upload_part(self, part_number, data):
+        self.parts[part_number] = data
+        return f"etag-{part_number}"
+
+    async def complete(self, parts):
+        self.storage.blobs[self.remote_blob_path] = b"".join(self.parts[part_number] for part_number, _ in parts)
+
+    async def abort(self):
+        self.storage.aborted = True
+
+
+class AsyncStorage:
+    """
+    in-memory stand-in for the native asyncio clients, the first listing
+    fails after `fail_listing_after` blobs
+    """
+
+    def __init__(self, fail_listing_after=None):
+        self.blobs = {}
+        self.ranges = []
+        self.aborted = False
+        self.fail_listing_after = fail_listing_after
+
+    async def stat_blob(self, bucket_name, remote_blob_path):
+        return BlobInfo(remote_blob_path, len(self.blobs[remote_blob_path]), "etag", 0)
+
+    async def read_range(self, bucket_name, remote_blob_path, start, end):
+        self.ranges.append((start, end))
+        return self.blobs[remote_blob_path][start:end]
+
+    async def download_bytes(self, bucket_name, remote_blob_path):
+        return self.blobs[remote_blob_path]
+
+    async def upload_bytes(self, bucket_name, data, remote_blob_path):
+        self.blobs[remote_blob_path] = data
+
+    async def create_multipart_upload(self, bucket_name, remote_blob_path):
+        return AsyncUpload(self, remote_blob_path)
+
+    async def iter_blobs(self, bucket_name, pattern, start_after=None):
+        for i, key in enumerate(sorted(self.blobs)):
+            if key.startswith(pattern) and (start_after is None or key > start_after):
+                if self.fail_listing_after is not None and i >= self.fail_listing_after:
+                    self.fail_listing_after = None
+                    raise ConnectionError("connection reset")
+                yield BlobInfo(key, len(self.blobs[key]), "etag", 0)
+
+    async def close(self):
+        pass
+
+
+class TestAsyncCloudStorageSlim(unittest.TestCase):
+
+    def test_ls(self):
+        async def ls():
+            async with AsyncCloudStorageSlim(max_workers=2) as cloud_storage_slim:
+                cloud_storage_slim.cloud_storage_slim.gcs_client = ListingStorage(2500)
+                return [key async for key in cloud_storage_slim.ls("gs://bucket/data/")]
+
+        self.assertEqual(asyncio.run(ls()), ListingStorage(2500).keys)
+
+    def test_concurrent_copyto(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_paths = []
+            for i in range(20):
+                source_path = os.path.join(tmp_dir, f"source-{i}")
+                with open(source_path, "w") as f:
+                    f.write(str(i))
+                source_paths.append(source_path)
+
+            async def copy_all():
+                async with AsyncCloudStorageSlim(max_workers=4) as cloud_storage_slim:
+                    await asyncio.gather(*[
+                        cloud_storage_slim.copyto(source_path, f"{source_path}.copy") for source_path in source_paths
+                    ])
+
+            asyncio.run(copy_all())
+            with open(os.path.join(tmp_dir, "source-7.copy")) as f:
+                self.assertEqual(f.read(), "7")
+
+    def test_native_transfers(self):
+        storage = AsyncStorage()
+        data = os.urandom(10 * 1024 + 7)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, "source")
+            dest_path = os.path.join(tmp_dir, "dest")
+            with open(source_path, "wb") as f:
+                f.write(data)
+
+            async def transfer():
+                async with AsyncCloudStorageSlim(max_workers=2) as cloud_storage_slim:
+                    cloud_storage_slim.s3_client = storage
+                    await cloud_storage_slim.upload(source_path, "s3://bucket/blob", part_size=1024, parallelism=4)
+                    await cloud_storage_slim.download("s3://bucket/blob", dest_path, part_size=4096)
+                    await cloud_storage_slim.put_bytes("s3://bucket/small", b"small")
+                    return await cloud_storage_slim.get_bytes("s3://bucket/small")
+
+            self.assertEqual(asyncio.run(transfer()), b"small")
+            self.assertEqual(storage.blobs["blob"], data)
+            self.assertEqual(storage.ranges, [(0, 4096), (4096, 8192), (8192, len(data))])
+            with open(dest_path, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_native_ls_resumes_after_the_last_key(self):
+        storage = AsyncStorage(fail_listing_after=3)
+        for i in range(5):
+            storage.blobs[f"data/{i}"] = b"x"
+
+        async def ls():
+            async with AsyncCloudStorageSlim(max_workers=2) as cloud_storage_slim:
+                cloud_storage_slim.az_client = storage
+                keys = [key async for key in cloud_storage_slim.ls("az://container/data/")]
+                return keys, await cloud_storage_slim.exists("az://container/data/2")
+
+        keys, exists = asyncio.run(ls())
+        self.assertEqual(keys, [f"data/{i}" for i in range(5)])
+        self.assertTrue(exists)
+
+    def test_shares_the_retrier_of_the_blocking_clients(self):
+        cloud_storage_slim = CloudStorageSlim()
+        retrier = cloud_storage_slim.retrier("gcs", "bucket")
+        self.assertIs(cloud_storage_slim._retrying(None, "gs").retrier("bucket"), retrier)
+        self.assertIs(cloud_storage_slim.retrier("gs", "bucket"), retrier)
+
+
+if __name__ == "__main__":
+    unittest.main()
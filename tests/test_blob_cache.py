@@ -0,0 +1,119 @@
+import os
+import hashlib
+import tempfile
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.blob_cache import BlobCache
+
+
+class InMemoryStorage:
+    """
+    Fake backend keeping blobs in a dict and counting downloads.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = 0
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        data = self.blobs[remote_blob_path]
+        return BlobInfo(remote_blob_path, len(data), str(hash(data)), 0)
+
+    def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
+        self.downloads += 1
+        with open(local_blob_path, "wb") as f:
+            f.write(self.blobs[remote_blob_path])
+
+    def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
+        with open(local_blob_path, "rb") as f:
+            self.blobs[remote_blob_path] = f.read()
+
+
+class TestBlobCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.blob_cache = BlobCache(os.path.join(self.tmp_dir.name, "cache"), max_bytes=10)
+        self.storage = InMemoryStorage()
+        self.cloud_storage_slim = CloudStorageSlim(blob_cache=self.blob_cache)
+        self.cloud_storage_slim.s3_client = self.storage
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_download_is_served_from_cache(self):
+        self.storage.blobs["model.bin"] = b"weights"
+        for name in ["a.bin", "b.bin"]:
+            dest_path = os.path.join(self.tmp_dir.name, name)
+            self.cloud_storage_slim.copyto("s3://bucket/model.bin", dest_path)
+            self.assertEqual(self.read(dest_path), b"weights")
+        self.assertEqual(self.storage.downloads, 1)
+
+        self.storage.blobs["model.bin"] = b"weights2"
+        dest_path = os.path.join(self.tmp_dir.name, "a.bin")
+        self.cloud_storage_slim.copyto("s3://bucket/model.bin", dest_path)
+        self.assertEqual(self.read(dest_path), b"weights2")
+        self.assertEqual(self.storage.downloads, 2)
+
+    def test_checksum_of_cached_copy(self):
+        self.storage.blobs["model.bin"] = b"weights"
+        dest_path = os.path.join(self.tmp_dir.name, "a.bin")
+        self.cloud_storage_slim.copyto("s3://bucket/model.bin", dest_path)
+        result = self.cloud_storage_slim.copyto("s3://bucket/model.bin", dest_path, checksum=True)
+        self.assertEqual(result.md5, hashlib.md5(b"weights").hexdigest())
+        self.assertEqual(self.storage.downloads, 1)
+
+    def test_lru_eviction(self):
+        self.storage.blobs["a"] = b"aaaa"
+        self.storage.blobs["b"] = b"bbbb"
+        self.storage.blobs["c"] = b"cccc"
+        dest_path = os.path.join(self.tmp_dir.name, "dest")
+        for key in ["a", "b", "c"]:
+            self.cloud_storage_slim.copyto(f"s3://bucket/{key}", dest_path)
+        self.assertEqual(len(os.listdir(self.blob_cache._objects_path)), 2)
+        self.assertIsNone(self.blob_cache.get("s3://bucket/a", str(hash(b"aaaa"))))
+
+    def test_copy_is_writable_and_separate(self):
+        self.storage.blobs["model.bin"] = b"weights"
+        dest_path = os.path.join(self.tmp_dir.name, "a.bin")
+        self.cloud_storage_slim.copyto("s3://bucket/model.bin", dest_path)
+        entry_path = self.blob_cache.get("s3://bucket/model.bin", str(hash(b"weights")))
+        self.assertNotEqual(os.stat(dest_path).st_ino, os.stat(entry_path).st_ino)
+        self.assertTrue(os.stat(dest_path).st_mode & 0o200)
+
+    def test_eviction_keeps_blobs_in_use(self):
+        def write(data):
+            def download(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+
+            return download
+
+        with self.blob_cache.open_entry("s3://bucket/a", "1", write(b"aaaa")) as entry_path:
+            os.utime(entry_path, (0, 0))
+            with self.blob_cache.open_entry("s3://bucket/b", "1", write(b"bbbb")):
+                pass
+            with self.blob_cache.open_entry("s3://bucket/c", "1", write(b"cccc")):
+                pass
+        # the oldest blob was in use, the next one was removed in its place
+        self.assertIsNotNone(self.blob_cache.get("s3://bucket/a", "1"))
+        self.assertIsNone(self.blob_cache.get("s3://bucket/b", "1"))
+        self.assertEqual(
+            sorted(os.listdir(self.blob_cache._locks_path)), sorted(os.listdir(self.blob_cache._objects_path))
+        )
+
+    def test_remote_to_remote_uploads_cached_copy(self):
+        self.storage.blobs["config.json"] = b"{}"
+        self.cloud_storage_slim.copyto("s3://bucket/config.json", "s3://bucket/copy1.json", server_side_copy=False)
+        self.cloud_storage_slim.copyto("s3://bucket/config.json", "s3://bucket/copy2.json", server_side_copy=False)
+        self.assertEqual(self.storage.blobs["copy2.json"], b"{}")
+        self.assertEqual(self.storage.downloads, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.bucket_index import BucketIndex
+
+
+class DictStorage:
+    """
+    Fake backend keeping blob sizes in a dict and counting list calls.
+    """
+
+    def __init__(self, blobs):
+        self.blobs = dict(blobs)
+        self.listings = 0
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        self.listings += 1
+        for key in sorted(self.blobs):
+            if key.startswith(pattern) and (start_after is None or key > start_after):
+                yield BlobInfo(key, self.blobs[key], "etag", 0)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        return BlobInfo(remote_blob_path, self.blobs[remote_blob_path], "etag", 0)
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        del self.blobs[remote_blob_path]
+
+
+class TestBucketIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bucket_index = BucketIndex(os.path.join(self.tmp_dir.name, "index.sqlite3"))
+        self.storage = DictStorage({"logs/0001": 1, "logs/0002": 2, "other/1": 3})
+        self.cloud_storage_slim = CloudStorageSlim(bucket_index=self.bucket_index)
+        self.cloud_storage_slim.s3_client = self.storage
+
+    def tearDown(self):
+        self.bucket_index.close()
+        self.tmp_dir.cleanup()
+
+    def test_answers_from_index(self):
+        self.assertEqual(self.cloud_storage_slim.refresh_index("s3://bucket/logs/"), 2)
+        self.assertEqual(self.cloud_storage_slim.ls("s3://bucket/logs/"), ["logs/0001", "logs/0002"])
+        self.assertEqual(self.cloud_storage_slim.ls("s3://bucket/logs/", include="0002", detail=True)[0].size, 2)
+        self.assertTrue(self.cloud_storage_slim.exists("s3://bucket/logs/0001"))
+        self.assertFalse(self.cloud_storage_slim.exists("s3://bucket/logs/000"))
+        self.assertEqual(self.storage.listings, 1)
+
+        # not covered by the index
+        self.assertEqual(self.cloud_storage_slim.ls("s3://bucket/other/"), ["other/1"])
+        self.assertEqual(self.storage.listings, 2)
+
+    def test_incremental_refresh(self):
+        self.cloud_storage_slim.refresh_index("s3://bucket/logs/")
+        self.storage.blobs["logs/0003"] = 3
+        self.assertEqual(self.cloud_storage_slim.refresh_index("s3://bucket/logs/", incremental=True), 1)
+        self.assertEqual(self.cloud_storage_slim.ls("s3://bucket/logs/"), ["logs/0001", "logs/0002", "logs/0003"])
+
+        del self.storage.blobs["logs/0001"]
+        self.cloud_storage_slim.refresh_index("s3://bucket/logs/")
+        self.assertEqual(self.cloud_storage_slim.ls("s3://bucket/logs/"), ["logs/0002", "logs/0003"])
+
+    def test_writes_update_index(self):
+        self.cloud_storage_slim.refresh_index("s3://bucket/logs/")
+        self.cloud_storage_slim._delete_file("s3://bucket/logs/0001")
+        self.storage.blobs["logs/0004"] = 4
+        self.cloud_storage_slim._notify_write("s3://bucket/logs/0004")
+        self.assertEqual(self.cloud_storage_slim.ls("s3://bucket/logs/"), ["logs/0002", "logs/0004"])
+        self.assertEqual(self.storage.listings, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import time
+import threading
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    def test_clients_are_created_once(self):
+        cloud_storage_slim = CloudStorageSlim()
+        created = []
+
+        def create_client(scheme):
+            time.sleep(0.01)
+            created.append(scheme)
+            cloud_storage_slim.s3_client = object()
+            return cloud_storage_slim.s3_client
+
+        cloud_storage_slim._create_client = create_client
+        clients = []
+        threads = [
+            threading.Thread(target=lambda: clients.append(cloud_storage_slim._get_client("s3"))) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(created, ["s3"])
+        self.assertEqual(len(set(map(id, clients))), 1)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ValueError):
+            CloudStorageSlim()._get_client("ftp")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,337 @@
+import os
+import hashlib
+import tempfile
+import importlib.util
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.segmented import segmented_download
+from cloud_storage_slim.checksum import Checksums, OrderedHasher
+from cloud_storage_slim.multipart import MultipartUpload, multipart_upload_file
+
+
+class CopyingStorage:
+    """
+    Fake backend recording which copy route was taken.
+    """
+
+    def __init__(self, server_side=True):
+        self.blobs = {"source": b"data"}
+        self.server_side = server_side
+        self.server_side_copies = 0
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        if not self.server_side:
+            raise NotImplementedError("no server-side copy")
+        self.server_side_copies += 1
+        self.blobs[dest_blob_path] = self.blobs[source_blob_path]
+
+    def signed_url(self, bucket_name, remote_blob_path, expiration=3600):
+        return f"https://signed/{remote_blob_path}"
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        return BlobInfo(remote_blob_path, len(self.blobs[remote_blob_path]), None, 0)
+
+    def copy_from_url(self, source_url, size, bucket_name, remote_blob_path, **kwargs):
+        if not self.server_side:
+            raise NotImplementedError("no copy from URL")
+        self.blobs[remote_blob_path] = (source_url, size)
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        yield self.blobs[remote_blob_path]
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        self.blobs[remote_blob_path] = b"".join(chunks)
+
+
+class ChunkedStorage(CopyingStorage):
+    """
+    Fake backend recording the buffer options of streamed copies.
+    """
+
+    def __init__(self):
+        super().__init__(server_side=False)
+        self.blobs = {"source": os.urandom(1000)}
+        self.options = {}
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        self.options["chunk_size"] = kwargs["chunk_size"]
+        data = self.blobs[remote_blob_path]
+        for start in range(0, len(data), kwargs["chunk_size"]):
+            yield data[start:start + kwargs["chunk_size"]]
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        self.options["max_buffer_bytes"] = kwargs["max_buffer_bytes"]
+        super().write_chunks(bucket_name, chunks, remote_blob_path, **kwargs)
+
+
+class ChunkedAzureBlobClient:
+    """
+    Fake Azure BlobClient whose downloads return chunks of the requested size.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.options = {}
+
+    def download_blob(self, **kwargs):
+        self.options = kwargs
+        chunk_size = kwargs.get("max_chunk_get_size", 4 * 1024 * 1024)
+        chunks = [self.data[start:start + chunk_size] for start in range(0, len(self.data), chunk_size)]
+        return SimpleNamespace(chunks=lambda: iter(chunks))
+
+
+class PresignedUrlStorage:
+    """
+    Fake http client recording the declared size of each upload.
+    """
+
+    def __init__(self):
+        self.uploads = {}
+
+    def write_chunks_uri(self, chunks, remote_blob_uri, size=None, **kwargs):
+        self.uploads[remote_blob_uri] = (b"".join(chunks), size)
+
+
+class PendingCopyBlobClient:
+    """
+    Fake Azure BlobClient whose copy never leaves the pending state.
+    """
+
+    url = "https://account.blob.core.windows.net/container/dest"
+
+    def __init__(self):
+        self.aborted = []
+
+    def get_blob_properties(self):
+        status = "aborted" if self.aborted else "pending"
+        return SimpleNamespace(copy=SimpleNamespace(id="copy-id", status=status, status_description=None))
+
+    def abort_copy(self, copy_id):
+        self.aborted.append(copy_id)
+
+
+class ChecksumUpload(MultipartUpload):
+    def __init__(self, storage, remote_blob_path):
+        self.storage = storage
+        self.remote_blob_path = remote_blob_path
+        self.parts = {}
+
+    def upload_part(self, part_number, data):
+        self.parts[part_number] = bytes(data)
+        return part_number
+
+    def complete(self, parts):
+        self.storage.blobs[self.remote_blob_path] = b"".join(self.parts[n] for n, _ in parts)
+        self.storage.part_md5s[self.remote_blob_path] = [hashlib.md5(self.parts[n]).digest() for n, _ in parts]
+
+    def abort(self):
+        pass
+
+
+class ChecksumStorage:
+    """
+    Fake backend reporting the md5 of its blobs, or a wrong one, and the S3
+    ETag of multipart uploads.
+    """
+
+    def __init__(self, corrupt=False):
+        self.blobs = {}
+        self.part_md5s = {}
+        self.corrupt = corrupt
+        self.uploads = 0
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        data = self.blobs[remote_blob_path]
+        md5 = hashlib.md5(data + b"corrupt" if self.corrupt else data).hexdigest()
+        if remote_blob_path in self.part_md5s:
+            return BlobInfo(remote_blob_path, len(data), md5, 0)
+        return BlobInfo(remote_blob_path, len(data), md5, 0, md5)
+
+    def stat_checksums(self, bucket_name, remote_blob_path):
+        part_md5s = self.part_md5s.get(remote_blob_path)
+        if part_md5s is None:
+            return Checksums(self.stat_blob(bucket_name, remote_blob_path).md5)
+        digests = b"".join(part_md5s) + (b"corrupt" if self.corrupt else b"")
+        return Checksums(multipart_etag=f"{hashlib.md5(digests).hexdigest()}-{len(part_md5s)}")
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, **kwargs):
+        self.part_md5s.pop(remote_blob_path, None)
+        return ChecksumUpload(self, remote_blob_path)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        return self.blobs[remote_blob_path][start:end]
+
+    def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
+        segmented_download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs)
+
+    def upload(self, bucket_name, local_blob_path, remote_blob_path, **kwargs):
+        multipart_upload_file(self, bucket_name, local_blob_path, remote_blob_path, **kwargs)
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        self.uploads += 1
+        self.blobs[remote_blob_path] = bytes(data)
+
+
+class TestCloudStorageSlim(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmp_dir.name, "source")
+        self.dest_dir = os.path.join(self.tmp_dir.name, "dest")
+        for relative_path in ["a.txt", "nested/b.txt", "nested/deeper/c.txt"]:
+            local_file_path = os.path.join(self.source_dir, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+            with open(local_file_path, "w") as f:
+                f.write(f"this is {relative_path}")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_copy_local_directory(self):
+        cloud_storage_slim = CloudStorageSlim()
+        pairs = cloud_storage_slim.copy(self.source_dir, self.dest_dir, transfers=2)
+        self.assertEqual(len(pairs), 3)
+        with open(os.path.join(self.dest_dir, "nested", "deeper", "c.txt")) as f:
+            self.assertEqual(f.read(), "this is nested/deeper/c.txt")
+
+    def test_copy_remote_dest_paths(self):
+        cloud_storage_slim = CloudStorageSlim()
+        self.assertEqual(
+            cloud_storage_slim._join_path("gs://bucket/prefix/", "nested/b.txt"),
+            "gs://bucket/prefix/nested/b.txt",
+        )
+        self.assertEqual(
+            cloud_storage_slim._join_path("s3://bucket", "a.txt"),
+            "s3://bucket/a.txt",
+        )
+
+    def test_copy_remote_same_provider_server_side(self):
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.s3_client = CopyingStorage()
+        cloud_storage_slim.copyto("s3://bucket/source", "s3://other-bucket/dest")
+        self.assertEqual(cloud_storage_slim.s3_client.server_side_copies, 1)
+
+        cloud_storage_slim.s3_client = CopyingStorage(server_side=False)
+        cloud_storage_slim.copyto("s3://bucket/source", "s3://other-bucket/dest")
+        self.assertEqual(cloud_storage_slim.s3_client.blobs["dest"], b"data")
+
+    def test_copy_remote_ingest_from_url(self):
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.gcs_client = CopyingStorage()
+        cloud_storage_slim.az_client = CopyingStorage()
+        cloud_storage_slim.copyto("gs://bucket/source", "az://container/dest", ingest_from_url=True)
+        self.assertEqual(cloud_storage_slim.az_client.blobs["dest"], ("https://signed/source", 4))
+
+        cloud_storage_slim.az_client = CopyingStorage(server_side=False)
+        cloud_storage_slim.copyto("gs://bucket/source", "az://container/dest", ingest_from_url=True)
+        self.assertEqual(cloud_storage_slim.az_client.blobs["dest"], b"data")
+
+    def test_copy_remote_to_http_declares_size(self):
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.s3_client = CopyingStorage()
+        cloud_storage_slim.http_client = PresignedUrlStorage()
+        cloud_storage_slim.copyto("s3://bucket/source", "https://presigned/dest")
+        cloud_storage_slim.put_bytes("https://presigned/bytes", b"0123")
+        self.assertEqual(cloud_storage_slim.http_client.uploads["https://presigned/dest"], (b"data", 4))
+        self.assertEqual(cloud_storage_slim.http_client.uploads["https://presigned/bytes"], (b"0123", 4))
+
+    def test_copy_remote_to_remote_within_max_buffer_bytes(self):
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.s3_client = ChunkedStorage()
+        cloud_storage_slim.gcs_client = ChunkedStorage()
+        cloud_storage_slim.copyto("s3://bucket/source", "gs://bucket/dest", max_buffer_bytes=600)
+        self.assertEqual(cloud_storage_slim.gcs_client.blobs["dest"], cloud_storage_slim.s3_client.blobs["source"])
+        self.assertEqual(cloud_storage_slim.s3_client.options["chunk_size"], 100)
+        self.assertEqual(cloud_storage_slim.gcs_client.options["max_buffer_bytes"], 300)
+
+    def test_azure_chunks_within_max_buffer_bytes(self):
+        from cloud_storage_slim.azure_storage import AzureStorage
+
+        blob_client = ChunkedAzureBlobClient(os.urandom(1000))
+        az_client = AzureStorage.__new__(AzureStorage)
+        az_client.blob_service_client = SimpleNamespace(get_blob_client=lambda container, blob: blob_client)
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.az_client = az_client
+        cloud_storage_slim.gcs_client = ChunkedStorage()
+        cloud_storage_slim.copyto("az://container/source", "gs://bucket/dest", max_buffer_bytes=600)
+        self.assertEqual(cloud_storage_slim.gcs_client.blobs["dest"], blob_client.data)
+        self.assertEqual(blob_client.options, {"max_single_get_size": 100, "max_chunk_get_size": 100})
+
+    def test_azure_copy_aborted_after_timeout(self):
+        from cloud_storage_slim.azure_storage import AzureStorage
+
+        blob_client = PendingCopyBlobClient()
+        with self.assertRaises(IOError):
+            AzureStorage._wait_for_copy(blob_client, 0, 0)
+        self.assertEqual(blob_client.aborted, ["copy-id"])
+
+    def test_copy_with_checksum(self):
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.s3_client = ChecksumStorage()
+        data = os.urandom(1000)
+        md5 = hashlib.md5(data).hexdigest()
+        source_path = os.path.join(self.tmp_dir.name, "upload.bin")
+        with open(source_path, "wb") as f:
+            f.write(data)
+
+        result = cloud_storage_slim.copyto(source_path, "s3://bucket/blob", checksum=True)
+        self.assertEqual((result.md5, result.verified, result.skipped), (md5, True, False))
+
+        # parts finish out of order, the later ones are hashed from the file
+        dest_path = os.path.join(self.tmp_dir.name, "download.bin")
+        result = cloud_storage_slim.copyto("s3://bucket/blob", dest_path, checksum=True, parallelism=8, part_size=7)
+        self.assertEqual((result.md5, result.verified), (md5, True))
+
+        result = cloud_storage_slim.copyto(source_path, "s3://bucket/blob", skip_identical=True)
+        self.assertEqual((result.md5, result.skipped), (md5, True))
+        self.assertEqual(cloud_storage_slim.s3_client.uploads, 1)
+
+        cloud_storage_slim.s3_client.corrupt = True
+        with self.assertRaises(IOError):
+            cloud_storage_slim.copyto("s3://bucket/blob", dest_path, checksum=True)
+
+    def test_copy_with_checksum_multipart_etag(self):
+        cloud_storage_slim = CloudStorageSlim()
+        cloud_storage_slim.s3_client = ChecksumStorage()
+        source_path = os.path.join(self.tmp_dir.name, "upload.bin")
+        with open(source_path, "wb") as f:
+            f.write(os.urandom(1000))
+
+        # 4 parts, the etag is not an md5 of the content
+        result = cloud_storage_slim.copyto(source_path, "s3://bucket/blob", checksum=True, part_size=300)
+        self.assertTrue(result.verified)
+        self.assertEqual(len(cloud_storage_slim.s3_client.part_md5s["blob"]), 4)
+
+        cloud_storage_slim.s3_client.corrupt = True
+        with self.assertRaises(IOError):
+            cloud_storage_slim.copyto(source_path, "s3://bucket/blob", checksum=True, part_size=300)
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("crcmod") and importlib.util.find_spec("google_crc32c"),
+        "needs crcmod and google-crc32c",
+    )
+    def test_hasher_crcs(self):
+        hasher = OrderedHasher(algorithms=("crc32c", "crc64ecma"))
+        hasher.update(b"1234")
+        hasher.update(b"56789")
+        # the check values of CRC-32C and CRC-64/XZ
+        self.assertEqual(hasher.checksums().crc32c, 0xE3069283)
+        self.assertEqual(hasher.checksums().crc64ecma, 0x995DC9BBDF1939FA)
+
+    def test_destroy_only_removes_tmp_workspace(self):
+        with mock.patch.dict(os.environ, {"HOME": self.tmp_dir.name}):
+            cloud_storage_slim = CloudStorageSlim()
+            tmp_workspace_folder_path = cloud_storage_slim._setup_tmp_workspace()
+            index_path = cloud_storage_slim._workspace_path("index.sqlite3")
+            with open(index_path, "w"):
+                pass
+            cloud_storage_slim.destroy()
+            self.assertFalse(os.path.exists(tmp_workspace_folder_path))
+            self.assertTrue(os.path.exists(index_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
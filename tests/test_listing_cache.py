@@ -0,0 +1,71 @@
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.listing_cache import ListingCache
+
+
+class CountingStorage:
+    """
+    Fake backend counting the listings it serves.
+    """
+
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+        self.listings = 0
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        self.listings += 1
+        for key in self.keys:
+            if key.startswith(pattern):
+                yield BlobInfo(key, 1, "etag", 0)
+
+    def delete_blob(self, bucket_name, remote_blob_path):
+        self.keys.remove(remote_blob_path)
+
+
+class TestListingCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ListingCache(max_entries=2)
+        cache.put("gs", "bucket", "a/", [])
+        cache.put("gs", "bucket", "b/", [])
+        self.assertEqual(cache.get("gs", "bucket", "a/"), [])
+        cache.put("gs", "bucket", "c/", [])
+        self.assertIsNone(cache.get("gs", "bucket", "b/"))
+        self.assertEqual(cache.cache_info(), (1, 1, 2, 2))
+
+    def test_ttl(self):
+        cache = ListingCache(ttl=0)
+        cache.put("gs", "bucket", "a/", [])
+        self.assertIsNone(cache.get("gs", "bucket", "a/"))
+
+    def test_covering_prefix_and_invalidate(self):
+        cache = ListingCache()
+        cache.put("gs", "bucket", "data/", [BlobInfo("data/a/1", 1, None, 0), BlobInfo("data/b/1", 1, None, 0)])
+        self.assertEqual([info.key for info in cache.get("gs", "bucket", "data/b")], ["data/b/1"])
+        self.assertIsNone(cache.get("s3", "bucket", "data/"))
+
+        cache.put("gs", "bucket", "data/a/", [BlobInfo("data/a/1", 1, None, 0)], complete=False)
+        cache.invalidate("gs", "bucket", "other/1")
+        self.assertEqual(cache.cache_info().entries, 2)
+        cache.invalidate("gs", "bucket", "data/a/2")
+        self.assertEqual(cache.cache_info().entries, 0)
+
+    def test_ls_reads_through_cache(self):
+        storage = CountingStorage(["data/1", "data/2", "other/1"])
+        cloud_storage_slim = CloudStorageSlim(listing_cache=ListingCache())
+        cloud_storage_slim.gcs_client = storage
+
+        self.assertEqual(cloud_storage_slim.ls("gs://bucket/data/"), ["data/1", "data/2"])
+        self.assertEqual(cloud_storage_slim.ls("gcs://bucket/data/"), ["data/1", "data/2"])
+        self.assertEqual(list(cloud_storage_slim.ls("gs://bucket/data/", stream=True)), ["data/1", "data/2"])
+        self.assertEqual(cloud_storage_slim._get_first_blob("gs", "bucket", "data/2"), "data/2")
+        self.assertEqual(storage.listings, 1)
+
+        cloud_storage_slim._delete_file("gs://bucket/data/1")
+        self.assertEqual(cloud_storage_slim.ls("gs://bucket/data/"), ["data/2"])
+        self.assertEqual(storage.listings, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.listing import KeyRange, iter_blobs_parallel, split_key_range
+
+
+class PagedStorage:
+    """
+    Fake backend listing `num_blobs` keys in pages of `page_size`.
+    """
+
+    def __init__(self, num_blobs, page_size=100, keys=None):
+        self.keys = sorted(keys) if keys is not None else [f"data/{i:06d}" for i in range(num_blobs)]
+        self.page_size = page_size
+        self.pages_fetched = 0
+        self.level_blobs_read = 0
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        keys = [key for key in self.keys if key.startswith(pattern) and (start_after is None or key > start_after)]
+        for i in range(0, len(keys), self.page_size):
+            self.pages_fetched += 1
+            for key in keys[i:i + self.page_size]:
+                yield BlobInfo(key, 1, "etag", 0)
+
+    def list_prefixes(self, bucket_name, pattern, delimiter="/"):
+        last_prefix = None
+        for key in self.keys:
+            if not key.startswith(pattern):
+                continue
+            rest = key[len(pattern):]
+            if delimiter in rest:
+                prefix = pattern + rest[:rest.index(delimiter) + 1]
+                if prefix != last_prefix:
+                    last_prefix = prefix
+                    yield prefix
+            else:
+                self.level_blobs_read += 1
+                yield BlobInfo(key, 1, "etag", 0)
+
+
+class TestLs(unittest.TestCase):
+
+    def setUp(self):
+        self.cloud_storage_slim = CloudStorageSlim()
+        self.storage = PagedStorage(1000)
+        self.cloud_storage_slim.gcs_client = self.storage
+
+    def test_ls(self):
+        self.assertEqual(self.cloud_storage_slim.ls("gs://bucket/data/"), self.storage.keys)
+
+    def test_ls_stream_is_lazy(self):
+        blobs = self.cloud_storage_slim.ls("gs://bucket/data/", stream=True)
+        self.assertEqual(next(blobs), "data/000000")
+        self.assertEqual(self.storage.pages_fetched, 1)
+
+    def test_ls_detail(self):
+        blob_infos = self.cloud_storage_slim.ls("gs://bucket/data/00000", detail=True)
+        self.assertEqual(len(blob_infos), 10)
+        self.assertIsInstance(blob_infos[0], BlobInfo)
+
+    def test_ls_parallel_keeps_key_order(self):
+        keys = [
+            "a.txt", "a/1", "a/2/x", "a/2/y", "a0", "b/1", "b/2",
+            "b/c/d/e", "c", "d/", "d/1", "z/z/z",
+        ]
+        self.cloud_storage_slim.gcs_client = PagedStorage(0, keys=keys)
+        for parallel in [2, 3, 8]:
+            self.assertEqual(self.cloud_storage_slim.ls("gs://bucket/", parallel=parallel), sorted(keys))
+        self.assertEqual(
+            self.cloud_storage_slim.ls("gs://bucket/b/", parallel=2),
+            ["b/1", "b/2", "b/c/d/e"],
+        )
+
+    def test_ls_parallel_splits_a_flat_keyspace_into_key_ranges(self):
+        storage = PagedStorage(5000)
+        self.cloud_storage_slim.gcs_client = storage
+        self.assertEqual(self.cloud_storage_slim.ls("gs://bucket/data/", parallel=4), storage.keys)
+        # the delimiter listing stopped after its first page of blobs
+        self.assertEqual(storage.level_blobs_read, 1000)
+
+    def test_split_key_range_covers_the_rest_of_the_keyspace(self):
+        keys = [f"data/{i:06d}" for i in range(1000)]
+        key_ranges = split_key_range("data/", keys)
+        self.assertEqual(key_ranges[0], KeyRange("data/", "data/000999", "data/001"))
+        self.assertEqual(key_ranges[-1], KeyRange("data/", "data/9", None))
+        for key_range, next_key_range in zip(key_ranges, key_ranges[1:]):
+            self.assertEqual(key_range.last, next_key_range.start_after)
+        self.assertEqual(len(key_ranges), 28)
+
+    def test_iter_blobs_parallel_hands_shards_over_in_pages(self):
+        storage = PagedStorage(0, keys=[f"a/{i:04d}" for i in range(50)] + ["b/0"])
+        blob_infos = iter_blobs_parallel(storage, "bucket", "", 2, page_size=5, max_pages=1)
+        self.assertEqual(next(blob_infos).key, "a/0000")
+        self.assertEqual([blob_info.key for blob_info in blob_infos][-2:], ["a/0049", "b/0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from cloud_storage_slim.retry import RetryPolicy
+from cloud_storage_slim.metrics import MetricsAggregator, operation_name
+from cloud_storage_slim.retrying_storage import RetryingStorage
+
+
+class ClientError(Exception):
+    """shaped like botocore's ClientError"""
+
+    def __init__(self, status, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class FlakyStorage:
+    def __init__(self, blobs, failures):
+        self.blobs = blobs
+        self.failures = failures
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        if self.failures:
+            raise self.failures.pop(0)
+        return self.blobs[remote_blob_path][start:end]
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        data = self.blobs[remote_blob_path]
+        for i in range(0, len(data), 4):
+            chunk = data[i:i + 4]
+            kwargs["throttle"].transfer(len(chunk))
+            yield chunk
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_operation_name(self):
+        self.assertEqual(operation_name(FlakyStorage.read_range), "get")
+        self.assertEqual(operation_name(FlakyStorage.iter_chunks), "iter_chunks")
+
+    def test_aggregator(self):
+        metrics = MetricsAggregator(latency_buckets=(0.1, 1))
+        metrics.on_request("s3", "bucket", "get", 0.05)
+        metrics.on_request("s3", "bucket", "get", 2, ConnectionResetError())
+        metrics.on_retry("s3", "bucket", "get", ConnectionResetError())
+        metrics.on_bytes("s3", "bucket", "read", 100)
+        metrics.on_transfer("s3://bucket/blob", "/tmp/blob", 0.5)
+
+        snapshot = metrics.snapshot()
+        latency = snapshot["requests"][0]["latency"]
+        self.assertEqual(latency["buckets"], {0.1: 1, 1: 0, float("inf"): 1})
+        self.assertEqual(latency["count"], 2)
+        self.assertEqual(snapshot["errors"][0]["error"], "ConnectionResetError")
+        self.assertEqual(snapshot["retries"][0]["count"], 1)
+        self.assertEqual(snapshot["bytes"][0]["bytes"], 100)
+        self.assertEqual(snapshot["transfers"]["succeeded"], 1)
+
+        text = metrics.to_prometheus()
+        self.assertIn(
+            'cloud_storage_slim_request_seconds_bucket{scheme="s3",bucket="bucket",operation="get",le="+Inf"} 2', text
+        )
+        self.assertIn('cloud_storage_slim_bytes_total{scheme="s3",bucket="bucket",direction="read"} 100', text)
+        self.assertIn('cloud_storage_slim_transfers_total{outcome="succeeded"} 1', text)
+
+    def test_retrying_storage_reports_to_observers(self):
+        metrics = MetricsAggregator()
+        client = FlakyStorage({"blob": b"0123456789"}, [ClientError(503, "SlowDown")])
+        storage = RetryingStorage(client, RetryPolicy(base_delay=0), 4, "s3", observers=[metrics])
+        self.assertEqual(storage.read_range("bucket", "blob", 2, 6), b"2345")
+        self.assertEqual(b"".join(storage.iter_chunks("bucket", "blob")), b"0123456789")
+
+        snapshot = metrics.snapshot()
+        requests = {request["operation"]: request["latency"]["count"] for request in snapshot["requests"]}
+        # the throttled attempt, the retry and the first chunk of the stream
+        self.assertEqual(requests, {"get": 3})
+        self.assertEqual(snapshot["errors"][0]["error"], "ClientError")
+        self.assertEqual(snapshot["retries"], [{"scheme": "s3", "bucket": "bucket", "operation": "get", "count": 1}])
+        self.assertEqual({b["direction"]: b["bytes"] for b in snapshot["bytes"]}, {"read": 14})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,238 @@
+import os
+import tempfile
+import threading
+import unittest
+from cloud_storage_slim.memory import MemoryBudget
+from cloud_storage_slim.journal import TransferJournal
+from cloud_storage_slim.retry import Retrier, RetryPolicy
+from cloud_storage_slim.multipart import (
+    MultipartUpload,
+    fit_part_size,
+    multipart_upload_file,
+    multipart_upload_chunks,
+    multipart_copy,
+    multipart_copy_from_url,
+)
+
+
+class InMemoryMultipartUpload(MultipartUpload):
+    def __init__(self, storage, remote_blob_path):
+        self.storage = storage
+        self.remote_blob_path = remote_blob_path
+        self.upload_id = f"upload-{len(storage.uploads)}"
+        self.parts = {}
+        self.lock = threading.Lock()
+        self.aborted = False
+
+    def upload_part(self, part_number, data):
+        if part_number == self.storage.fail_part:
+            raise IOError(f"part {part_number} failed")
+        with self.lock:
+            self.parts[part_number] = bytes(data)
+        return f"etag-{part_number}"
+
+    def copy_part(self, part_number, source_bucket_name, source_blob_path, start, end):
+        return self.upload_part(part_number, self.storage.blobs[source_blob_path][start:end])
+
+    def copy_part_from_url(self, part_number, source_url, start, end):
+        return self.upload_part(part_number, self.storage.urls[source_url][start:end])
+
+    def complete(self, parts):
+        assert [n for n, _ in parts] == sorted(self.parts)
+        self.storage.blobs[self.remote_blob_path] = b"".join(self.parts[n] for n, _ in parts)
+
+    def abort(self):
+        self.aborted = True
+
+
+class InMemoryStorage:
+    def __init__(self, fail_part=None):
+        self.blobs = {}
+        self.urls = {}
+        self.uploads = []
+        self.fail_part = fail_part
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        self.blobs[remote_blob_path] = bytes(data)
+
+    def create_multipart_upload(self, bucket_name, remote_blob_path, upload_id=None, **kwargs):
+        if upload_id is not None:
+            return next(upload for upload in self.uploads if upload.upload_id == upload_id)
+        upload = InMemoryMultipartUpload(self, remote_blob_path)
+        self.uploads.append(upload)
+        return upload
+
+
+class TestMultipart(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.local_blob_path = os.path.join(self.tmp_dir.name, "blob")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_local_file(self, data):
+        with open(self.local_blob_path, "wb") as f:
+            f.write(data)
+
+    def test_fit_part_size(self):
+        self.assertEqual(fit_part_size(100, 10, 1000), 10)
+        self.assertEqual(fit_part_size(100, 10, 5), 20)
+        self.assertEqual(fit_part_size(101, 10, 5), 21)
+
+    def test_upload_file_in_parts(self):
+        data = os.urandom(1000)
+        self.write_local_file(data)
+        client = InMemoryStorage()
+        multipart_upload_file(client, "bucket", self.local_blob_path, "blob", parallelism=4, part_size=64)
+        self.assertEqual(client.blobs["blob"], data)
+        self.assertEqual(len(client.uploads[0].parts), 16)
+
+    def test_upload_small_file_in_one_request(self):
+        self.write_local_file(b"small")
+        client = InMemoryStorage()
+        multipart_upload_file(client, "bucket", self.local_blob_path, "blob", part_size=64)
+        self.assertEqual(client.blobs["blob"], b"small")
+        self.assertEqual(client.uploads, [])
+
+    def test_failed_part_aborts_upload(self):
+        self.write_local_file(os.urandom(1000))
+        client = InMemoryStorage(fail_part=3)
+        with self.assertRaises(IOError):
+            multipart_upload_file(client, "bucket", self.local_blob_path, "blob", parallelism=2, part_size=64)
+        self.assertTrue(client.uploads[0].aborted)
+        self.assertNotIn("blob", client.blobs)
+
+    def test_resume_upload_from_journal(self):
+        data = os.urandom(1000)
+        self.write_local_file(data)
+        journal_path = os.path.join(self.tmp_dir.name, "journal.jsonl")
+        client = InMemoryStorage(fail_part=9)
+        with self.assertRaises(IOError):
+            multipart_upload_file(
+                client,
+                "bucket",
+                self.local_blob_path,
+                "blob",
+                parallelism=1,
+                part_size=64,
+                journal=TransferJournal(journal_path, {"size": 1000}),
+            )
+        self.assertFalse(client.uploads[0].aborted)
+
+        client.fail_part = None
+        journal = TransferJournal(journal_path, {"size": 1000})
+        self.assertEqual(sorted(journal.parts), list(range(1, 9)))
+        multipart_upload_file(
+            client, "bucket", self.local_blob_path, "blob", parallelism=4, part_size=64, journal=journal
+        )
+        self.assertEqual(client.blobs["blob"], data)
+        self.assertEqual(len(client.uploads), 1)
+        self.assertFalse(os.path.exists(journal_path))
+
+        # a journal of another source starts over
+        self.assertEqual(TransferJournal(journal_path, {"size": 999}).parts, {})
+
+    def test_upload_chunks(self):
+        chunks = [os.urandom(30) for _ in range(20)]
+        client = InMemoryStorage()
+        multipart_upload_chunks(client, "bucket", iter(chunks), "blob", parallelism=3, part_size=64)
+        self.assertEqual(client.blobs["blob"], b"".join(chunks))
+
+    def test_upload_chunks_single_part(self):
+        client = InMemoryStorage()
+        multipart_upload_chunks(client, "bucket", iter([b"abc", b"def"]), "blob", part_size=64)
+        self.assertEqual(client.blobs["blob"], b"abcdef")
+        self.assertEqual(client.uploads, [])
+
+    def test_upload_empty_chunks(self):
+        client = InMemoryStorage()
+        multipart_upload_chunks(client, "bucket", iter([]), "blob", part_size=64)
+        self.assertEqual(client.blobs["blob"], b"")
+
+    def test_upload_within_max_buffer_bytes(self):
+        data = os.urandom(1000)
+        self.write_local_file(data)
+        client = InMemoryStorage()
+        memory_budget = MemoryBudget(128)
+        multipart_upload_file(
+            client, "bucket", self.local_blob_path, "blob", part_size=100, max_buffer_bytes=64, memory_budget=memory_budget
+        )
+        self.assertEqual(client.blobs["blob"], data)
+        self.assertEqual(len(client.uploads[0].parts), 16)
+        self.assertEqual(memory_budget.bytes_in_use, 0)
+
+    def test_upload_chunks_within_max_buffer_bytes(self):
+        data = os.urandom(1000)
+        client = InMemoryStorage()
+        chunks = [data[:700], data[700:]]
+        multipart_upload_chunks(
+            client, "bucket", iter(chunks), "blob", parallelism=4, part_size=100, max_buffer_bytes=64
+        )
+        self.assertEqual(client.blobs["blob"], data)
+        # one part is sent while the next is assembled
+        self.assertEqual(max(len(part) for part in client.uploads[0].parts.values()), 32)
+
+    def test_multipart_copy(self):
+        data = os.urandom(1000)
+        client = InMemoryStorage()
+        client.blobs["source"] = data
+        multipart_copy(client, "bucket", "source", len(data), "bucket", "dest", parallelism=4, part_size=64)
+        self.assertEqual(client.blobs["dest"], data)
+        self.assertEqual(len(client.uploads[0].parts), 16)
+
+    def test_multipart_copy_retries_a_failed_part_alone(self):
+        data = os.urandom(1000)
+        client = InMemoryStorage()
+        client.blobs["source"] = data
+        copied = []
+
+        class FlakyUpload(InMemoryMultipartUpload):
+            def copy_part(self, part_number, source_bucket_name, source_blob_path, start, end):
+                copied.append(part_number)
+                if copied.count(3) == 1 and part_number == 3:
+                    raise ConnectionError("connection reset")
+                return super().copy_part(part_number, source_bucket_name, source_blob_path, start, end)
+
+        client.create_multipart_upload = lambda bucket_name, remote_blob_path, **kwargs: FlakyUpload(
+            client, remote_blob_path
+        )
+        retrier = Retrier(RetryPolicy(base_delay=0))
+        multipart_copy(client, "bucket", "source", len(data), "bucket", "dest", part_size=100, retrier=retrier)
+        self.assertEqual(client.blobs["dest"], data)
+        self.assertEqual(sorted(copied), [1, 2, 3, 3, 4, 5, 6, 7, 8, 9, 10])
+
+    def test_multipart_copy_from_url(self):
+        data = os.urandom(1000)
+        client = InMemoryStorage()
+        client.urls["https://signed/source"] = data
+        multipart_copy_from_url(client, "https://signed/source", len(data), "bucket", "dest", part_size=300)
+        self.assertEqual(client.blobs["dest"], data)
+
+    def test_gcs_listings_leave_out_staged_parts(self):
+        from types import SimpleNamespace
+        from cloud_storage_slim.google_cloud_storage import GoogleCloudStorage, STAGING_INFIX
+
+        class Page(list):
+            prefixes = {"a/", f"a{STAGING_INFIX}upload-0/"}
+
+        class Blobs(list):
+            @property
+            def pages(self):
+                return [Page(self)]
+
+        def blob(name):
+            return SimpleNamespace(name=name, size=1, etag="e", updated=None, md5_hash=None, crc32c=None)
+
+        names = ["a", f"a{STAGING_INFIX}upload-0/00001", "b"]
+        storage = GoogleCloudStorage.__new__(GoogleCloudStorage)
+        storage.storage_client = SimpleNamespace(list_blobs=lambda *args, **kwargs: Blobs(blob(n) for n in names))
+        self.assertEqual(storage.list_blobs("bucket", ""), ["a", "b"])
+        entries = list(storage.list_prefixes("bucket", ""))
+        self.assertEqual(entries[1], "a/")
+        self.assertEqual([entry.key for entry in entries if not isinstance(entry, str)], ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
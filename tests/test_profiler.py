@@ -0,0 +1,71 @@
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.profiler import Profiler, profile
+from cloud_storage_slim.retry import retry_call
+
+
+class StreamingStorage:
+    """
+    Fake backend without server-side copies, remote copies are streamed.
+    """
+
+    def __init__(self):
+        self.blobs = {"source": b"data"}
+
+    def copy_blob(self, source_bucket_name, source_blob_path, dest_bucket_name, dest_blob_path, **kwargs):
+        def copy_object():
+            raise NotImplementedError("no server-side copy")
+
+        retry_call(kwargs["retrier"], copy_object)
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        data = self.blobs[remote_blob_path]
+        kwargs["throttle"].transfer(len(data))
+        yield data
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        self.blobs[remote_blob_path] = b"".join(chunks)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_nested_spans(self):
+        events = []
+        profiler = Profiler(sinks=[events.append])
+        with profiler.span("copyto", source="a") as outer:
+            with profiler.span("download"):
+                profiler.on_bytes("s3", "bucket", "read", 10)
+            with self.assertRaises(ValueError):
+                with profiler.span("upload"):
+                    raise ValueError()
+
+        self.assertEqual([event["name"] for event in events], ["download", "upload", "copyto"])
+        self.assertEqual(events[0]["parent_id"], outer.span_id)
+        self.assertIsNone(events[2]["parent_id"])
+        self.assertEqual(events[1]["error"], "ValueError")
+        # bytes count toward every open span of the thread
+        self.assertEqual(events[0]["attributes"]["bytes"], 10)
+        self.assertEqual(events[2]["attributes"], {"source": "a", "bytes": 10})
+        self.assertEqual(profiler.summary()[0]["name"], "copyto")
+
+        with profile(None, "copyto") as span:
+            self.assertIsNone(span)
+
+    def test_copyto_phases_and_requests(self):
+        profiler = Profiler()
+        cloud_storage_slim = CloudStorageSlim(profiler=profiler)
+        cloud_storage_slim.s3_client = cloud_storage_slim._retrying(StreamingStorage(), "s3")
+        cloud_storage_slim.copyto("s3://bucket/source", "s3://other-bucket/dest")
+
+        spans = {span.name: span for span in profiler.spans}
+        self.assertEqual(spans["stream"].parent_id, spans["copyto"].span_id)
+        # the failed server-side copy attempt, then the first chunk read by the streaming producer
+        self.assertEqual(type(spans["s3.copy"].error), NotImplementedError)
+        self.assertEqual(spans["s3.get"].attributes["bucket"], "bucket")
+        self.assertEqual(spans["s3.get"].attributes["bytes"], 4)
+        totals = {total["name"]: total for total in profiler.summary()}
+        self.assertEqual(totals["s3.copy"]["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
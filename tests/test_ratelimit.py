@@ -0,0 +1,68 @@
+import io
+import time
+import unittest
+from cloud_storage_slim.retry import RetryPolicy
+from cloud_storage_slim.retrying_storage import RetryingStorage
+from cloud_storage_slim.ratelimit import RateLimits, Throttle, ThrottledReader, TokenBucket
+
+
+class InMemoryStorage:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        return self.blobs[remote_blob_path][start:end]
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_token_bucket(self):
+        token_bucket = TokenBucket(100)
+        # the burst is free, what goes beyond it is paid at the rate
+        self.assertEqual(token_bucket.reserve(100), 0)
+        self.assertAlmostEqual(token_bucket.reserve(50), 0.5, delta=0.05)
+        self.assertAlmostEqual(token_bucket.reserve(50), 1.0, delta=0.05)
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_throttle_waits_for_the_most_constrained_bucket(self):
+        fast, slow = TokenBucket(1000, burst=1), TokenBucket(10, burst=1)
+        throttle = Throttle([fast, slow], [])
+        throttle.transfer(1)
+        started = time.monotonic()
+        throttle.transfer(1)
+        self.assertAlmostEqual(time.monotonic() - started, 0.1, delta=0.05)
+        # requests have no limit here
+        throttle.request()
+
+    def test_rate_limits_by_key(self):
+        rate_limits = RateLimits({"*": 1000, "gcs": 100, "gs://bucket": 10}, {"s3://bucket": 5})
+        self.assertEqual(len(rate_limits.throttle("gs", "bucket").byte_buckets), 3)
+        self.assertEqual(len(rate_limits.throttle("gs", "other").byte_buckets), 2)
+        throttle = rate_limits.throttle("s3", "bucket")
+        self.assertEqual((len(throttle.byte_buckets), len(throttle.request_buckets)), (1, 1))
+        # the buckets of a key are shared by every throttle it applies to
+        self.assertIs(rate_limits.throttle("s3", "x").byte_buckets[0], throttle.byte_buckets[0])
+        self.assertIsNone(RateLimits({"s3": 10}).throttle("oss", "bucket"))
+
+    def test_requests_and_bytes_are_counted(self):
+        rate_limits = RateLimits({"s3": 1000}, {"*": 1000})
+        storage = RetryingStorage(InMemoryStorage({"blob": b"0123456789"}), RetryPolicy(), 4, "s3", rate_limits)
+        self.assertEqual(storage.read_range("bucket", "blob", 2, 6), b"2345")
+        throttle = storage.retrier("bucket").throttle
+        self.assertAlmostEqual(throttle.byte_buckets[0].tokens, 996, delta=1)
+        self.assertAlmostEqual(throttle.request_buckets[0].tokens, 999, delta=1)
+
+    def test_throttled_reader(self):
+        token_bucket = TokenBucket(1000)
+        f = io.BufferedReader(io.FileIO(__file__))
+        reader = ThrottledReader(f, Throttle([token_bucket], []))
+        size = len(reader)
+        self.assertEqual(len(reader.read(100)), 100)
+        self.assertEqual(len(reader), size - 100)
+        self.assertAlmostEqual(token_bucket.tokens, 900, delta=1)
+        f.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
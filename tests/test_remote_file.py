@@ -0,0 +1,123 @@
+import io
+import os
+import tarfile
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.remote_file import RemoteFileReader, RemoteFileWriter
+
+
+class InMemoryStorage:
+    """
+    Fake backend keeping blobs in a dict and recording ranged reads.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+        self.ranges = []
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        return BlobInfo(remote_blob_path, len(self.blobs[remote_blob_path]), None, 0)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        self.ranges.append((start, end))
+        return self.blobs[remote_blob_path][start:end]
+
+    def download_bytes(self, bucket_name, remote_blob_path, **kwargs):
+        return self.blobs[remote_blob_path]
+
+    def upload_bytes(self, bucket_name, data, remote_blob_path, **kwargs):
+        self.blobs[remote_blob_path] = bytes(data)
+
+    def iter_chunks(self, bucket_name, remote_blob_path, **kwargs):
+        data = self.blobs[remote_blob_path]
+        chunk_size = kwargs.get("chunk_size", 4)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    def write_chunks(self, bucket_name, chunks, remote_blob_path, **kwargs):
+        self.blobs[remote_blob_path] = b"".join(chunks)
+
+
+class TestRemoteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        self.cloud_storage_slim = CloudStorageSlim()
+        self.cloud_storage_slim.s3_client = self.storage
+
+    def test_sequential_reads_grow_read_ahead(self):
+        data = os.urandom(1000)
+        reader = RemoteFileReader(lambda start, end: data[start:end], len(data), block_size=10, max_read_ahead=80)
+        fetched = []
+        read_range = reader._read_range
+        reader._read_range = lambda start, end: fetched.append(end - start) or read_range(start, end)
+        chunks = []
+        while True:
+            chunk = reader.read(7)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.assertEqual(b"".join(chunks), data)
+        self.assertEqual(fetched[:5], [10, 20, 40, 80, 80])
+
+    def test_random_reads_use_block_cache(self):
+        data = os.urandom(1000)
+        self.storage.blobs["blob"] = data
+        with self.cloud_storage_slim.open("s3://bucket/blob", block_size=100) as f:
+            f.seek(-10, io.SEEK_END)
+            self.assertEqual(f.read(), data[-10:])
+            f.seek(500)
+            self.assertEqual(f.read(20), data[500:520])
+            f.seek(950)
+            self.assertEqual(f.read(10), data[950:960])
+            self.assertEqual(f.tell(), 960)
+        self.assertEqual(self.storage.ranges, [(900, 1000), (500, 600)])
+
+    def test_write_then_read_tar(self):
+        with self.cloud_storage_slim.open("s3://bucket/archive.tar", "wb", chunk_size=64) as f:
+            with tarfile.open(fileobj=f, mode="w|") as tar:
+                info = tarfile.TarInfo("hello.txt")
+                info.size = 5
+                tar.addfile(info, io.BytesIO(b"hello"))
+        with self.cloud_storage_slim.open("s3://bucket/archive.tar") as f:
+            with tarfile.open(fileobj=f) as tar:
+                self.assertEqual(tar.extractfile("hello.txt").read(), b"hello")
+
+    def test_exception_aborts_write(self):
+        with self.assertRaises(KeyError):
+            with self.cloud_storage_slim.open("s3://bucket/partial", "wb", chunk_size=4) as f:
+                f.write(b"some bytes")
+                raise KeyError("failed half way")
+        self.assertNotIn("partial", self.storage.blobs)
+
+    def test_read_ranges(self):
+        data = os.urandom(1000)
+        self.storage.blobs["blob"] = data
+        views = self.cloud_storage_slim.read_ranges("s3://bucket/blob", [(990, 10), (0, 8), (16, 8)], max_gap=8)
+        self.assertEqual([bytes(view) for view in views], [data[990:], data[:8], data[16:24]])
+        self.assertEqual(sorted(self.storage.ranges), [(0, 24), (990, 1000)])
+
+    def test_get_and_put_bytes(self):
+        self.cloud_storage_slim.put_bytes("s3://bucket/manifest.json", memoryview(b'{"a": 1}'))
+        self.assertEqual(self.cloud_storage_slim.get_bytes("s3://bucket/manifest.json"), b'{"a": 1}')
+
+        self.cloud_storage_slim.put_stream("s3://bucket/stream", io.BytesIO(b"0123456789"), chunk_size=3)
+        self.assertEqual(b"".join(self.cloud_storage_slim.get_stream("s3://bucket/stream")), b"0123456789")
+        self.cloud_storage_slim.put_stream("s3://bucket/stream", [b"ab", bytearray(b"cd")])
+        self.assertEqual(self.storage.blobs["stream"], b"abcd")
+
+    def test_upload_error_is_raised(self):
+        def write_chunks(chunks):
+            next(iter(chunks))
+            raise IOError("upload failed")
+
+        writer = RemoteFileWriter(write_chunks, chunk_size=1, max_buffered_chunks=1)
+        with self.assertRaises(IOError):
+            for _ in range(100):
+                writer.write(b"x")
+            writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
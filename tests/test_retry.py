@@ -0,0 +1,185 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.segmented import segmented_download
+from cloud_storage_slim.retrying_storage import RetryingStorage
+from cloud_storage_slim.retry import (
+    THROTTLED,
+    TRANSIENT,
+    AdaptiveLimiter,
+    Retrier,
+    RetryPolicy,
+    classify_error,
+)
+
+
+class ClientError(Exception):
+    """shaped like botocore's ClientError"""
+
+    def __init__(self, status, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class HttpResponseError(Exception):
+    """shaped like azure-core's HttpResponseError"""
+
+    def __init__(self, status_code, error_code=None):
+        super().__init__(error_code)
+        self.status_code = status_code
+        self.error_code = error_code
+
+
+class FlakyStorage:
+    def __init__(self, blobs, failures):
+        self.blobs = blobs
+        # exceptions raised by the next read_range or iter_blobs calls
+        self.failures = failures
+        self.calls = 0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        return BlobInfo(remote_blob_path, len(self.blobs[remote_blob_path]), None, None)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        self._maybe_fail()
+        return self.blobs[remote_blob_path][start:end]
+
+    def download(self, bucket_name, remote_blob_path, local_blob_path, **kwargs):
+        segmented_download(self, bucket_name, remote_blob_path, local_blob_path, part_size=4, **kwargs)
+
+    def iter_blobs(self, bucket_name, pattern, start_after=None):
+        for key in sorted(self.blobs):
+            if start_after is None or key > start_after:
+                self._maybe_fail()
+                yield BlobInfo(key, len(self.blobs[key]), None, None)
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=3, base_delay=0)
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(ClientError(503, "SlowDown")), THROTTLED)
+        self.assertEqual(classify_error(HttpResponseError(503, "ServerBusy")), THROTTLED)
+        self.assertEqual(classify_error(HttpResponseError(500)), TRANSIENT)
+        self.assertEqual(classify_error(ConnectionResetError()), TRANSIENT)
+        self.assertIsNone(classify_error(ClientError(404, "NoSuchKey")))
+        self.assertIsNone(classify_error(FileNotFoundError()))
+
+    def test_retry_until_success(self):
+        failures = [ClientError(503, "SlowDown"), ConnectionResetError()]
+
+        def request():
+            if failures:
+                raise failures.pop(0)
+            return "ok"
+
+        self.assertEqual(Retrier(self.policy)(request), "ok")
+
+    def test_gives_up(self):
+        def request():
+            raise ClientError(503, "SlowDown")
+
+        with self.assertRaises(ClientError):
+            Retrier(self.policy)(request)
+        with self.assertRaises(ClientError):
+            Retrier(RetryPolicy(max_attempts=1))(request)
+
+    def test_transient_errors_of_non_idempotent_requests_are_raised(self):
+        failures = [TimeoutError()]
+
+        def request():
+            if failures:
+                raise failures.pop(0)
+
+        with self.assertRaises(TimeoutError):
+            Retrier(self.policy)(request, idempotent=False)
+
+        failures.append(ClientError(429, "TooManyRequests"))
+        Retrier(self.policy)(request, idempotent=False)
+
+    def test_retry_coroutine_until_success(self):
+        failures = [ClientError(503, "SlowDown"), ConnectionResetError()]
+        limiter = AdaptiveLimiter(1)
+
+        async def request():
+            self.assertEqual(limiter.in_flight, 1)
+            if failures:
+                raise failures.pop(0)
+            return "ok"
+
+        self.assertEqual(asyncio.run(Retrier(self.policy, limiter).call_async(request)), "ok")
+        self.assertEqual(limiter.in_flight, 0)
+        # the throttled attempt bumped the epoch
+        self.assertEqual(limiter.try_acquire(), 1)
+        self.assertIsNone(limiter.try_acquire())
+
+    def test_adaptive_limiter(self):
+        limiter = AdaptiveLimiter(16)
+        epoch = limiter.acquire()
+        limiter.release()
+        limiter.on_throttle(epoch)
+        self.assertEqual(limiter.limit, 8)
+        # a throttled request started before the decrease changes nothing
+        limiter.on_throttle(epoch)
+        self.assertEqual(limiter.limit, 8)
+
+        for _ in range(8):
+            limiter.on_success()
+        self.assertAlmostEqual(limiter.limit, 9, delta=0.1)
+        for _ in range(1000):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 16)
+
+        for _ in range(10):
+            limiter.on_throttle(limiter.epoch)
+        self.assertEqual(limiter.limit, 1)
+
+    def test_throttling_shrinks_the_bucket_limit(self):
+        limiter = AdaptiveLimiter(8)
+        failures = [ClientError(503, "SlowDown")]
+
+        def request():
+            if failures:
+                raise failures.pop(0)
+
+        Retrier(self.policy, limiter)(request)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertLess(limiter.limit, 8)
+
+
+class TestRetryingStorage(unittest.TestCase):
+
+    def test_download_retries_single_parts(self):
+        data = os.urandom(40)
+        client = FlakyStorage({"blob": data}, [ClientError(503, "SlowDown"), ClientError(500, "InternalError")])
+        storage = RetryingStorage(client, RetryPolicy(base_delay=0), 4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            local_blob_path = os.path.join(tmp_dir, "blob")
+            storage.download("bucket", "blob", local_blob_path, parallelism=1)
+            with open(local_blob_path, "rb") as f:
+                self.assertEqual(f.read(), data)
+        # 10 parts plus the 2 failed attempts, nothing was downloaded twice
+        self.assertEqual(client.calls, 12)
+        # halved once by the throttled part, grown back by the others
+        self.assertEqual(storage.retrier("bucket").limiter.epoch, 1)
+
+    def test_iter_blobs_resumes_after_last_key(self):
+        client = FlakyStorage({"a": b"", "b": b"", "c": b""}, [])
+        storage = RetryingStorage(client, RetryPolicy(base_delay=0), 4)
+        blob_infos = storage.iter_blobs("bucket", "")
+        self.assertEqual(next(blob_infos).key, "a")
+        client.failures.append(ConnectionResetError())
+        self.assertEqual([blob_info.key for blob_info in blob_infos], ["b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import time
+import threading
+import unittest
+from collections import Counter
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.scheduler import TransferScheduler
+
+
+class TestTransferScheduler(unittest.TestCase):
+
+    def test_bucket_limits(self):
+        lock = threading.Lock()
+        running = Counter()
+        peak = Counter()
+
+        def copy(source_path, dest_path):
+            bucket = source_path.split("/")[2]
+            with lock:
+                running[bucket] += 1
+                peak[bucket] = max(peak[bucket], running[bucket])
+            time.sleep(0.01)
+            with lock:
+                running[bucket] -= 1
+
+        items = [(f"s3://bucket-{i % 2}/{i}", f"/tmp/{i}", i) for i in range(20)]
+        scheduler = TransferScheduler(transfers=6, per_bucket_transfers=2, limits={"s3://bucket-1": 1})
+        results = scheduler.run(copy, items)
+        self.assertEqual([result.error for result in results], [None] * 20)
+        self.assertEqual(peak["bucket-0"], 2)
+        self.assertEqual(peak["bucket-1"], 1)
+
+    def test_order_and_errors(self):
+        started = []
+        listed = threading.Event()
+
+        def items():
+            yield "/tmp/first", "/tmp/first2", 40
+            while not started:
+                time.sleep(0.001)
+            yield from [("/tmp/a", "/tmp/a2", 30), ("/tmp/b", "/tmp/b2", 10), ("/tmp/c", "/tmp/c2", None)]
+            yield "/tmp/d", "/tmp/d2", 20
+            listed.set()
+
+        def copy(source_path, dest_path):
+            started.append(source_path)
+            # the items listed while the first copy runs start in size order
+            listed.wait(1)
+            if source_path == "/tmp/b":
+                raise IOError("failed")
+
+        results = TransferScheduler(transfers=1).run(copy, items())
+        self.assertEqual(started, ["/tmp/first", "/tmp/b", "/tmp/d", "/tmp/a", "/tmp/c"])
+        self.assertEqual([result.source for result in results], ["/tmp/first", "/tmp/a", "/tmp/b", "/tmp/c", "/tmp/d"])
+        self.assertIsInstance(results[2].error, IOError)
+        self.assertIsNone(results[1].error)
+
+    def test_producer_backpressure(self):
+        produced = []
+
+        def items():
+            for i in range(10):
+                produced.append(i)
+                yield f"/tmp/{i}", f"/tmp/{i}.copy", None
+
+        def copy(source_path, dest_path):
+            if source_path == "/tmp/0":
+                time.sleep(0.05)
+                # the running copy and max_pending waiting ones
+                self.assertLessEqual(len(produced), 3)
+
+        results = TransferScheduler(transfers=1, max_pending=2, order=None).run(copy, items())
+        self.assertEqual([result.error for result in results], [None] * 10)
+
+    def test_copies_start_while_listing(self):
+        copied = threading.Event()
+
+        def items():
+            yield "s3://bucket/a", "/tmp/a", 1
+            # a listing page still being fetched
+            self.assertTrue(copied.wait(1))
+            yield "gcs://bucket/b", "/tmp/b", 1
+
+        def copy(source_path, dest_path):
+            copied.set()
+
+        scheduler = TransferScheduler(limits={"gcs://bucket": 1})
+        results = scheduler.run(copy, items())
+        self.assertEqual([result.error for result in results], [None, None])
+        self.assertEqual(scheduler._slot_keys("gcs://bucket/b", "gs://bucket/c"), {"gs", "gs://bucket"})
+        self.assertEqual(scheduler._limit("gs://bucket"), 1)
+
+    def test_copy_many(self):
+        cloud_storage_slim = CloudStorageSlim()
+        results = cloud_storage_slim.copy_many([("/nonexistent/a", "/nonexistent/b")])
+        self.assertIsNotNone(results[0].error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import unittest
+import threading
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.memory import MemoryBudget, fit_buffer
+from cloud_storage_slim.journal import TransferJournal
+from cloud_storage_slim.segmented import split_ranges, segmented_download, coalesce_ranges, read_ranges
+
+
+class InMemoryStorage:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def stat_blob(self, bucket_name, remote_blob_path):
+        data = self.blobs[remote_blob_path]
+        return BlobInfo(remote_blob_path, len(data), None, None)
+
+    def read_range(self, bucket_name, remote_blob_path, start, end):
+        return self.blobs[remote_blob_path][start:end]
+
+
+class TestSegmented(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.local_blob_path = os.path.join(self.tmp_dir.name, "blob")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_split_ranges(self):
+        self.assertEqual(split_ranges(10, 4), [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(split_ranges(8, 4), [(0, 4), (4, 8)])
+        self.assertEqual(split_ranges(0, 4), [])
+        with self.assertRaises(ValueError):
+            split_ranges(10, 0)
+
+    def test_segmented_download(self):
+        data = os.urandom(1000)
+        client = InMemoryStorage({"blob": data})
+        segmented_download(client, "bucket", "blob", self.local_blob_path, parallelism=4, part_size=64)
+        with open(self.local_blob_path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_segmented_download_empty_blob(self):
+        client = InMemoryStorage({"blob": b""})
+        segmented_download(client, "bucket", "blob", self.local_blob_path)
+        self.assertEqual(os.path.getsize(self.local_blob_path), 0)
+
+    def test_segmented_download_short_read(self):
+        class TruncatingStorage(InMemoryStorage):
+            def read_range(self, bucket_name, remote_blob_path, start, end):
+                return super().read_range(bucket_name, remote_blob_path, start, end)[:-1]
+
+        client = TruncatingStorage({"blob": os.urandom(100)})
+        with self.assertRaises(IOError):
+            segmented_download(client, "bucket", "blob", self.local_blob_path, parallelism=2, part_size=10)
+
+    def test_resume_download_from_journal(self):
+        data = os.urandom(1000)
+        journal_path = os.path.join(self.tmp_dir.name, "journal.jsonl")
+
+        class FailingStorage(InMemoryStorage):
+            fail_start = 640
+            reads = []
+
+            def read_range(self, bucket_name, remote_blob_path, start, end):
+                if start == self.fail_start:
+                    raise IOError("connection reset")
+                self.reads.append(start)
+                return super().read_range(bucket_name, remote_blob_path, start, end)
+
+        client = FailingStorage({"blob": data})
+        with self.assertRaises(IOError):
+            segmented_download(
+                client, "bucket", "blob", self.local_blob_path, parallelism=1, part_size=64,
+                journal=TransferJournal(journal_path, {"size": 1000}),
+            )
+
+        client.fail_start = None
+        client.reads.clear()
+        segmented_download(
+            client, "bucket", "blob", self.local_blob_path, parallelism=4, part_size=64,
+            journal=TransferJournal(journal_path, {"size": 1000}),
+        )
+        with open(self.local_blob_path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(min(client.reads), 640)
+        self.assertFalse(os.path.exists(journal_path))
+
+    def test_fit_buffer(self):
+        self.assertEqual(fit_buffer(8, 64, None), (8, 64))
+        self.assertEqual(fit_buffer(8, 64, 256), (4, 64))
+        self.assertEqual(fit_buffer(8, 64, 32), (1, 32))
+        with self.assertRaises(ValueError):
+            fit_buffer(8, 64, 0)
+
+    def test_segmented_download_memory_budget(self):
+        memory_budget = MemoryBudget(100)
+        peak = 0
+        lock = threading.Lock()
+
+        class MeasuringStorage(InMemoryStorage):
+            def read_range(self, bucket_name, remote_blob_path, start, end):
+                nonlocal peak
+                with lock:
+                    peak = max(peak, memory_budget.bytes_in_use)
+                return super().read_range(bucket_name, remote_blob_path, start, end)
+
+        data = os.urandom(1000)
+        client = MeasuringStorage({"blob": data})
+        segmented_download(
+            client, "bucket", "blob", self.local_blob_path, parallelism=8, part_size=30, memory_budget=memory_budget
+        )
+        with open(self.local_blob_path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertLessEqual(peak, 100)
+        self.assertEqual(memory_budget.bytes_in_use, 0)
+
+        segmented_download(client, "bucket", "blob", self.local_blob_path, part_size=500, memory_budget=memory_budget)
+        self.assertEqual(memory_budget.bytes_in_use, 0)
+
+    def test_coalesce_ranges(self):
+        ranges = [(100, 10), (0, 10), (15, 5), (2000, 10), (2015, 0)]
+        self.assertEqual(
+            coalesce_ranges(ranges, max_gap=50, max_coalesced_size=1000),
+            [(0, 20, [1, 2]), (100, 110, [0]), (2000, 2015, [3, 4])],
+        )
+        self.assertEqual(
+            coalesce_ranges([(0, 10), (10, 10)], max_gap=50, max_coalesced_size=15),
+            [(0, 10, [0]), (10, 20, [1])],
+        )
+        with self.assertRaises(ValueError):
+            coalesce_ranges([(-1, 10)])
+
+    def test_read_ranges(self):
+        data = os.urandom(1000)
+        requests = []
+
+        def read_range(start, end):
+            requests.append((start, end))
+            return data[start:end]
+
+        ranges = [(900, 100), (0, 4), (10, 20), (500, 0)]
+        views = read_ranges(read_range, ranges, max_gap=16, parallelism=4)
+        self.assertEqual([bytes(view) for view in views], [data[900:], data[0:4], data[10:30], b""])
+        self.assertEqual(sorted(requests), [(0, 30), (900, 1000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
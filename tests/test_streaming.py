@@ -0,0 +1,54 @@
+import unittest
+from cloud_storage_slim.streaming import ChunkPipe, ChunkReader, SizedChunks
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_chunk_pipe_preserves_order(self):
+        chunks = [bytes([i]) * 10 for i in range(100)]
+        pipe = ChunkPipe(iter(chunks), max_buffered_chunks=2)
+        self.assertEqual(list(pipe), chunks)
+
+    def test_chunk_pipe_raises_producer_error(self):
+        def failing_chunks():
+            yield b"first"
+            raise IOError("connection reset")
+
+        pipe = ChunkPipe(failing_chunks())
+        with self.assertRaises(IOError):
+            list(pipe)
+
+    def test_chunk_pipe_close_stops_producer(self):
+        def endless_chunks():
+            while True:
+                yield b"x"
+
+        pipe = ChunkPipe(endless_chunks(), max_buffered_chunks=1)
+        for _ in pipe:
+            break
+        pipe._thread.join(timeout=5)
+        self.assertFalse(pipe._thread.is_alive())
+
+    def test_chunk_reader_fills_reads(self):
+        reader = ChunkReader([b"abc", b"de", b"", b"fghij"])
+        self.assertEqual(reader.read(4), b"abcd")
+        self.assertEqual(reader.read(4), b"efgh")
+        self.assertEqual(reader.read(4), b"ij")
+        self.assertEqual(reader.read(4), b"")
+
+    def test_chunk_reader_read_all(self):
+        reader = ChunkReader(iter([b"abc", b"def"]))
+        self.assertEqual(reader.read(), b"abcdef")
+
+    def test_sized_chunks(self):
+        chunks = SizedChunks(iter([b"abc", b"de"]), 5)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(list(chunks), [b"abc", b"de"])
+        with self.assertRaises(IOError):
+            list(SizedChunks(iter([b"abc"]), 5))
+        with self.assertRaises(IOError):
+            list(SizedChunks(iter([b"abc", b"def"]), 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
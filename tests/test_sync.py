@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from cloud_storage_slim import CloudStorageSlim
+from cloud_storage_slim.utils import BlobInfo
+from cloud_storage_slim.sync import diff_blob_infos
+
+
+class TestSync(unittest.TestCase):
+
+    def test_diff_blob_infos(self):
+        source_infos = [
+            BlobInfo("same_md5", 10, None, 200, "aa"),
+            BlobInfo("changed_md5", 10, None, 100, "aa"),
+            BlobInfo("changed_size", 11, None, 100),
+            BlobInfo("same_crc32c", 10, "e1", 300, None, 1),
+            BlobInfo("changed_crc64ecma", 10, None, 100, None, None, 1),
+            BlobInfo("same_etag", 10, "e1-2", 100),
+            BlobInfo("nothing_comparable", 10, None, 300),
+            BlobInfo("new", 10, None, 100),
+        ]
+        dest_infos = [
+            BlobInfo("same_md5", 10, None, 100, "aa"),
+            BlobInfo("changed_md5", 10, None, 200, "bb"),
+            BlobInfo("changed_size", 10, None, 200),
+            BlobInfo("same_crc32c", 10, "e2", 200, None, 1),
+            BlobInfo("changed_crc64ecma", 10, None, 200, None, None, 2),
+            BlobInfo("same_etag", 10, "e1-2", 200),
+            BlobInfo("nothing_comparable", 10, None, 200),
+            BlobInfo("extra", 10, None, 200),
+        ]
+        keys_to_copy, keys_to_delete = diff_blob_infos(source_infos, dest_infos)
+        self.assertEqual(
+            keys_to_copy, ["changed_md5", "changed_size", "changed_crc64ecma", "same_etag", "nothing_comparable", "new"]
+        )
+        self.assertEqual(keys_to_delete, ["extra"])
+
+        # ETags are only compared between buckets of the same provider
+        keys_to_copy, _ = diff_blob_infos(source_infos, dest_infos, same_provider=True)
+        self.assertEqual(
+            keys_to_copy, ["changed_md5", "changed_size", "changed_crc64ecma", "nothing_comparable", "new"]
+        )
+
+    def test_diff_blob_infos_hashes_local_files(self):
+        hashed_keys = []
+
+        def local_md5(key):
+            hashed_keys.append(key)
+            return "aa"
+
+        source_infos = [BlobInfo("same", 10, None, 100, "aa"), BlobInfo("changed_size", 10, None, 100, "aa")]
+        dest_infos = [BlobInfo("same", 10, None, 200), BlobInfo("changed_size", 11, None, 200)]
+        keys_to_copy, _ = diff_blob_infos(source_infos, dest_infos, dest_md5=local_md5)
+        self.assertEqual(keys_to_copy, ["changed_size"])
+        self.assertEqual(hashed_keys, ["same"])
+
+    def test_sync_local_directory(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_dir = os.path.join(tmp_dir, "source")
+            dest_dir = os.path.join(tmp_dir, "dest")
+            os.makedirs(os.path.join(source_dir, "nested"))
+            for relative_path in ["a.txt", "nested/b.txt"]:
+                with open(os.path.join(source_dir, relative_path), "w") as f:
+                    f.write(relative_path)
+
+            cloud_storage_slim = CloudStorageSlim()
+            pairs, _ = cloud_storage_slim.sync(source_dir, dest_dir)
+            self.assertEqual(len(pairs), 2)
+
+            pairs, _ = cloud_storage_slim.sync(source_dir, dest_dir)
+            self.assertEqual(pairs, [])
+
+            with open(os.path.join(source_dir, "a.txt"), "w") as f:
+                f.write("a.txt changed")
+            with open(os.path.join(dest_dir, "extra.txt"), "w") as f:
+                f.write("extra")
+            pairs, deleted_paths = cloud_storage_slim.sync(source_dir, dest_dir, delete=True)
+            self.assertEqual([os.path.basename(dest) for _, dest in pairs], ["a.txt"])
+            self.assertEqual([os.path.basename(path) for path in deleted_paths], ["extra.txt"])
+            self.assertFalse(os.path.exists(os.path.join(dest_dir, "extra.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()